@@ -1,15 +1,16 @@
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-import openpyxl
 import os
-from datetime import datetime
+import sys
 import threading
 from tkinterdnd2 import DND_FILES, TkinterDnD
-import shutil
 from string import ascii_uppercase as alc
-
-# Путь к файлу-шаблону
-TEMPLATE_FILE_PATH = r'\\192.168.34.9\линвит\ПОЛЬЗОВАТЕЛИ\USER49\Программы\Шаблоны для программ\Файл для экспорта (для ИК).xlsx'
+import multiprocessing
+from protocol_reader import ENGINES, DEFAULT_ENGINE, OUTPUT_COLUMNS, COLUMN_TITLES
+from columnar_export import COLUMNAR_FORMATS
+from protocol_export import (TEMPLATE_FILE_PATH, REESTR_TEMPLATE_FILE_PATH, QUICK_COLUMNS, ExportEvents,
+                             export_protocols, open_output, open_reestr_output)
+import protocol_export
 
 # Цветовая схема
 BG_COLOR = "#f0f0f0"
@@ -20,20 +21,33 @@ FRAME_COLOR = "#ffffff"
 LISTBOX_COLOR = "#ffffff"
 PROGRESS_COLOR = "#4b8fe2"
 
-# Функция для форматирования даты
-def format_date(date_value):
-    if isinstance(date_value, datetime):
-        return date_value.strftime("%d.%m.%Y")
-    else:
-        return str(date_value or "")
 
+class WindowEvents(ExportEvents):
+    """События выгрузки в окне программы: статус, прогресс-бар и сообщения по файлам."""
+
+    def status(self, message):
+        update_status(message)
 
+    def progress(self):
+        # Обновление прогресс-бара (основной поток)
+        root.after(0, update_progress)
 
-def process_files(action):
+    def file_warning(self, file_path, message):
+        messagebox.showwarning("Предупреждение", message)
+
+    def file_error(self, file_path, message):
+        messagebox.showerror("Ошибка", message)
+        update_status(message)
+
+
+def process_files(action, workers=1, engine=DEFAULT_ENGINE, use_cache=True, upsert=True, long_batch=False,
+                  prefetch=True, timing=True, columns=None, columnar=None, reestr=False):
     """
-    Обрабатывает выбранные файлы, используя заранее известный индекс листа.
+    Обрабатывает выбранные файлы: запрашивает выходную таблицу и передает файлы
+    в export_protocols (параметры описаны там и в open_output).
+    reestr - за тот же проход заполнить реестр применения СИ (новый или существующий,
+    как и выходная таблица).
     """
-    global cell_value1, cell_value2, cell_value3, cell_value4, cell_value4_1, cell_value5, cell_value6, cell_value7, cell_value8, cell_value10, cell_value10_1, cell_value9, cell_value12, cell_value13, cell_value14, cell_value11, cell_value15, cell_value16, cell_value17, cell_value18, cell_value19, cell_value20, cell_value21, cell_value23, cell_value22, cell_value18_1, cell_value19_1, cell_value25, cell_value26, cell_value27, cell_value24
 
     update_status("Начало обработки файлов...")  # Обновление статуса
 
@@ -56,8 +70,8 @@ def process_files(action):
             return
 
         try:
-            output_workbook = openpyxl.load_workbook(save_path)
-            output_sheet = output_workbook.worksheets[0]
+            update_status("Чтение номеров протоколов из существующей таблицы...")
+            output = open_output(action, save_path, upsert=upsert, columns=columns)
         except FileNotFoundError:
             messagebox.showerror("Ошибка", f"Файл не найден: {save_path}")
             update_status(f"Ошибка: Файл не найден - {save_path}")
@@ -73,18 +87,15 @@ def process_files(action):
             update_status("Обработка прервана пользователем.")
             return
 
-        # Копируем файл шаблона
         try:
-            shutil.copy(TEMPLATE_FILE_PATH, save_path)
-            output_workbook = openpyxl.load_workbook(save_path)
-            output_sheet = output_workbook.worksheets[0]
+            output = open_output(action, save_path, columns=columns)
         except FileNotFoundError:
             messagebox.showerror("Ошибка", f"Файл шаблона не найден: {TEMPLATE_FILE_PATH}")
             update_status(f"Ошибка: Файл шаблона не найден - {TEMPLATE_FILE_PATH}")
             return
         except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при копировании шаблона: {e}")
-            update_status(f"Ошибка: Не удалось скопировать шаблон - {TEMPLATE_FILE_PATH}. Ошибка: {e}")
+            messagebox.showerror("Ошибка", f"Ошибка при чтении шаблона: {e}")
+            update_status(f"Ошибка: Не удалось прочитать шаблон - {TEMPLATE_FILE_PATH}. Ошибка: {e}")
             return
 
     else:
@@ -92,344 +103,46 @@ def process_files(action):
         update_status("Ошибка: Некорректное действие.")
         return
 
-    row_index = output_sheet.max_row + 1
-    total_files = len(file_paths)
-    progress_bar['maximum'] = total_files
-    progress_bar['value'] = 0
-
-    for i, file_path in enumerate(file_paths):
+    reestr_output = reestr_path = None
+    if reestr:
+        if action == "existing":
+            reestr_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx")],
+                                                     title="Выберите реестр применения СИ")
+        else:
+            reestr_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")],
+                                                       title="Сохранить реестр применения СИ")
+        if not reestr_path:
+            output.close()
+            update_status("Обработка прервана пользователем.")
+            return
         try:
-            update_status(f"Обработка файла {i + 1} из {total_files}: {os.path.basename(file_path)}")
-
-            workbook = openpyxl.load_workbook(file_path, data_only=True, read_only=True)
-
-            worksheets = workbook.sheetnames
-
-
-            # Проверка существования всех листов
-            sheet1 = workbook['Титул'] if 'Титул' in workbook.sheetnames else None
-            sheet2 = workbook['Протокол'] if 'Протокол' in workbook.sheetnames else None
-            sheet3 = workbook['Записи'] if 'Записи' in workbook.sheetnames else None
-            sheet4 = workbook['ПКЭ'] if 'ПКЭ' in workbook.sheetnames else None
-            sheet5 = workbook['3ф-4пр'] if '3ф-4пр' in workbook.sheetnames else None
-
-            def get_combined_value(base_cell, check_cell):
-
-                if check_cell != "None":
-                    return base_cell + check_cell
-                else:
-                    return base_cell
-
-            # Проверка альтернативных названий листов
-            if sheet2 is None or sheet2.sheet_state != 'visible' and 'Протокол-3пр' in workbook.sheetnames:
-                sheet2 = workbook['Протокол-3пр']
-
-            if sheet3 is None or sheet3.sheet_state != 'visible' and 'Записи-3пр' in workbook.sheetnames:
-                sheet3 = workbook['Записи-3пр']
-
-            if sheet4 is None and 'ПКЭ 32144' in workbook.sheetnames:
-                sheet4 = workbook['ПКЭ 32144']
-
-            # Установка значений по умолчанию для отсутствующих листов
-            missing_sheets = []
-
-            if sheet1 is None:
-                missing_sheets.append("Титул")
-                cell_value4 = "---"
-                cell_value4_1 = "---"
-                cell_value9 = "---"
-                cell_value12 = "---"
-
-            if sheet2 is None:
-                missing_sheets.append("Протокол")
-                cell_value2 = "---"
-                cell_value1 = "---"
-                cell_value14 = "---"
-                cell_value10 = "---"
-                cell_value11 = "---"
-                cell_value15 = "---"
-                cell_value5 = "---"
-                cell_value6 = "---"
-                cell_value16 = "---"
-                cell_value17 = "---"
-                cell_value25 = "---"
-                cell_value26 = "---"
-                cell_value27 = "---"
-
-            if sheet3 is None:
-                missing_sheets.append("Записи")
-                cell_value8 = "---"
-                cell_value13 = "---"
-
-            if sheet4 is None:
-                missing_sheets.append("ПКЭ")
-                cell_value18 = "---"
-                cell_value19 = "---"
-                cell_value18_1 = "---"
-                cell_value19_1 = "---"
-
-            if sheet5 is None:
-                missing_sheets.append("3ф-4пр")
-                cell_value20 = "---"
-                cell_value21 = "---"
-                cell_value22 = "---"
-                cell_value23 = "---"
-                cell_value24 = "---"
-
-            # Вывод предупреждения об отсутствующих листах
-            if missing_sheets:
-                messagebox.showwarning("Предупреждение",
-                                       f"В файле {os.path.basename(file_path)} отсутствуют листы: {', '.join(missing_sheets)}. "
-                                       "Соответствующие данные будут заменены на '---'.")
-
-            # Поиск ячейки с "отрицательное отклонение напряжения"
-            cell_value16 = None  # Значение по умолчанию
-            cell_value17 = None
-            search_text = "отрицательное отклонение напряжения"
-
-            if sheet2 is not None:
-                for row in range(70, 90):  # Поиск в строках
-                    for col in range(8, 10):  # Проверяем столбцы
-                        cell = sheet2.cell(row=row, column=col)
-                        if cell.value and search_text in str(cell.value):
-                            # Нашли ячейку
-                            cell_value16 = sheet2.cell(row=row + 1, column=11).value # dU -
-                            cell_value17 = sheet2.cell(row=row + 3, column=11).value # dU +
-                            break
-                    if cell_value16 is not None:
-                        break
-
-            if sheet3 is not None:
-                cell_value8 = sheet3['AK6'].value    # Место в схеме
-                cell_value13 = sheet3['U9'].value    # Центр питания
-                cell_value24 = sheet3['BZ37'].value  # Эксперт протокол
-
-
-
-            if cell_value8 is None:
-                cell_value8 = '-'
-            if cell_value13 is None:
-                cell_value13 = '-'
-
-            if sheet2 is not None:
-                Check1 = str(sheet2['AG34'].value)
-                Check2 = str(sheet2['AG32'].value)
-                Check3 = str(sheet2['AG30'].value)
-                Check4 = str(sheet2['AG33'].value)
-
-
-            if 'Тип СИ' in Check4:
-                if sheet2 is not None:
-                    cell_value2 = sheet2['AG34'].value  # Тип СИ ПКЭ
-                    cell_value1 = sheet2['BE34'].value  # Заводской номер СИ ПКЭ
-                    cell_value14 = sheet2['CD34'].value  # Поверка СИ ПКЭ
-
-                    cell_value10 = sheet2['AG35'].value  # Тип СИ
-                    cell_value11 = sheet2['BE35'].value  # Заводской номер СИ
-                    cell_value15 = sheet2['CD35'].value  # Поверка СИ
-
-                    cell_value25 = get_combined_value(str(sheet2['AI2'].value), str(sheet2['A3'].value))
-                    cell_value26 = get_combined_value(str(sheet2['AI4'].value), str(sheet2['A5'].value))
-                    cell_value27 = get_combined_value(str(sheet2['R21'].value), str(sheet2['A22'].value))
-
-                    cell_value5 = format_date(sheet2['M25'].value)  # Начало испытаний
-                    cell_value6 = format_date(sheet2['M26'].value)  # Окончание испытаний
-
-                if sheet1 is not None:
-                    cell_value4 = sheet1['A32'].value  # Электрические сети
-                    cell_value4_1 = sheet1['A33'].value  # Электрические сети
-                    cell_value9 = sheet1['BC26'].value  # Номер протокола
-                    cell_value12 = format_date(sheet1['BU24'].value)  # Дата протокола
-
-                if sheet4 is not None:
-                    cell_value18 = sheet4['G6'].value  # Начало интервала наибольших нагрузок
-                    cell_value19 = sheet4['H6'].value  # Конец интервала наибольших нагрузок
-                    cell_value18_1 = sheet4['G7'].value  # Начало интервала наибольших нагрузок 2
-                    cell_value19_1 = sheet4['H7'].value  # Конец интервала наибольших нагрузок 2
-
-                if sheet5 is not None:
-                    cell_value20 = sheet5['BE16'].value  # δU(−)I, %
-                    cell_value21 = sheet5['BE17'].value  # δU(+)I, %
-                    cell_value22 = sheet5['BE26'].value  # δU(−)II, %
-                    cell_value23 = sheet5['BE27'].value  # δU(+)II, %
-
-
-            elif 'Тип СИ' in Check3:
-
-                if sheet2 is not None:
-                    cell_value2 = sheet2['AG31'].value  # Тип СИ ПКЭ
-                    cell_value1 = sheet2['BE31'].value  # Заводской номер СИ ПКЭ
-                    cell_value14 = sheet2['CD31'].value  # Поверка СИ ПКЭ
-
-                    cell_value10 = sheet2['AG32'].value  # Тип СИ
-                    cell_value11 = sheet2['BE32'].value  # Заводской номер СИ
-                    cell_value15 = sheet2['CD32'].value  # Поверка СИ
-
-                    cell_value25 = str(sheet2['A2'].value)
-                    cell_value26 = str(sheet2['A3'].value)
-                    cell_value27 = str(sheet2['A19'].value)
-
-                    cell_value5 = format_date(sheet2['M22'].value)  # Начало испытаний
-                    cell_value6 = format_date(sheet2['M23'].value)  # Окончание испытаний
-
-                if sheet1 is not None:
-                    cell_value4 = sheet1['A35'].value  # Электрические сети
-                    cell_value4_1 = sheet1['A36'].value  # Электрические сети
-                    cell_value9 = sheet1['BC29'].value  # Номер протокола
-                    cell_value12 = format_date(sheet1['BU24'].value)  # Дата протокола
-
-                if sheet4 is not None:
-                    cell_value18 = sheet4['G6'].value  # Начало интервала наибольших нагрузок
-                    cell_value19 = sheet4['H6'].value  # Конец интервала наибольших нагрузок
-                    cell_value18_1 = sheet4['G7'].value  # Начало интервала наибольших нагрузок 2
-                    cell_value19_1 = sheet4['H7'].value  # Конец интервала наибольших нагрузок 2
-
-                if sheet5 is not None:
-                    cell_value20 = sheet5['BE16'].value  # δU(−)I, %
-                    cell_value21 = sheet5['BE17'].value  # δU(+)I, %
-                    cell_value22 = sheet5['BE26'].value  # δU(−)II, %
-                    cell_value23 = sheet5['BE27'].value  # δU(+)II, %
-
-
-            elif 'Тип СИ' in Check2:
-
-                if sheet2 is not None:
-                    cell_value2 = sheet2['AG33'].value  # Тип СИ ПКЭ
-                    cell_value1 = sheet2['BE33'].value  # Заводской номер СИ ПКЭ
-                    cell_value14 = sheet2['CD33'].value  # Поверка СИ ПКЭ
-
-                    cell_value10 = sheet2['AG34'].value  # Тип СИ
-                    cell_value11 = sheet2['BE34'].value  # Заводской номер СИ
-                    cell_value15 = sheet2['CD34'].value  # Поверка СИ
-
-                    cell_value25 = get_combined_value(str(sheet2['AI2'].value), str(sheet2['A3'].value))
-                    cell_value26 = get_combined_value(str(sheet2['AI4'].value), str(sheet2['A5'].value))
-                    cell_value27 = get_combined_value(str(sheet2['R21'].value), str(sheet2['A22'].value))
-
-                    cell_value5 = format_date(sheet2['M24'].value)  # Начало испытаний
-                    cell_value6 = format_date(sheet2['M25'].value)  # Окончание испытаний
-
-                if sheet1 is not None:
-                    cell_value4 = sheet1['A35'].value  # Электрические сети
-                    cell_value4_1 = sheet1['A36'].value  # Электрические сети
-                    cell_value9 = sheet1['BC29'].value  # Номер протокола
-                    cell_value12 = format_date(sheet1['BU24'].value)  # Дата протокола
-
-                if sheet4 is not None:
-                    cell_value18 = sheet4['G6'].value  # Начало интервала наибольших нагрузок
-                    cell_value19 = sheet4['H6'].value  # Конец интервала наибольших нагрузок
-                    cell_value18_1 = sheet4['G7'].value  # Начало интервала наибольших нагрузок 2
-                    cell_value19_1 = sheet4['H7'].value  # Конец интервала наибольших нагрузок 2
-
-                if sheet5 is not None:
-                    cell_value20 = sheet5['BE16'].value  # δU(−)I, %
-                    cell_value21 = sheet5['BE17'].value  # δU(+)I, %
-                    cell_value22 = sheet5['BE26'].value  # δU(−)II, %
-                    cell_value23 = sheet5['BE27'].value  # δU(+)II, %
-
-
-            elif 'Тип СИ' in Check1:
-
-                if sheet2 is not None:
-                    cell_value2 = sheet2['AG35'].value  # Тип СИ ПКЭ
-                    cell_value1 = sheet2['BE35'].value  # Заводской номер СИ ПКЭ
-                    cell_value14 = sheet2['CD35'].value  # Поверка СИ ПКЭ
-
-                    cell_value10 = sheet2['AG36'].value  # Тип СИ
-                    cell_value11 = sheet2['BE36'].value  # Заводской номер СИ
-                    cell_value15 = sheet2['CD36'].value  # Поверка СИ
-
-                    cell_value25 = get_combined_value(str(sheet2['AI2'].value), str(sheet2['A3'].value))
-                    cell_value26 = get_combined_value(str(sheet2['AI4'].value), str(sheet2['A5'].value))
-                    cell_value27 = get_combined_value(str(sheet2['R21'].value), str(sheet2['A22'].value))
-
-                    cell_value5 = format_date(sheet2['M26'].value)  # Начало испытаний
-                    cell_value6 = format_date(sheet2['M27'].value)  # Окончание испытаний
-
-                if sheet1 is not None:
-                    cell_value4 = sheet1['A35'].value  # Электрические сети
-                    cell_value4_1 = sheet1['A36'].value  # Электрические сети
-                    cell_value9 = sheet1['BC29'].value  # Номер протокола
-                    cell_value12 = format_date(sheet1['BU24'].value)  # Дата протокола
-
-                if sheet4 is not None:
-                    cell_value18 = sheet4['G6'].value  # Начало интервала наибольших нагрузок
-                    cell_value19 = sheet4['H6'].value  # Конец интервала наибольших нагрузок
-                    cell_value18_1 = sheet4['G7'].value  # Начало интервала наибольших нагрузок 2
-                    cell_value19_1 = sheet4['H7'].value  # Конец интервала наибольших нагрузок 2
-
-                if sheet5 is not None:
-                    cell_value20 = sheet5['BE16'].value  # δU(−)I, %
-                    cell_value21 = sheet5['BE17'].value  # δU(+)I, %
-                    cell_value22 = sheet5['BE26'].value  # δU(−)II, %
-                    cell_value23 = sheet5['BE27'].value  # δU(+)II, %
-
-
-            if cell_value4_1 is not None:
-                cell_value4 = str(cell_value4) + ' ' + str(cell_value4_1)
-
-            if cell_value9 is not None:
-                Protocol_Num0 = cell_value9.split('/')
-                Protocol_Num = Protocol_Num0[0] + ',' + Protocol_Num0[1]
-            else:
-                Protocol_Num = '-'
-
-            # Запись данных в первый лист
-            output_sheet[f'D{row_index}'] = cell_value4  # Электрические сети
-            output_sheet[f'E{row_index}'] = cell_value9  # Номер протокола
-            output_sheet[f'G{row_index}'] = cell_value12  # Дата протокола
-            output_sheet[f'H{row_index}'] = cell_value13  # Центр питания
-            output_sheet[f'I{row_index}'] = cell_value8  # Место в схеме
-            output_sheet[f'J{row_index}'] = cell_value5  # Дата начала испытаний
-            output_sheet[f'K{row_index}'] = cell_value6  # Дата окончания испытаний
-            output_sheet[f'L{row_index}'] = cell_value2  # Тип СИ ПКЭ
-            output_sheet[f'M{row_index}'] = cell_value1  # Заводской № ПКЭ
-            output_sheet[f'N{row_index}'] = cell_value14  # Поверка СИ ПКЭ
-            output_sheet[f'O{row_index}'] = cell_value10  # Тип СИ
-            output_sheet[f'P{row_index}'] = cell_value11  # Заводской № СИ
-            output_sheet[f'Q{row_index}'] = cell_value15  # Поверка СИ
-            output_sheet[f'R{row_index}'] = cell_value16  # dU(-)
-            output_sheet[f'S{row_index}'] = cell_value17  # dU(+)
-            output_sheet[f'T{row_index}'] = cell_value18  # Начало интервала наибольших нагрузок 1
-            output_sheet[f'U{row_index}'] = cell_value19  # Конец интервала наибольших нагрузок 1
-            output_sheet[f'V{row_index}'] = cell_value18_1  # Начало интервала наибольших нагрузок 1
-            output_sheet[f'W{row_index}'] = cell_value19_1  # Конец интервала наибольших нагрузок 1
-            output_sheet[f'X{row_index}'] = cell_value21  # δU(+)I, %
-            output_sheet[f'Y{row_index}'] = cell_value20  # δU(−)I, %
-            output_sheet[f'Z{row_index}'] = cell_value23  # δU(+)II, %
-            output_sheet[f'AA{row_index}'] = cell_value22  # δU(−)II, %
-
-            output_sheet[f'AE{row_index}'] = cell_value24  #
-            output_sheet[f'AB{row_index}'] = cell_value25  #
-            output_sheet[f'AC{row_index}'] = cell_value26  #
-            output_sheet[f'AD{row_index}'] = cell_value27  #
-
-
-            output_sheet[f'AG{row_index}'] = Protocol_Num  # Порядковый номер протокола
-
-            row_index += 1
-
-        except FileNotFoundError:
-            messagebox.showerror("Ошибка", f"Файл не найден: {file_path}")
-            update_status(f"Ошибка: Файл не найден - {os.path.basename(file_path)}")
+            reestr_output = open_reestr_output(action, reestr_path, upsert=upsert)
         except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при обработке файла {os.path.basename(file_path)}: {e}")
-            update_status(f"Ошибка при обработке {os.path.basename(file_path)}: {e}")
+            output.close()
+            source = reestr_path if action == "existing" else REESTR_TEMPLATE_FILE_PATH
+            messagebox.showerror("Ошибка", f"Ошибка при открытии файла {source}: {e}")
+            update_status(f"Ошибка: Не удалось открыть файл - {source}. Ошибка: {e}")
+            return
 
-        # Обновление прогресс-бара (основной поток)
-        root.after(0, update_progress)
+    progress_bar['maximum'] = len(file_paths)
+    progress_bar['value'] = 0
 
     try:
-        update_status("Сохранение файла...")
-        output_workbook.save(save_path)
-        messagebox.showinfo("Успех", f"Данные успешно записаны в файл: {save_path}")
-        update_status(f"Данные успешно записаны в файл: {save_path}")
+        saved, summary = export_protocols(
+            list(file_paths), output, save_path, WindowEvents(), workers=workers, engine=engine,
+            use_cache=use_cache, long_batch=long_batch, prefetch=prefetch, timing=timing, columns=columns,
+            columnar=columnar, reestr_output=reestr_output, reestr_path=reestr_path)
+        if saved:
+            messagebox.showinfo("Успех", f"Данные успешно записаны в файл: {save_path}\n{summary}")
+            update_status(f"Данные успешно записаны в файл: {save_path}")
+        else:
+            messagebox.showinfo("Внимание", f"Новых или измененных протоколов нет, файл не изменен: {save_path}\n{summary}")
+            update_status(f"Файл не изменен: {save_path}")
 
     except Exception as e:
         messagebox.showerror("Ошибка", f"Ошибка при сохранении файла: {e}")
         update_status(f"Ошибка при сохранении файла: {e}")
     finally:
-        output_workbook.close()
         update_status("Обработка завершена.")
 
     root.after(0, processing_complete)  # Сообщение о завершении
@@ -495,9 +208,61 @@ def drop(event):
     update_status("Файлы добавлены перетаскиванием.")
 
 
+def choose_columns():
+    """Окно выбора заполняемых столбцов выходной таблицы."""
+    dialog = tk.Toplevel(root)
+    dialog.title("Заполняемые столбцы")
+    dialog.configure(bg=BG_COLOR)
+    dialog.transient(root)
+    dialog.grab_set()
+
+    column_vars = {}
+    columns_frame = ttk.Frame(dialog, padding=10)
+    columns_frame.pack(fill="both", expand=True)
+    rows_per_column = (len(OUTPUT_COLUMNS) + 1) // 2
+    for index, column in enumerate(OUTPUT_COLUMNS):
+        column_vars[column] = tk.BooleanVar(value=selected_columns is None or column in selected_columns)
+        checkbutton = ttk.Checkbutton(columns_frame, text=f"{column}: {COLUMN_TITLES[column]}", variable=column_vars[column])
+        checkbutton.grid(row=index % rows_per_column, column=index // rows_per_column, sticky="w", padx=5)
+
+    def set_columns(columns):
+        for column, var in column_vars.items():
+            var.set(column in columns)
+
+    def apply():
+        global selected_columns
+        columns = [column for column, var in column_vars.items() if var.get()]
+        if not columns:
+            messagebox.showinfo("Внимание", "Не выбран ни один столбец.", parent=dialog)
+            return
+        selected_columns = None if len(columns) == len(OUTPUT_COLUMNS) else columns
+        update_columns_label()
+        dialog.destroy()
+
+    buttons_frame = ttk.Frame(dialog, padding=10)
+    buttons_frame.pack(fill="x")
+    create_button(buttons_frame, "Все", lambda: set_columns(OUTPUT_COLUMNS), 10).pack(side="left", padx=5)
+    create_button(buttons_frame, "Номер и даты", lambda: set_columns(QUICK_COLUMNS), 12).pack(side="left", padx=5)
+    create_button(buttons_frame, "Применить", apply, 10).pack(side="right", padx=5)
+
+
+def update_columns_label():
+    """Обновляет подпись с числом выбранных столбцов."""
+    if selected_columns is None:
+        columns_label.config(text="Столбцы: все")
+    else:
+        columns_label.config(text=f"Столбцы: {len(selected_columns)} из {len(OUTPUT_COLUMNS)}")
+
+
 def start_processing_thread(action):
     """Запуск обработки в отдельном потоке."""
-    thread = threading.Thread(target=process_files, args=(action,))
+    try:
+        workers = max(1, workers_var.get())
+    except tk.TclError:
+        workers = 1
+    thread = threading.Thread(target=process_files, args=(action, workers, engine_var.get(), cache_var.get(), upsert_var.get(),
+                                                          long_batch_var.get(), prefetch_var.get(), timing_var.get(),
+                                                          selected_columns, columnar_var.get() or None, reestr_var.get()))
     thread.start()
 
 def create_button(parent, text, command, width=20):
@@ -522,112 +287,185 @@ def create_button(parent, text, command, width=20):
     button.bind("<Leave>", lambda e: button.config(bg=BUTTON_COLOR))
     return button
 
-# == UI Setup ==
-root = TkinterDnD.Tk()  # Инициализируем TkinterDnD
-root.title("Excel File Transfer")
-root.geometry("700x700")  # Немного увеличил высоту окна
-root.configure(bg=BG_COLOR)
-
-# Стиль для рамок
-style = ttk.Style()
-style.configure("TFrame", background=BG_COLOR)
-style.configure("TLabel", background=BG_COLOR, foreground=TEXT_COLOR, font=("Arial", 10))
-style.configure("TButton", font=("Arial", 10, "bold"), padding=5)
-
-# Главная рамка
-main_frame = ttk.Frame(root, padding=20)
-main_frame.pack(expand=True, fill="both")
-
-# Заголовок
-header_label = ttk.Label(
-    main_frame,
-    text="Обработка файлов Excel",
-    font=("Arial", 14, "bold"),
-    foreground=TEXT_COLOR
-)
-header_label.pack(pady=(0, 15))
-
-# Рамка для выбора файлов - теперь занимает больше места
-file_frame = ttk.LabelFrame(main_frame, text=" Выбор файлов ", padding=10)
-file_frame.pack(fill="both", expand=True, pady=5)  # Изменил на fill="both" и expand=True
-
-# Кнопка выбора файлов (сделал немного меньше)
-choose_button = create_button(file_frame, "Выбрать файлы", choose_files, 20)  # Уменьшил ширину
-choose_button.pack(pady=5)
-
-# Подпись для области перетаскивания
-drag_label = ttk.Label(file_frame, text="или перетащите файлы в область ниже:")
-drag_label.pack()
-
-# Список файлов - теперь больше по размеру
-file_list = tk.Listbox(
-    file_frame,
-    height=12,  # Увеличил высоту
-    bg=LISTBOX_COLOR,
-    relief="solid",
-    borderwidth=1,
-    font=("Arial", 10)
-)
-file_list.pack(fill="both", expand=True, pady=5)  # Теперь расширяется во все стороны
-
-# Привязка события Drop к Listbox
-file_list.drop_target_register(DND_FILES)
-file_list.dnd_bind('<<Drop>>', drop)
-
-# Рамка для кнопок управления файлами (сделал кнопки меньше)
-control_frame = ttk.Frame(file_frame)
-control_frame.pack(fill="x", pady=5)
-
-# Кнопки управления списком (уменьшил ширину)
-delete_button = create_button(control_frame, "Удалить выбранный", delete_selected_file, 15)
-delete_button.pack(side="left", padx=5, expand=True)
-
-clear_button = create_button(control_frame, "Очистить список", clear_file_list, 15)
-clear_button.pack(side="left", padx=5, expand=True)
-
-# Рамка для действий (сделал меньше)
-action_frame = ttk.LabelFrame(main_frame, text=" Действия ", padding=10)
-action_frame.pack(fill="x", pady=5)
-
-# Кнопки действий (сделал немного меньше)
-new_button = create_button(action_frame, "Создать новую таблицу", lambda: start_processing_thread("new"), 20)
-new_button.pack(pady=5)
-
-existing_button = create_button(action_frame, "Добавить в существующую", lambda: start_processing_thread("existing"), 20)
-existing_button.pack(pady=5)
-
-# Рамка для прогресса (оставил как было)
-progress_frame = ttk.LabelFrame(main_frame, text=" Прогресс ", padding=10)
-progress_frame.pack(fill="x", pady=5)
-
-# Остальной код остается без изменений...
-
-# Прогресс-бар
-progress_bar = ttk.Progressbar(
-    progress_frame,
-    orient="horizontal",
-    length=100,
-    mode="determinate",
-    style="custom.Horizontal.TProgressbar"
-)
-style.configure("custom.Horizontal.TProgressbar", troughcolor=BG_COLOR, background=PROGRESS_COLOR)
-progress_bar.pack(fill="x", pady=5)
-
-# Метка статуса
-status_label = ttk.Label(
-    progress_frame,
-    text="Ожидание выбора файлов.",
-    anchor="center",
-    font=("Arial", 9),
-    wraplength=600
-)
-status_label.pack(fill="x", pady=5)
-
-# Переменная списка файлов
-file_paths = []
-
-# Инициализация статуса
-update_status("Ожидание выбора файлов.")
-
-# Запуск UI
-root.mainloop()
\ No newline at end of file
+
+if __name__ == "__main__":
+    # Нужно для пула процессов в собранном PyInstaller exe
+    multiprocessing.freeze_support()
+
+    # С аргументами командной строки выгрузка идет без окна (см. protocol_export.main)
+    if len(sys.argv) > 1:
+        sys.exit(protocol_export.main())
+
+    # == UI Setup ==
+    root = TkinterDnD.Tk()  # Инициализируем TkinterDnD
+    root.title("Excel File Transfer")
+    root.geometry("700x700")  # Немного увеличил высоту окна
+    root.configure(bg=BG_COLOR)
+
+    # Стиль для рамок
+    style = ttk.Style()
+    style.configure("TFrame", background=BG_COLOR)
+    style.configure("TLabel", background=BG_COLOR, foreground=TEXT_COLOR, font=("Arial", 10))
+    style.configure("TButton", font=("Arial", 10, "bold"), padding=5)
+
+    # Главная рамка
+    main_frame = ttk.Frame(root, padding=20)
+    main_frame.pack(expand=True, fill="both")
+
+    # Заголовок
+    header_label = ttk.Label(
+        main_frame,
+        text="Обработка файлов Excel",
+        font=("Arial", 14, "bold"),
+        foreground=TEXT_COLOR
+    )
+    header_label.pack(pady=(0, 15))
+
+    # Рамка для выбора файлов - теперь занимает больше места
+    file_frame = ttk.LabelFrame(main_frame, text=" Выбор файлов ", padding=10)
+    file_frame.pack(fill="both", expand=True, pady=5)  # Изменил на fill="both" и expand=True
+
+    # Кнопка выбора файлов (сделал немного меньше)
+    choose_button = create_button(file_frame, "Выбрать файлы", choose_files, 20)  # Уменьшил ширину
+    choose_button.pack(pady=5)
+
+    # Подпись для области перетаскивания
+    drag_label = ttk.Label(file_frame, text="или перетащите файлы в область ниже:")
+    drag_label.pack()
+
+    # Список файлов - теперь больше по размеру
+    file_list = tk.Listbox(
+        file_frame,
+        height=12,  # Увеличил высоту
+        bg=LISTBOX_COLOR,
+        relief="solid",
+        borderwidth=1,
+        font=("Arial", 10)
+    )
+    file_list.pack(fill="both", expand=True, pady=5)  # Теперь расширяется во все стороны
+
+    # Привязка события Drop к Listbox
+    file_list.drop_target_register(DND_FILES)
+    file_list.dnd_bind('<<Drop>>', drop)
+
+    # Рамка для кнопок управления файлами (сделал кнопки меньше)
+    control_frame = ttk.Frame(file_frame)
+    control_frame.pack(fill="x", pady=5)
+
+    # Кнопки управления списком (уменьшил ширину)
+    delete_button = create_button(control_frame, "Удалить выбранный", delete_selected_file, 15)
+    delete_button.pack(side="left", padx=5, expand=True)
+
+    clear_button = create_button(control_frame, "Очистить список", clear_file_list, 15)
+    clear_button.pack(side="left", padx=5, expand=True)
+
+    # Рамка для действий (сделал меньше)
+    action_frame = ttk.LabelFrame(main_frame, text=" Действия ", padding=10)
+    action_frame.pack(fill="x", pady=5)
+
+    # Кнопки действий (сделал немного меньше)
+    new_button = create_button(action_frame, "Создать новую таблицу", lambda: start_processing_thread("new"), 20)
+    new_button.pack(pady=5)
+
+    existing_button = create_button(action_frame, "Добавить в существующую", lambda: start_processing_thread("existing"), 20)
+    existing_button.pack(pady=5)
+
+    # Число процессов для разбора файлов (1 - обработка в одном потоке, как раньше)
+    workers_frame = ttk.Frame(action_frame)
+    workers_frame.pack(pady=5)
+    workers_label = ttk.Label(workers_frame, text="Процессов для обработки:")
+    workers_label.pack(side="left", padx=5)
+    workers_var = tk.IntVar(value=1)
+    workers_spinbox = ttk.Spinbox(workers_frame, from_=1, to=os.cpu_count() or 1, textvariable=workers_var, width=5)
+    workers_spinbox.pack(side="left")
+
+    # Движок чтения протоколов: openpyxl или прямой разбор XML
+    engine_label = ttk.Label(workers_frame, text="Движок чтения:")
+    engine_label.pack(side="left", padx=5)
+    engine_var = tk.StringVar(value=DEFAULT_ENGINE)
+    engine_combobox = ttk.Combobox(workers_frame, textvariable=engine_var, values=list(ENGINES), state="readonly", width=10)
+    engine_combobox.pack(side="left")
+
+    # Локальный кэш извлеченных данных: повторный запуск по тем же папкам не разбирает неизменившиеся файлы
+    cache_var = tk.BooleanVar(value=True)
+    cache_checkbutton = ttk.Checkbutton(action_frame, text="Использовать кэш протоколов", variable=cache_var)
+    cache_checkbutton.pack(pady=5)
+
+    # Дозапись без дубликатов: уже внесенные протоколы пропускаются или обновляются
+    upsert_var = tk.BooleanVar(value=True)
+    upsert_checkbutton = ttk.Checkbutton(action_frame, text="Не дублировать уже внесенные протоколы", variable=upsert_var)
+    upsert_checkbutton.pack(pady=5)
+
+    # Длинная пачка: ограничение открытых книг и контроль памяти
+    long_batch_var = tk.BooleanVar(value=False)
+    long_batch_checkbutton = ttk.Checkbutton(action_frame, text="Длинная пачка (контроль памяти и дескрипторов)", variable=long_batch_var)
+    long_batch_checkbutton.pack(pady=5)
+
+    # Предварительное копирование файлов с сетевого диска во временную папку
+    prefetch_var = tk.BooleanVar(value=True)
+    prefetch_checkbutton = ttk.Checkbutton(action_frame, text="Копировать файлы локально перед обработкой", variable=prefetch_var)
+    prefetch_checkbutton.pack(pady=5)
+
+    # Отчет о времени обработки по файлам (CSV рядом с выходной таблицей)
+    timing_var = tk.BooleanVar(value=True)
+    timing_checkbutton = ttk.Checkbutton(action_frame, text="Сохранять время обработки по файлам", variable=timing_var)
+    timing_checkbutton.pack(pady=5)
+
+    # Заполнение реестра применения СИ за тот же проход по протоколам
+    reestr_var = tk.BooleanVar(value=False)
+    reestr_checkbutton = ttk.Checkbutton(action_frame, text="Заполнять также реестр применения СИ", variable=reestr_var)
+    reestr_checkbutton.pack(pady=5)
+
+    # Выбор заполняемых столбцов: для быстрых выборок читаются только нужные листы
+    columns_frame = ttk.Frame(action_frame)
+    columns_frame.pack(pady=5)
+    columns_button = create_button(columns_frame, "Столбцы...", choose_columns, 12)
+    columns_button.pack(side="left", padx=5)
+    columns_label = ttk.Label(columns_frame, text="Столбцы: все")
+    columns_label.pack(side="left", padx=5)
+    selected_columns = None
+
+    # Дополнительная столбцовая выгрузка для анализа (Parquet или CSV рядом с таблицей)
+    columnar_frame = ttk.Frame(action_frame)
+    columnar_frame.pack(pady=5)
+    columnar_label = ttk.Label(columnar_frame, text="Выгрузка для анализа:")
+    columnar_label.pack(side="left", padx=5)
+    columnar_var = tk.StringVar(value="")
+    columnar_combobox = ttk.Combobox(columnar_frame, textvariable=columnar_var, values=[""] + list(COLUMNAR_FORMATS), state="readonly", width=10)
+    columnar_combobox.pack(side="left")
+
+    # Рамка для прогресса (оставил как было)
+    progress_frame = ttk.LabelFrame(main_frame, text=" Прогресс ", padding=10)
+    progress_frame.pack(fill="x", pady=5)
+
+    # Остальной код остается без изменений...
+
+    # Прогресс-бар
+    progress_bar = ttk.Progressbar(
+        progress_frame,
+        orient="horizontal",
+        length=100,
+        mode="determinate",
+        style="custom.Horizontal.TProgressbar"
+    )
+    style.configure("custom.Horizontal.TProgressbar", troughcolor=BG_COLOR, background=PROGRESS_COLOR)
+    progress_bar.pack(fill="x", pady=5)
+
+    # Метка статуса
+    status_label = ttk.Label(
+        progress_frame,
+        text="Ожидание выбора файлов.",
+        anchor="center",
+        font=("Arial", 9),
+        wraplength=600
+    )
+    status_label.pack(fill="x", pady=5)
+
+    # Переменная списка файлов
+    file_paths = []
+
+    # Инициализация статуса
+    update_status("Ожидание выбора файлов.")
+
+    # Запуск UI
+    root.mainloop()
@@ -1,29 +1,22 @@
 
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-import openpyxl
 import os
-from datetime import datetime
 import threading
 from tkinterdnd2 import DND_FILES, TkinterDnD
-import shutil
+from protocol_reader import ENGINES, DEFAULT_ENGINE, extract_reestr
+from protocol_export import REESTR_TEMPLATE_FILE_PATH as TEMPLATE_FILE_PATH, open_reestr_output
+from reestr_register import merge_registers
 
-# Путь к файлу-шаблону
-TEMPLATE_FILE_PATH = rf'\\192.168.34.9\линвит\ПОЛЬЗОВАТЕЛИ\USER49\_Реестры применения СИ\Образец\Реестр применения СИ образец.xlsx'
+# Сколько файлов с отсутствующими листами перечислять в итоговом сообщении
+MISSING_FILES_SHOWN = 20
 
-# Функция для форматирования даты
-def format_date(date_value):
-    if isinstance(date_value, datetime):
-        return date_value.strftime("%d.%m.%Y")
-    else:
-        return str(date_value or "")
-
-
-def process_files(action):
+def process_files(action, engine=DEFAULT_ENGINE, upsert=True):
     """
-    Обрабатывает выбранные файлы, используя заранее известный индекс листа.
+    Обрабатывает выбранные файлы и записывает данные на два листа реестра.
+    При upsert в существующий реестр дописываются только новые пары
+    (заводской номер, номер протокола), см. open_reestr_output.
     """
-    global cell_value1, cell_value2, cell_value3, cell_value4, cell_value4_1, cell_value5, cell_value6, cell_value7, cell_value8, cell_value10, cell_value10_1, cell_value9
     update_status("Начало обработки файлов...")  # Обновление статуса
 
     if not file_paths:
@@ -38,9 +31,8 @@ def process_files(action):
             return
 
         try:
-            output_workbook = openpyxl.load_workbook(save_path)
-            output_sheet = output_workbook.worksheets[0]
-            output_sheet1 = output_workbook.worksheets[1]
+            update_status("Чтение заводских номеров из существующего реестра...")
+            output = open_reestr_output(action, save_path, upsert=upsert)
         except FileNotFoundError:
             messagebox.showerror("Ошибка", f"Файл не найден: {save_path}")
             update_status(f"Ошибка: Файл не найден - {save_path}")
@@ -56,19 +48,15 @@ def process_files(action):
             update_status("Обработка прервана пользователем.")
             return
 
-        # Копируем файл шаблона
         try:
-            shutil.copy(TEMPLATE_FILE_PATH, save_path)
-            output_workbook = openpyxl.load_workbook(save_path)
-            output_sheet = output_workbook.worksheets[0]
-            output_sheet1 = output_workbook.worksheets[1]
+            output = open_reestr_output(action, save_path, TEMPLATE_FILE_PATH)
         except FileNotFoundError:
             messagebox.showerror("Ошибка", f"Файл шаблона не найден: {TEMPLATE_FILE_PATH}")
             update_status(f"Ошибка: Файл шаблона не найден - {TEMPLATE_FILE_PATH}")
             return
         except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при копировании шаблона: {e}")
-            update_status(f"Ошибка: Не удалось скопировать шаблон - {TEMPLATE_FILE_PATH}. Ошибка: {e}")
+            messagebox.showerror("Ошибка", f"Ошибка при чтении шаблона: {e}")
+            update_status(f"Ошибка: Не удалось прочитать шаблон - {TEMPLATE_FILE_PATH}. Ошибка: {e}")
             return
 
     else:
@@ -76,135 +64,24 @@ def process_files(action):
         update_status("Ошибка: Некорректное действие.")
         return
 
-    row_index = output_sheet.max_row + 1
-    row_index1 = output_sheet1.max_row + 1
     total_files = len(file_paths)
     progress_bar['maximum'] = total_files
     progress_bar['value'] = 0
+    # Файлы с отсутствующими листами: сообщаются одним списком после обработки
+    missing_files = []
 
     for i, file_path in enumerate(file_paths):
         try:
             update_status(f"Обработка файла {i+1} из {total_files}: {os.path.basename(file_path)}")
 
-            workbook = openpyxl.load_workbook(file_path, data_only=True, read_only=True)
-            worksheets = workbook.sheetnames
-
-            sheet1 = workbook['Титул']
-            sheet2 = workbook['Протокол']
-            sheet3 = workbook['Записи']
-
-            for i in range(0, len(worksheets)):
-                if worksheets[i] == 'Протокол-3пр':
-                    sheet2 = workbook['Протокол-3пр']
-                    sheet3 = workbook['Записи-3пр']
-
-            Check1 = str(sheet2['AG34'].value)
-            Check2 = str(sheet2['AG30'].value)
-            Check3 = str(sheet2['AG32'].value)
-            Check4 = str(sheet2['AG33'].value)
-
-            if 'Тип СИ' in Check4:
-
-                cell_value1 = sheet2['BE34'].value               # Заводской номер 1
-                cell_value2 = sheet2['AG34'].value               # Тип СИ 1
-                cell_value3 = sheet2['R21'].value                # Место нахождения СИ (регион)
-                cell_value4 = sheet1['A32'].value                # Наименование организации, владельца пунктов контроля КЭ
-                cell_value4_1 = sheet1['A33'].value
-                if cell_value4_1 is None:
-                    cell_value4_1 = ''
-                cell_value5 = format_date(sheet2['M25'].value)   # Дата передачи СИ (начало испытаний)
-                cell_value6 = format_date(sheet2['M26'].value)   # Дата возврата СИ (окончание испытаний)
-                cell_value7 = sheet3['BZ37'].value               # Ответственный за прием / возврат СИ (измерения провел)
-                cell_value8 = sheet2['AS19'].value               # Место установки
-                cell_value9 = sheet1['BC26'].value               # Номер протокола
-                cell_value10 = sheet2['AG35'].value              # Тип СИ 2
-                cell_value10_1 = sheet2['BE35'].value            # Заводской номер 2
-
-            if 'Тип СИ' in Check3:
-
-                cell_value1 = sheet2['BE33'].value
-                cell_value2 = sheet2['AG33'].value
-                cell_value3 = sheet2['A19'].value
-                cell_value4 = sheet1['A35'].value
-                cell_value4_1 = sheet1['A36'].value
-                cell_value5 = format_date(sheet2['M24'].value)
-                cell_value6 = format_date(sheet2['M25'].value)
-                cell_value7 = sheet3['BZ37'].value
-                cell_value8 = sheet2['I17'].value
-                cell_value9 = sheet1['BC29'].value
-                cell_value10 = sheet2['AG34'].value
-                cell_value10_1 = sheet2['BE34'].value
-
-            if 'Тип СИ' in Check2:
-
-                cell_value1 = sheet2['BE31'].value
-                cell_value2 = sheet2['AG31'].value
-                cell_value3 = sheet2['A19'].value
-                cell_value4 = sheet1['A35'].value
-                cell_value4_1 = sheet1['A36'].value
-                cell_value5 = format_date(sheet2['M22'].value)
-                cell_value6 = format_date(sheet2['M23'].value)
-                cell_value7 = sheet3['BZ37'].value
-                cell_value8 = sheet2['I18'].value
-                cell_value9 = sheet1['BC29'].value
-                cell_value10 = sheet2['AG32'].value
-                cell_value10_1 = sheet2['BE32'].value
-
-            elif 'Тип СИ' in Check1:
-
-                cell_value1 = sheet2['BE35'].value               # Заводской номер 1
-                cell_value2 = sheet2['AG35'].value               # Тип СИ 1
-                cell_value3 = sheet2['R21'].value                # Место нахождения СИ (регион)
-                cell_value4 = sheet1['A35'].value                # Наименование организации, владельца пунктов контроля КЭ
-                cell_value4_1 = sheet1['A36'].value
-                if cell_value4_1 is None:
-                    cell_value4_1 = ''
-                cell_value5 = format_date(sheet2['M26'].value)   # Дата передачи СИ (начало испытаний)
-                cell_value6 = format_date(sheet2['M27'].value)   # Дата возврата СИ (окончание испытаний)
-                cell_value7 = sheet3['BZ37'].value               # Ответственный за прием / возврат СИ (измерения провел)
-                cell_value8 = sheet2['AS19'].value               # Место установки
-                cell_value9 = sheet1['BC29'].value               # Номер протокола
-                cell_value10 = sheet2['AG36'].value              # Тип СИ 2
-                cell_value10_1 = sheet2['BE36'].value            # Заводской номер 2
-
-            PorNum0 = cell_value9.split('/')
-            PorNum = PorNum0[0] + ',' + PorNum0[1]
-
-            # Запись данных в первый лист
-            output_sheet[f'C{row_index}'] = cell_value1
-            output_sheet[f'D{row_index}'] = cell_value2
-            output_sheet[f'F{row_index}'] = cell_value3
-            if cell_value4_1 is None:
-                output_sheet[f'G{row_index}'] = str(cell_value4)
-            else:
-                output_sheet[f'G{row_index}'] = str(cell_value4) + ' ' + str(cell_value4_1)
-            output_sheet[f'H{row_index}'] = cell_value5
-            output_sheet[f'I{row_index}'] = cell_value6
-            output_sheet[f'J{row_index}'] = cell_value7
-            output_sheet[f'O{row_index}'] = cell_value8
-            output_sheet[f'P{row_index}'] = cell_value9
-            output_sheet[f'Q{row_index}'] = str(cell_value10) + ' Зав.№: ' + str(cell_value10_1)
-            output_sheet[f'S{row_index}'] = PorNum
-
-            # Запись данных во второй лист
-            output_sheet1[f'C{row_index1}'] = cell_value10_1
-            output_sheet1[f'D{row_index1}'] = cell_value10
-            output_sheet1[f'F{row_index1}'] = cell_value3
-            if cell_value4_1 is None:
-                output_sheet1[f'G{row_index1}'] = str(cell_value4)
-            else:
-                output_sheet1[f'G{row_index1}'] = str(cell_value4) + ' ' + str(cell_value4_1)
-            output_sheet1[f'H{row_index1}'] = cell_value5
-            output_sheet1[f'I{row_index1}'] = cell_value6
-            output_sheet1[f'J{row_index1}'] = cell_value7
-            output_sheet1[f'O{row_index1}'] = cell_value8
-            output_sheet1[f'P{row_index1}'] = cell_value9
-            output_sheet1[f'Q{row_index1}'] = str(cell_value2) + ' Зав.№: ' + str(cell_value1)
-            output_sheet1[f'S{row_index1}'] = PorNum
-
-            row_index += 1
-            row_index1 += 1
+            record = extract_reestr(file_path, engine)
+            row, row1 = record['rows']
+            if record['missing_sheets']:
+                missing_files.append(f"{os.path.basename(file_path)}: {', '.join(record['missing_sheets'])}")
 
+            # Запись данных в первый и второй листы
+            output.write(row, 0)
+            output.write(row1, 1)
 
         except FileNotFoundError:
             messagebox.showerror("Ошибка", f"Файл не найден: {file_path}")
@@ -216,24 +93,55 @@ def process_files(action):
         # Обновление прогресс-бара (основной поток)
         root.after(0, update_progress)
 
+    if missing_files:
+        shown = "\n".join(missing_files[:MISSING_FILES_SHOWN])
+        more = f"\nи еще {len(missing_files) - MISSING_FILES_SHOWN}" if len(missing_files) > MISSING_FILES_SHOWN else ""
+        messagebox.showwarning("Предупреждение", f"В {len(missing_files)} файлах отсутствуют листы, "
+                                                 f"соответствующие данные заменены на '---':\n{shown}{more}")
+
     try:
         update_status("Сохранение файла...")
 
-        output_workbook.save(save_path)
-
-        messagebox.showinfo("Успех", f"Данные успешно записаны в файл: {save_path}")
-        update_status(f"Данные успешно записаны в файл: {save_path}")
+        if output.save():
+            messagebox.showinfo("Успех", f"Данные успешно записаны в файл: {save_path}\n{output.summary()}")
+            update_status(f"Данные успешно записаны в файл: {save_path}")
+        else:
+            messagebox.showinfo("Внимание", f"Новых или измененных записей нет, файл не изменен: {save_path}\n{output.summary()}")
+            update_status(f"Файл не изменен: {save_path}")
 
     except Exception as e:
         messagebox.showerror("Ошибка", f"Ошибка при сохранении файла: {e}")
         update_status(f"Ошибка при сохранении файла: {e}")
     finally:
-        output_workbook.close()
+        output.close()
         update_status("Обработка завершена.")
 
     root.after(0, processing_complete)  # Сообщение о завершении
 
 
+def merge_files():
+    """Объединяет несколько реестров применения СИ в новый реестр по шаблону."""
+    register_paths = filedialog.askopenfilenames(filetypes=[("Excel files", "*.xlsx")], title="Выберите реестры для объединения")
+    if not register_paths:
+        return
+    save_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")],
+                                             title="Сохранить объединенный реестр")
+    if not save_path:
+        update_status("Объединение прервано пользователем.")
+        return
+
+    try:
+        summary = merge_registers(list(register_paths), save_path, TEMPLATE_FILE_PATH, status=update_status)
+        messagebox.showinfo("Успех", f"Объединенный реестр записан в файл: {save_path}\n{summary}")
+        update_status(f"Объединенный реестр записан в файл: {save_path}")
+    except FileNotFoundError:
+        messagebox.showerror("Ошибка", f"Файл шаблона не найден: {TEMPLATE_FILE_PATH}")
+        update_status(f"Ошибка: Файл шаблона не найден - {TEMPLATE_FILE_PATH}")
+    except Exception as e:
+        messagebox.showerror("Ошибка", f"Ошибка при объединении реестров: {e}")
+        update_status(f"Ошибка при объединении реестров: {e}")
+
+
 def update_progress():
     """Обновляет значение прогресс-бара."""
     progress_bar['value'] += 1
@@ -296,7 +204,13 @@ def drop(event):
 
 def start_processing_thread(action):
     """Запуск обработки в отдельном потоке."""
-    thread = threading.Thread(target=process_files, args=(action,))
+    thread = threading.Thread(target=process_files, args=(action, engine_var.get(), upsert_var.get()))
+    thread.start()
+
+
+def start_merge_thread():
+    """Запуск объединения реестров в отдельном потоке."""
+    thread = threading.Thread(target=merge_files)
     thread.start()
 
 
@@ -353,6 +267,24 @@ existing_button = ttk.Button(action_button_frame, text="Добавить в су
 existing_button.pack(expand=True, fill="x")
 existing_button.config(width=button_width)
 
+merge_button = ttk.Button(action_button_frame, text="Объединить реестры...", command=start_merge_thread, style="TButton")
+merge_button.pack(expand=True, fill="x")
+merge_button.config(width=button_width)
+
+# Движок чтения протоколов
+engine_frame = ttk.Frame(frame)
+engine_frame.pack(pady=5)
+engine_label = ttk.Label(engine_frame, text="Движок чтения:")
+engine_label.pack(side="left")
+engine_var = tk.StringVar(value=DEFAULT_ENGINE)
+engine_combobox = ttk.Combobox(engine_frame, textvariable=engine_var, values=list(ENGINES), state="readonly", width=10)
+engine_combobox.pack(side="left")
+
+# Дозапись в существующий реестр без повторов
+upsert_var = tk.BooleanVar(value=True)
+upsert_checkbutton = ttk.Checkbutton(frame, text="Не дублировать уже внесенные СИ и протоколы", variable=upsert_var)
+upsert_checkbutton.pack(pady=5)
+
 # Прогресс-бар
 progress_bar = ttk.Progressbar(frame, orient="horizontal", length=300, mode="determinate")
 progress_bar.pack(pady=10)
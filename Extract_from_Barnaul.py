@@ -1,8 +1,6 @@
 import re
 import pandas as pd
-from docx import Document
-from docx.table import Table
-from docx.text.paragraph import Paragraph
+from docx_reader import read_docx
 
 def extract_si_table_data(block):
     """
@@ -17,20 +15,19 @@ def extract_si_table_data(block):
     def before_comma(text):
         return text.split(",")[0].strip()
 
-    for el in block:
-        if isinstance(el, Table):
-            first_cell_text = el.cell(0, 0).text.strip().lower()
+    for kind, el in block:
+        if kind == 'tbl' and el and el[0]:
+            first_cell_text = el[0][0].strip().lower()
             if "наименование си" in first_cell_text:
-                rows = el.rows
+                rows = el
                 if len(rows) < 3:
                     return si_data
 
                 def extract_columns(row):
-                    cells = row.cells
                     cols = []
                     for idx in [1, 2, 3, 4]:
-                        if idx < len(cells):
-                            cols.append(before_comma(cells[idx].text.strip()))
+                        if idx < len(row):
+                            cols.append(before_comma(row[idx].strip()))
                         else:
                             cols.append("")
                     return cols
@@ -64,15 +61,8 @@ def extract_si_table_data(block):
 
 
 # === 1. Загружаем документ ===
-doc = Document(r"U:\Протоколы лето 2024.docx")  # <-- замени путь
-
-# === 2. Собираем все элементы в теле документа ===
-elements = []
-for block in doc.element.body:
-    if block.tag.endswith("tbl"):
-        elements.append(Table(block, doc))
-    elif block.tag.endswith("p"):
-        elements.append(Paragraph(block, doc))
+# === 2. Все элементы тела документа: ('p', текст) и ('tbl', строки с текстами ячеек) ===
+elements = read_docx(r"U:\Протоколы лето 2024.docx").blocks  # <-- замени путь
 
 # === 3. Разбиваем по блокам (начало — таблица с "Заказчик:")
 blocks = []
@@ -80,11 +70,11 @@ current_block = []
 is_first = True
 
 for el in elements:
-    text = ""
-    if isinstance(el, Table):
-        text = "\n".join(cell.text.strip() for row in el.rows for cell in row.cells)
-    elif isinstance(el, Paragraph):
-        text = el.text.strip()
+    kind, content = el
+    if kind == 'tbl':
+        text = "\n".join(cell_text.strip() for row in content for cell_text in row)
+    else:
+        text = content.strip()
 
     if "Заказчик:" in text:
         if not is_first and current_block:
@@ -117,15 +107,15 @@ for i, block in enumerate(blocks):
 
     block_text = ""
 
-    for el in block:
-        if isinstance(el, Table):
-            table_text = "\n".join(cell.text.strip() for row in el.rows for cell in row.cells)
+    for kind, el in block:
+        if kind == 'tbl':
+            table_text = "\n".join(cell_text.strip() for row in el for cell_text in row)
 
             # Таблица с "Заказчик:" — берём дату из последней строки, правой ячейки
             if "Заказчик:" in table_text:
-                last_row = el.rows[-1]
-                if len(last_row.cells) > 0:
-                    raw_date = last_row.cells[-1].text.strip().lower()
+                last_row = el[-1]
+                if len(last_row) > 0:
+                    raw_date = last_row[-1].strip().lower()
                     match = re.search(r"(\d{1,2})\s+([а-яё]+)\s+(\d{4})", raw_date)
                     if match:
                         day, month_str, year = match.groups()
@@ -133,20 +123,19 @@ for i, block in enumerate(blocks):
                         if month:
                             protocol_date = f"{int(day):02d}.{month}.{year}"
 
-            for row in el.rows:
-                cells = row.cells
+            for cells in el:
                 # Номер протокола (в таблице 1×2)
                 if len(cells) == 2:
-                    left = cells[0].text.strip().upper()
-                    right = cells[1].text.strip()
+                    left = cells[0].strip().upper()
+                    right = cells[1].strip()
                     if "ПРОТОКОЛ" in left and not protocol_value:
                         protocol_value = right
                 # Добавляем весь текст таблицы
-                for cell in row.cells:
-                    block_text += " " + cell.text.strip()
+                for cell_text in cells:
+                    block_text += " " + cell_text.strip()
 
-        elif isinstance(el, Paragraph):
-            block_text += " " + el.text.strip()
+        else:
+            block_text += " " + el.strip()
 
     # Место в схеме
     place_match = re.search(r"Место \(обозначение\) в схеме:\s*(.*?)\s*Uн", block_text)
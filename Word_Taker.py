@@ -1,12 +1,30 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinterdnd2 import TkinterDnD, DND_FILES
-import docx
 import openpyxl
 from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
 import os
+import queue
 import threading
-import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from certificate_reader import HEADERS, convert_certificates, read_certificate_task
+from export_workbook import ColumnStyles, RegisterUpsert, write_row
+
+# Столбцы таблицы (по HEADERS); номер сертификата - в столбце A
+COLUMNS = [get_column_letter(index) for index in range(1, len(HEADERS) + 1)]
+KEY_COLUMNS = ('A',)
+
+# Оформление ячеек с данными: перенос текста и выравнивание по верху
+CELL_STYLES = {column: {'alignment': Alignment(wrap_text=True, vertical='top')} for column in COLUMNS}
+
+# Сколько прочитанных сертификатов разбирать одной пачкой (convert_certificates)
+PARSE_BATCH_SIZE = 20
+
+# Как часто главный поток забирает из очереди результаты фонового разбора, мс
+POLL_INTERVAL_MS = 100
 
 
 
@@ -80,6 +98,24 @@ class WordToExcelConverter(TkinterDnD.Tk):
         ttk.Button(process_frame, text="Добавить в файл",
                    command=lambda: self.start_processing("existing")).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
 
+        # Потоковое чтение: разбор документа прекращается, как только найдены все реквизиты
+        self.streaming_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(main_frame, text="Быстрое чтение (только до найденных реквизитов)",
+                        variable=self.streaming_var).pack(anchor=tk.W, pady=(10, 0))
+
+        # При добавлении в файл уже внесенные сертификаты обновляются, а не дублируются
+        self.upsert_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(main_frame, text="Не дублировать уже внесенные сертификаты",
+                        variable=self.upsert_var).pack(anchor=tk.W)
+
+        # Число процессов: при нескольких документы разбираются параллельно
+        workers_frame = ttk.Frame(main_frame)
+        workers_frame.pack(anchor=tk.W, pady=(5, 0))
+        ttk.Label(workers_frame, text="Процессов для обработки:").pack(side=tk.LEFT, padx=(0, 5))
+        self.workers_var = tk.IntVar(value=1)
+        ttk.Spinbox(workers_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.workers_var,
+                    width=5).pack(side=tk.LEFT)
+
         # Прогресс и статус
         self.progress = ttk.Progressbar(main_frame, orient="horizontal", mode="determinate")
         self.progress.pack(fill=tk.X, pady=(15, 5))
@@ -145,195 +181,172 @@ class WordToExcelConverter(TkinterDnD.Tk):
             messagebox.showwarning("Внимание", "Сначала выберите файлы!")
             return
 
-        thread = threading.Thread(target=self.process_files, args=(action,), daemon=True)
-        thread.start()
-
+        if action == "new":
+            save_path = filedialog.asksaveasfilename(
+                defaultextension=".xlsx",
+                filetypes=[("Excel Files", "*.xlsx")],
+                title="Сохранить новую таблицу как"
+            )
+        else:
+            save_path = filedialog.askopenfilename(
+                filetypes=[("Excel Files", "*.xlsx")],
+                title="Выберите существующий файл Excel"
+            )
+        if not save_path:
+            self.update_status("Обработка отменена")
+            return
 
-    def extract_data_from_word(self, filepath):
         try:
-            doc = docx.Document(filepath)
-
-            z_data = []
-            i_data = []
-            p_data = []
-
-
-            for table in doc.tables:
-                for row_idx, row in enumerate(table.rows):
-                    row_text = [cell.text.strip() for cell in row.cells]
-
-                    if row_idx == 5:
-                        p_data.append(row_text[5])
-
-                    # Проверяем каждую ячейку в строке на наличие ключевых слов
-                    for cell_idx, cell in enumerate(row.cells):
-                        text = cell.text.strip().lower()
-
-                        if "заявитель" in text:
-                            # Собираем 4 следующие строки из первого столбца
-                            for j in range(1, 5):
-                                if row_idx + j < len(table.rows):
-                                    if table.rows[row_idx + j].cells:  # Проверяем, что есть ячейки
-                                        z_data.append(table.rows[row_idx + j].cells[0].text.strip())
-
-                        elif "изготовитель" in text:
-                            # Собираем 4 следующие строки из первого столбца
-                            for j in range(1, 5):
-                                if row_idx + j < len(table.rows):
-                                    if table.rows[row_idx + j].cells:  # Проверяем, что есть ячейки
-                                        i_data.append(table.rows[row_idx + j].cells[0].text.strip())
-
-
-            # Объединяем данные в строки с переносами
-            z_result = " ".join(z_data[:4]) if z_data else ""
-            i_result = " ".join(i_data[:4]) if i_data else ""
-            p_result = p_data
-
-            print(z_result, i_result, p_result)
-            return z_result, i_result, p_result
-
+            workers = max(1, self.workers_var.get())
+        except tk.TclError:
+            workers = 1
+        self.update_status("Начало обработки...")
+        try:
+            self.open_output(action, save_path, self.upsert_var.get())
         except Exception as e:
-            self.update_status(f"Ошибка при обработке {os.path.basename(filepath)}: {str(e)}")
-            return None, None
-
-
-    def split_z_result(self, z_result):
-        parts = ['-', '-', '-', '-']
-
-        # Обработка первой и второй частей: до "место нахождения" и до "ОГРН"
-        m_mesto = re.search(r'место нахождения:', z_result)
-        if m_mesto:
-            parts[0] = z_result[:m_mesto.start()].strip()
-            remaining = z_result[m_mesto.end():]
-            m_ogrn = re.search(r'ОГРН', remaining)
-            if m_ogrn:
-                parts[1] = remaining[:m_ogrn.start()].strip()
-            else:
-                parts[1] = '-'
-        else:
-            parts[0] = z_result.strip()
-            parts[1] = '-'
-
-        # Обработка третьей части: номер телефона
-        tel_match = re.search(r'тел\.?\s*:?\s*([+0-9()\s-]+)', z_result, re.IGNORECASE)
-        if tel_match:
-            tel_str = tel_match.group(1)
-            digits = re.sub(r'\D', '', tel_str)
-            if len(digits) == 11:
-                parts[2] = digits
-
-        # Обработка четвертой части: email
-        email_match = re.search(r'e-mail\s*:?\s*([^\s;]+?\.(?:ru|com))\b', z_result, re.IGNORECASE)
-        if email_match:
-            parts[3] = email_match.group(1)
-
-        return parts
-
-
-    def split_i_result(self, i_result):
-        parts = ['-', '-', '-']  # [до ОГРН/адреса, адрес до телефона, телефон]
-
-        # 1. Определяем первую часть (до ОГРН или до адреса)
-        ogrn_match = re.search(r'ОГРН', i_result)
-        address_match = re.search(r'адрес места осуществления деятельности(?: по изготовлению продукции)?:', i_result)
-
-        if ogrn_match and (not address_match or ogrn_match.start() < address_match.start()):
-            parts[0] = i_result[:ogrn_match.start()].strip()
-        elif address_match:
-            parts[0] = i_result[:address_match.start()].strip()
-
-        # 2. Извлекаем адрес (от адресной части до телефона)
-        if address_match:
-            tel_match = re.search(r'тел\.?\s*:?\s*', i_result[address_match.end():], re.IGNORECASE)
-            if tel_match:
-                address_part = i_result[address_match.end():address_match.end() + tel_match.start()].strip(' ;')
-                parts[1] = address_part
-            else:
-                # Если телефон не найден, берем до конца строки
-                parts[1] = i_result[address_match.end():].strip(' ;')
-
-        # 3. Извлекаем телефон
-        tel_match = re.search(r'тел\.?\s*:?\s*([+0-9()\s-]+)', i_result, re.IGNORECASE)
-        if tel_match:
-            clean_number = re.sub(r'\D', '', tel_match.group(1))
-            if len(clean_number) == 11:
-                parts[2] = clean_number
-
-        return parts
-
+            self.show_error(e)
+            return
 
-    def process_files(self, action):
-        self.update_status("Начало обработки...")
-        self.progress['maximum'] = len(self.file_paths)
+        self.processing_paths = list(self.file_paths)
+        self.progress['maximum'] = len(self.processing_paths)
         self.progress['value'] = 0
-
+        self.results = queue.Queue()
+        thread = threading.Thread(target=convert_files,
+                                  args=(self.processing_paths, self.results, self.streaming_var.get(), workers),
+                                  daemon=True)
+        thread.start()
+        self.after(POLL_INTERVAL_MS, self.poll_results)
+
+    def open_output(self, action, save_path, upsert=True):
+        """
+        Готовит таблицу save_path к записи.
+
+        В существующую таблицу (action="existing") строки вносятся через RegisterUpsert:
+        при upsert сертификат с уже внесенным номером (столбец A) обновляет свою
+        строку или пропускается, если не изменился; иначе строки дописываются в конец.
+        """
+        self.save_path = save_path
+        if action == "new":
+            self.wb = openpyxl.Workbook()
+            self.ws = self.wb.active
+            # Добавляем заголовки
+            for col_idx, header in enumerate(HEADERS, start=1):
+                self.ws.cell(row=1, column=col_idx, value=header)
+            self.styles = ColumnStyles(CELL_STYLES)
+            self.row = 2
+            self.register = None
+        else:
+            # Номера уже внесенных сертификатов читаются одним проходом, книга
+            # целиком открывается только при сохранении
+            self.update_status("Чтение номеров сертификатов из существующей таблицы...")
+            self.register = RegisterUpsert(save_path, COLUMNS, key_columns=KEY_COLUMNS if upsert else None,
+                                           sheet_index=None, styles=CELL_STYLES, headers=HEADERS)
+
+    def poll_results(self):
+        """
+        Забирает из очереди готовые результаты фонового разбора и записывает их
+        в таблицу. Выполняется в главном потоке Tk и повторяется через POLL_INTERVAL_MS,
+        пока не придет признак завершения.
+        """
         try:
-            if action == "new":
-                wb = openpyxl.Workbook()
-                ws = wb.active
-                # Добавляем заголовки
-                headers = ["Номер сертификата", "Заявитель", "Заявитель место нахождения", "Заявитель телефон", "Заявитель e-mail",
-                          "Изготовитель", "Изготовитель адрес", "Изготовитель телефон"]
-                for col_idx, header in enumerate(headers, start=1):
-                    ws.cell(row=1, column=col_idx, value=header)
-                row = 2
-                save_path = filedialog.asksaveasfilename(
-                    defaultextension=".xlsx",
-                    filetypes=[("Excel Files", "*.xlsx")],
-                    title="Сохранить новую таблицу как"
-                )
-            else:
-                save_path = filedialog.askopenfilename(
-                    filetypes=[("Excel Files", "*.xlsx")],
-                    title="Выберите существующий файл Excel"
-                )
-                if not save_path:
-                    self.update_status("Обработка отменена")
+            while True:
+                try:
+                    index, all_data = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if index is None:
+                    if all_data is not None:
+                        raise all_data
+                    self.save_output()
                     return
-                wb = openpyxl.load_workbook(save_path)
-                ws = wb.active
-                row = ws.max_row + 1
+                self.write_result(index, all_data)
+        except Exception as e:
+            self.show_error(e)
+            return
+        self.after(POLL_INTERVAL_MS, self.poll_results)
 
-            if not save_path:
-                self.update_status("Обработка отменена")
+    def write_result(self, index, all_data):
+        """Записывает строку сертификата (или сообщает об ошибке разбора) и обновляет прогресс."""
+        filepath = self.processing_paths[index]
+        if isinstance(all_data, Exception):
+            self.update_status(f"Ошибка при обработке {os.path.basename(filepath)}: {str(all_data)}")
+        else:
+            # Запись данных в соответствующие столбцы
+            record = {get_column_letter(col_idx): data for col_idx, data in enumerate(all_data, start=1)}
+            if self.register is not None:
+                self.register.write(record)
+            else:
+                write_row(self.ws, self.row, record, self.styles)
+                self.row += 1
+
+        self.update_progress(index + 1)
+        self.update_status(f"Обработан файл {index + 1}/{len(self.processing_paths)}")
+
+    def save_output(self):
+        """Сохраняет таблицу после записи всех строк."""
+        save_path = self.save_path
+        if self.register is not None:
+            # Ширины столбцов существующей таблицы не меняются
+            summary = self.register.summary()
+            if not self.register.save():
+                self.update_progress(0)
+                self.update_status(f"Файл не изменен: {save_path}")
+                messagebox.showinfo(
+                    "Готово", f"Новых или измененных сертификатов нет, файл не изменен:\n{save_path}\n{summary}")
                 return
-
-            for i, filepath in enumerate(self.file_paths):
-                z_data, i_data, p_data = self.extract_data_from_word(filepath)
-
-                if z_data is not None and i_data is not None:
-                    z_parts = self.split_z_result(z_data)
-                    i_parts = self.split_i_result(i_data)
-                    all_data = p_data + z_parts + i_parts
-
-                    # Запись данных в соответствующие столбцы
-                    for col_idx, data in enumerate(all_data, start=1):
-                        ws.cell(row=row, column=col_idx, value=data)
-                        ws.cell(row=row, column=col_idx).alignment = Alignment(
-                            wrap_text=True,
-                            vertical='top'
-                        )
-
-                    row += 1
-
-                self.update_progress(i + 1)
-                self.update_status(f"Обработан файл {i + 1}/{len(self.file_paths)}")
-
+        else:
             # Настройка ширины столбцов
-            for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']:
-                ws.column_dimensions[col].width = 30
-
-            wb.save(save_path)
-            self.update_status(f"Данные сохранены в {save_path}")
-            messagebox.showinfo("Готово", f"Данные успешно сохранены в:\n{save_path}")
-
-        except Exception as e:
-            self.update_status(f"Ошибка: {str(e)}")
-            messagebox.showerror("Ошибка", f"Произошла ошибка:\n{str(e)}")
-        finally:
-            self.progress['value'] = 0
+            for col in COLUMNS:
+                self.ws.column_dimensions[col].width = 30
+            self.wb.save(save_path)
+            summary = f"Добавлено строк: {self.row - 2}"
+
+        self.update_progress(0)
+        self.update_status(f"Данные сохранены в {save_path}")
+        messagebox.showinfo("Готово", f"Данные успешно сохранены в:\n{save_path}\n{summary}")
+
+    def show_error(self, error):
+        self.update_progress(0)
+        self.update_status(f"Ошибка: {str(error)}")
+        messagebox.showerror("Ошибка", f"Произошла ошибка:\n{str(error)}")
+
+
+def convert_files(file_paths, results, streaming=True, workers=1):
+    """
+    Разбирает сертификаты в фоновом потоке и кладет в очередь results пары
+    (номер файла, строка данных или исключение) в порядке списка файлов.
+    При workers > 1 документы читаются в пуле процессов; реквизиты разбираются
+    пачками по PARSE_BATCH_SIZE сертификатов.
+    В конце кладется (None, None), при сбое самого разбора - (None, исключение).
+    С виджетами Tk поток не работает: запись и сохранение выполняет главный поток.
+    """
+    executor = None
+    try:
+        task = partial(read_certificate_task, streaming=streaming)
+        if workers > 1 and len(file_paths) > 1:
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(file_paths)))
+            certificates = executor.map(task, file_paths)
+        else:
+            certificates = map(task, file_paths)
+        batch = []
+        for index, certificate in enumerate(certificates):
+            batch.append(certificate)
+            if len(batch) == PARSE_BATCH_SIZE or index == len(file_paths) - 1:
+                first = index - len(batch) + 1
+                for offset, all_data in enumerate(convert_certificates(batch)):
+                    results.put((first + offset, all_data))
+                batch = []
+        results.put((None, None))
+    except Exception as e:
+        results.put((None, e))
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
 
 if __name__ == "__main__":
+    # Нужно для пула процессов в собранном PyInstaller exe
+    multiprocessing.freeze_support()
+
     app = WordToExcelConverter()
     app.mainloop()
\ No newline at end of file
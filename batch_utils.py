@@ -0,0 +1,294 @@
+import csv
+import glob
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def bounded_map(executor, fn, items, window):
+    """
+    Аналог executor.map, который держит в работе не больше window задач.
+
+    Результаты возвращаются в исходном порядке; следующая задача отправляется
+    в пул, как только забирается результат предыдущей.
+    """
+    items = iter(items)
+    pending = deque(executor.submit(fn, item) for item in islice(items, window))
+    while pending:
+        future = pending.popleft()
+        for item in islice(items, 1):
+            pending.append(executor.submit(fn, item))
+        yield future.result()
+
+
+class FilePrefetcher:
+    """
+    Копирует файлы (например, с сетевого диска) во временную локальную папку в фоновом потоке.
+
+    При итерации возвращает локальные пути в исходном порядке. Впереди обработки
+    готово не больше depth копий; копия удаляется вызовом release() после того,
+    как результат по файлу получен (копии освобождаются в порядке выдачи).
+    Если файл не удалось скопировать, возвращается исходный путь - ошибка
+    проявится при его чтении. close() останавливает копирование и удаляет папку.
+    """
+
+    def __init__(self, file_paths, depth):
+        self.file_paths = list(file_paths)
+        self.folder = tempfile.mkdtemp(prefix='protocols_')
+        self.queue = queue.Queue(maxsize=depth)
+        self.issued = deque()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        for index, file_path in enumerate(self.file_paths):
+            local_path = os.path.join(self.folder, f'{index}_{os.path.basename(file_path)}')
+            try:
+                shutil.copyfile(file_path, local_path)
+            except OSError:
+                local_path = file_path
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put(local_path, timeout=0.2)
+                    break
+                except queue.Full:
+                    continue
+            if self.stop_event.is_set():
+                return
+
+    def __iter__(self):
+        for _ in self.file_paths:
+            local_path = self.queue.get()
+            self.issued.append(local_path)
+            yield local_path
+
+    def release(self):
+        """Удаляет самую раннюю выданную копию."""
+        if not self.issued:
+            return
+        local_path = self.issued.popleft()
+        if os.path.dirname(local_path) == self.folder:
+            try:
+                os.remove(local_path)
+            except OSError:
+                pass
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+# Фазы обработки файла для отчета о времени: ключ -> заголовок столбца
+TIMING_PHASES = {
+    'open': 'Открытие, с',
+    'sheets': 'Поиск листов, с',
+    'fields': 'Извлечение полей, с',
+    'write': 'Запись строки, с',
+}
+
+
+class TimingReport:
+    """
+    Время обработки по файлам: фазы из TIMING_PHASES, размер файла и макет.
+
+    В конце пачки сохраняется в CSV (save_csv), а summary() дает пропускную
+    способность (файлов/с и МБ/с) и список самых медленных файлов.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.started = time.perf_counter()
+
+    def add(self, file_path, timings, layout=None, cached=False):
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = None
+        timings = {phase: timings.get(phase, 0.0) for phase in TIMING_PHASES}
+        self.records.append({
+            'file_path': file_path,
+            'size': size,
+            'layout': layout,
+            'cached': cached,
+            'timings': timings,
+            'total': sum(timings.values()),
+        })
+
+    def slowest(self, count):
+        return sorted(self.records, key=lambda record: record['total'], reverse=True)[:count]
+
+    def save_csv(self, path):
+        """Сохраняет время по файлам в CSV (разделитель ';', чтобы файл открывался в Excel)."""
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['Файл', 'Размер, байт', 'Макет', 'Из кэша'] + list(TIMING_PHASES.values()) + ['Всего, с'])
+            for record in self.records:
+                writer.writerow(
+                    [record['file_path'], record['size'], record['layout'] or '', 'да' if record['cached'] else '']
+                    + [f"{record['timings'][phase]:.4f}" for phase in TIMING_PHASES]
+                    + [f"{record['total']:.4f}"]
+                )
+
+    def summary(self, count=5):
+        elapsed = time.perf_counter() - self.started
+        if not self.records or elapsed <= 0:
+            return ""
+        megabytes = sum(record['size'] or 0 for record in self.records) / 2 ** 20
+        lines = [f"Скорость: {len(self.records) / elapsed:.1f} файлов/с, {megabytes / elapsed:.2f} МБ/с "
+                 f"({len(self.records)} файлов, {megabytes:.1f} МБ за {elapsed:.1f} с)"]
+        slowest = [record for record in self.slowest(count) if not record['cached']]
+        if slowest:
+            lines.append("Самые медленные файлы:")
+            for record in slowest:
+                size = f"{record['size'] / 2 ** 20:.2f} МБ" if record['size'] is not None else "размер неизвестен"
+                lines.append(f"  {os.path.basename(record['file_path'])}: {record['total']:.2f} с, {size}, "
+                             f"макет {record['layout'] or 'не определен'}")
+        return "\n".join(lines)
+
+
+def _windows_resource_usage():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb)
+    handles = wintypes.DWORD()
+    ctypes.windll.kernel32.GetProcessHandleCount(process, ctypes.byref(handles))
+    return counters.WorkingSetSize, handles.value
+
+
+def _proc_resource_usage():
+    with open('/proc/self/statm') as f:
+        rss_pages = int(f.read().split()[1])
+    return rss_pages * os.sysconf('SC_PAGE_SIZE'), len(os.listdir('/proc/self/fd'))
+
+
+def resource_usage():
+    """
+    Возвращает (RSS в байтах, число открытых дескрипторов) для текущего процесса
+    и его дочерних процессов (пула). Без psutil учитывается только текущий процесс.
+    При невозможности определить возвращает (None, None).
+    """
+    try:
+        if psutil is not None:
+            rss = handles = 0
+            current = psutil.Process()
+            for process in [current] + current.children(recursive=True):
+                try:
+                    rss += process.memory_info().rss
+                    handles += process.num_handles() if os.name == 'nt' else process.num_fds()
+                except psutil.Error:
+                    continue
+            return rss, handles
+        if os.name == 'nt':
+            return _windows_resource_usage()
+        return _proc_resource_usage()
+    except (OSError, AttributeError, ValueError):
+        return None, None
+
+
+class ResourceMonitor:
+    """Собирает выборки RSS и числа дескрипторов за время обработки и хранит пиковые значения."""
+
+    def __init__(self):
+        self.peak_rss = 0
+        self.peak_handles = 0
+        self.last = (None, None)
+
+    def sample(self):
+        rss, handles = resource_usage()
+        self.last = (rss, handles)
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_handles = max(self.peak_handles, handles)
+        return self.status()
+
+    def status(self):
+        """Короткая строка для строки статуса."""
+        rss, handles = self.last
+        if rss is None:
+            return ""
+        return f"RSS {rss / 2 ** 20:.0f} МБ, дескрипторов {handles}"
+
+    def summary(self):
+        """Итог для сообщения о завершении."""
+        if not self.peak_rss:
+            return ""
+        return f"Пик памяти (RSS): {self.peak_rss / 2 ** 20:.0f} МБ, пик дескрипторов: {self.peak_handles}"
+
+
+def is_wanted_file(name, extensions):
+    """Файл с нужным расширением, кроме временных файлов открытых в Excel книг (~$)."""
+    return name.lower().endswith(extensions) and not name.startswith('~$')
+
+
+def scan_folder(folder, extensions):
+    """Рекурсивно обходит папку через os.scandir и возвращает пути файлов с нужными расширениями."""
+    try:
+        entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from scan_folder(entry.path, extensions)
+        elif is_wanted_file(entry.name, extensions):
+            yield entry.path
+
+
+def collect_files(patterns, extensions):
+    """
+    Собирает файлы по списку путей: папки обходятся рекурсивно,
+    маски ('*.xlsx', '**' для вложенных папок) раскрываются через glob,
+    из найденных по маске файлов берутся только подходящие (как при обходе папки).
+    Повторы убираются с сохранением порядка.
+    """
+    file_paths = []
+    for pattern in patterns:
+        if not glob.has_magic(pattern):
+            if os.path.isdir(pattern):
+                file_paths.extend(scan_folder(pattern, extensions))
+            else:
+                file_paths.append(pattern)
+            continue
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            if os.path.isdir(path):
+                file_paths.extend(scan_folder(path, extensions))
+            elif is_wanted_file(os.path.basename(path), extensions):
+                file_paths.append(path)
+
+    seen = set()
+    unique = []
+    for file_path in file_paths:
+        key = os.path.normcase(os.path.abspath(file_path))
+        if key not in seen:
+            seen.add(key)
+            unique.append(file_path)
+    return unique
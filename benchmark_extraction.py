@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from export_workbook import StreamingTemplateExport
+from protocol_generator import expected_protocol, expected_reestr, generate_set
+from protocol_reader import ENGINES, extract_combined_task, extract_protocol_task, extract_reestr_task
+
+# Замер скорости извлечения на синтетических протоколах (protocol_generator.py).
+# Для каждого размера пачки извлекаются данные для выходной таблицы протоколов
+# (как в Extract_Data_From_Protocols), для реестра СИ (как в Extract_Data_for_Reestr_SI)
+# и для обоих сразу за один проход (extract_combined),
+# результат сверяется с ожидаемым, скорость сравнивается с сохраненной базовой.
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_FOLDER = os.path.join(tempfile.gettempdir(), 'protocol_benchmark')
+MANIFEST_NAME = 'manifest.pickle'
+BASELINE_NAME = 'baseline.json'
+# Допустимое замедление относительно базовой скорости
+DEFAULT_TOLERANCE = 0.2
+
+
+def empty_template(*titles):
+    """Модель шаблона без шапки (см. load_template_model) для записи результата."""
+    return [{'title': title, 'rows': [], 'row_heights': {}, 'columns': {}, 'merged': [], 'freeze_panes': None}
+            for title in titles]
+
+
+def prepare_files(folder, count, seed):
+    """
+    Возвращает count сгенерированных протоколов (путь, описание).
+
+    Набор создается один раз и переиспользуется, пока хватает файлов и не изменился seed.
+    """
+    manifest_path = os.path.join(folder, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'rb') as f:
+            manifest = pickle.load(f)
+        if manifest['seed'] == seed and len(manifest['files']) >= count \
+                and all(os.path.exists(file_path) for file_path, _ in manifest['files'][:count]):
+            return manifest['files'][:count]
+
+    print(f"Генерация {count} протоколов в {folder}...")
+    files = generate_set(folder, count, seed)
+    with open(manifest_path, 'wb') as f:
+        pickle.dump({'seed': seed, 'files': files}, f)
+    return files
+
+
+def run_extraction(task, file_paths, workers):
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(task, file_paths, chunksize=8))
+    return list(map(task, file_paths))
+
+
+def compare_rows(actual, expected):
+    """Возвращает описание расхождений записи с ожидаемой (пустая строка, если совпадает)."""
+    diffs = [f"{column}: {actual.get(column)!r} != {expected.get(column)!r}"
+             for column in sorted(set(actual) | set(expected)) if actual.get(column) != expected.get(column)]
+    return '; '.join(diffs)
+
+
+def bench_protocols(files, engine, workers, output_path):
+    """Извлечение для выходной таблицы протоколов и запись строк. Возвращает (время, ошибки)."""
+    started = time.perf_counter()
+    results = run_extraction(partial(extract_protocol_task, engine=engine), [path for path, _ in files], workers)
+    output = StreamingTemplateExport(None, output_path, template_model=empty_template('Лист1'))
+    errors = []
+    for (file_path, spec), result in zip(files, results):
+        if isinstance(result, Exception):
+            errors.append(f"{os.path.basename(file_path)}: {result}")
+            continue
+        output.write(result['row'])
+        expected = expected_protocol(spec)
+        diff = compare_rows(result['row'], expected['row'])
+        if result['missing_sheets'] != expected['missing_sheets']:
+            diff += f" листы {result['missing_sheets']} != {expected['missing_sheets']}"
+        if diff:
+            errors.append(f"{os.path.basename(file_path)}: {diff}")
+    output.save()
+    return time.perf_counter() - started, errors
+
+
+def bench_reestr(files, engine, workers, output_path):
+    """Извлечение для двух листов реестра СИ и запись строк. Возвращает (время, ошибки)."""
+    started = time.perf_counter()
+    results = run_extraction(partial(extract_reestr_task, engine=engine), [path for path, _ in files], workers)
+    output = StreamingTemplateExport(None, output_path, template_model=empty_template('Лист1', 'Лист2'))
+    errors = []
+    for (file_path, spec), result in zip(files, results):
+        if isinstance(result, Exception):
+            errors.append(f"{os.path.basename(file_path)}: {result}")
+            continue
+        for sheet_index, (row, expected) in enumerate(zip(result['rows'], expected_reestr(spec))):
+            output.write(row, sheet_index)
+            diff = compare_rows(row, expected)
+            if diff:
+                errors.append(f"{os.path.basename(file_path)} (лист {sheet_index + 1}): {diff}")
+    output.save()
+    return time.perf_counter() - started, errors
+
+
+def bench_combined(files, engine, workers, output_path):
+    """Один проход по протоколу для выходной таблицы и реестра СИ. Возвращает (время, ошибки)."""
+    started = time.perf_counter()
+    results = run_extraction(partial(extract_combined_task, engine=engine), [path for path, _ in files], workers)
+    output = StreamingTemplateExport(None, output_path, template_model=empty_template('Лист1', 'Лист2', 'Лист3'))
+    errors = []
+    for (file_path, spec), result in zip(files, results):
+        if isinstance(result, Exception):
+            errors.append(f"{os.path.basename(file_path)}: {result}")
+            continue
+        output.write(result['row'])
+        diffs = [compare_rows(result['row'], expected_protocol(spec)['row'])]
+        for sheet_index, (row, expected) in enumerate(zip(result['reestr'] or (), expected_reestr(spec)), 1):
+            output.write(row, sheet_index)
+            diffs.append(compare_rows(row, expected))
+        if result['reestr'] is None:
+            diffs.append(f"реестр: {result['reestr_error']}")
+        diff = '; '.join(filter(None, diffs))
+        if diff:
+            errors.append(f"{os.path.basename(file_path)}: {diff}")
+    output.save()
+    return time.perf_counter() - started, errors
+
+
+BENCHMARKS = {
+    'protocols': bench_protocols,
+    'reestr': bench_reestr,
+    'combined': bench_combined,
+}
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер скорости извлечения данных из протоколов")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Размеры пачек")
+    parser.add_argument('--engine', choices=list(ENGINES) + ['all'], default='all', help="Движок чтения")
+    parser.add_argument('--workers', type=int, default=1, help="Число процессов")
+    parser.add_argument('--folder', default=DEFAULT_FOLDER, help="Папка для сгенерированных протоколов")
+    parser.add_argument('--seed', type=int, default=0, help="Начальное значение генератора")
+    parser.add_argument('--baseline', help="Файл базовых результатов (по умолчанию в папке протоколов)")
+    parser.add_argument('--update-baseline', action='store_true', help="Сохранить результаты как базовые")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="Допустимое замедление (доля)")
+    args = parser.parse_args()
+
+    engines = list(ENGINES) if args.engine == 'all' else [args.engine]
+    baseline_path = args.baseline or os.path.join(args.folder, BASELINE_NAME)
+    baseline = load_baseline(baseline_path)
+
+    files = prepare_files(args.folder, max(args.sizes), args.seed)
+    results = {}
+    failed = False
+
+    print(f"{'Тест':<40}{'Файлов':>8}{'Время, с':>10}{'Файлов/с':>10}{'МБ/с':>8}  Базовая")
+    for size in sorted(args.sizes):
+        batch = files[:size]
+        megabytes = sum(os.path.getsize(file_path) for file_path, _ in batch) / 2 ** 20
+        for engine in engines:
+            for name, bench in BENCHMARKS.items():
+                key = f"{name}/{engine}/{size}/{args.workers}"
+                output_path = os.path.join(args.folder, f"result_{name}_{engine}.xlsx")
+                elapsed, errors = bench(batch, engine, args.workers, output_path)
+                speed = size / elapsed
+                results[key] = speed
+
+                note = "-"
+                if key in baseline:
+                    ratio = speed / baseline[key]
+                    note = f"{ratio:.0%}"
+                    if ratio < 1 - args.tolerance:
+                        note += " ЗАМЕДЛЕНИЕ"
+                        failed = True
+                print(f"{key:<40}{size:>8}{elapsed:>10.2f}{speed:>10.1f}{megabytes / elapsed:>8.2f}  {note}")
+
+                if errors:
+                    failed = True
+                    print(f"  Расхождений с ожидаемым: {len(errors)}")
+                    for error in errors[:10]:
+                        print(f"    {error}")
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"Базовые результаты сохранены: {baseline_path}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
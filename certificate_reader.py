@@ -0,0 +1,160 @@
+from docx_reader import read_docx, iter_table_rows
+from requisites_parser import APPLICANT_FIELDS, ID_FIELDS, MANUFACTURER_FIELDS, parse_requisites_batch
+
+# Столбцы выходной таблицы: номер сертификата, реквизиты заявителя и изготовителя,
+# затем ОГРН, ИНН и КПП заявителя и изготовителя - в конце, чтобы столбцы
+# прежних таблиц не сдвигались
+HEADERS = ["Номер сертификата", "Заявитель", "Заявитель место нахождения", "Заявитель телефон", "Заявитель e-mail",
+           "Изготовитель", "Изготовитель адрес", "Изготовитель телефон",
+           "Заявитель ОГРН", "Заявитель ИНН", "Заявитель КПП",
+           "Изготовитель ОГРН", "Изготовитель ИНН", "Изготовитель КПП"]
+
+# Поля разбора реквизитов (роль организации, поле) в порядке HEADERS после номера сертификата
+ROW_FIELDS = ([('applicant', field) for field in APPLICANT_FIELDS]
+              + [('manufacturer', field) for field in MANUFACTURER_FIELDS]
+              + [('applicant', field) for field in ID_FIELDS]
+              + [('manufacturer', field) for field in ID_FIELDS])
+
+
+def extract_data_from_word(filepath):
+    # Документ разбирается один раз: таблицы - списки строк с текстами ячеек
+    tables = read_docx(filepath).tables
+
+    z_data = []
+    i_data = []
+    p_data = []
+
+
+    for table in tables:
+        for row_idx, row in enumerate(table):
+            row_text = [text.strip() for text in row]
+
+            if row_idx == 5:
+                p_data.append(row_text[5])
+
+            # Проверяем каждую ячейку в строке на наличие ключевых слов
+            for cell_idx, cell_text in enumerate(row_text):
+                text = cell_text.lower()
+
+                if "заявитель" in text:
+                    # Собираем 4 следующие строки из первого столбца
+                    for j in range(1, 5):
+                        if row_idx + j < len(table):
+                            if table[row_idx + j]:  # Проверяем, что есть ячейки
+                                z_data.append(table[row_idx + j][0].strip())
+
+                elif "изготовитель" in text:
+                    # Собираем 4 следующие строки из первого столбца
+                    for j in range(1, 5):
+                        if row_idx + j < len(table):
+                            if table[row_idx + j]:  # Проверяем, что есть ячейки
+                                i_data.append(table[row_idx + j][0].strip())
+
+
+    # Объединяем данные в строки с переносами
+    z_result = " ".join(z_data[:4]) if z_data else ""
+    i_result = " ".join(i_data[:4]) if i_data else ""
+    p_result = p_data
+
+    return z_result, i_result, p_result
+
+
+def extract_data_streaming(filepath):
+    """
+    Потоковый вариант extract_data_from_word: строки таблиц читаются по мере разбора
+    документа, и чтение прекращается, как только собраны номер сертификата
+    (строка 6, столбец 6 первой таблицы) и по 4 строки после "заявитель" и
+    "изготовитель". Длинные приложения в конце сертификата не разбираются.
+    """
+    # Ключевое слово -> найденные вхождения: (таблица, строка, первые ячейки следующих строк)
+    found = {"заявитель": [], "изготовитель": []}
+    p_data = []
+
+    for table_idx, row_idx, row in iter_table_rows(filepath):
+        # Первый столбец строки попадает во все вхождения, за которыми она идет (до 4 строк)
+        if row:
+            for matches in found.values():
+                for match_table, match_row, values in matches:
+                    if match_table == table_idx and match_row < row_idx <= match_row + 4:
+                        values.append(row[0].strip())
+
+        row_text = [text.strip() for text in row]
+
+        if row_idx == 5 and not p_data:
+            p_data.append(row_text[5])
+
+        for cell_text in row_text:
+            text = cell_text.lower()
+            if "заявитель" in text:
+                found["заявитель"].append((table_idx, row_idx, []))
+            elif "изготовитель" in text:
+                found["изготовитель"].append((table_idx, row_idx, []))
+
+        if p_data and all(first_rows_collected(matches, table_idx, row_idx) for matches in found.values()):
+            break
+
+    z_data = [value for _, _, values in found["заявитель"] for value in values]
+    i_data = [value for _, _, values in found["изготовитель"] for value in values]
+    z_result = " ".join(z_data[:4]) if z_data else ""
+    i_result = " ".join(i_data[:4]) if i_data else ""
+
+    return z_result, i_result, p_data
+
+
+def first_rows_collected(matches, table_idx, row_idx):
+    """
+    Собраны ли окончательно первые 4 значения для ключевого слова: как и в полном
+    разборе, значения берутся по вхождениям в порядке их появления, а вхождение
+    может получить новые строки, пока не прочитаны 4 строки после него в той же таблице.
+    """
+    count = 0
+    for match_table, match_row, values in matches:
+        count += len(values)
+        if count >= 4:
+            return True
+        if match_table == table_idx and row_idx < match_row + 4:
+            return False
+    return False
+
+
+def read_certificate(filepath, streaming=True):
+    """
+    Читает сертификат и возвращает номер сертификата и неразобранные тексты
+    реквизитов заявителя и изготовителя (разбор - в convert_certificates).
+
+    Если номер сертификата не найден, вместо него возвращается '-',
+    а при нескольких найденных берется первый.
+    """
+    extract = extract_data_streaming if streaming else extract_data_from_word
+    z_data, i_data, p_data = extract(filepath)
+    return p_data[0] if p_data else '-', z_data, i_data
+
+
+def read_certificate_task(filepath, streaming=True):
+    """
+    Обертка read_certificate для пула процессов.
+
+    Исключение не пробрасывается через границу процесса, а возвращается как результат,
+    чтобы один битый файл не останавливал всю пачку.
+    """
+    try:
+        return read_certificate(filepath, streaming)
+    except Exception as e:
+        return e
+
+
+def convert_certificates(certificates):
+    """
+    Превращает пачку прочитанных сертификатов (результатов read_certificate)
+    в строки выходной таблицы в порядке HEADERS, по одной на сертификат.
+
+    Реквизиты всех заявителей и всех изготовителей пачки разбираются
+    parse_requisites_batch; каждое значение стоит в своем столбце.
+    Исключения (не прочитанные файлы) остаются на своих местах как есть.
+    """
+    read = [certificate for certificate in certificates if not isinstance(certificate, Exception)]
+    requisites = {'applicant': parse_requisites_batch([z_data for number, z_data, i_data in read], 'applicant'),
+                  'manufacturer': parse_requisites_batch([i_data for number, z_data, i_data in read], 'manufacturer')}
+    columns = [requisites[role][field] for role, field in ROW_FIELDS]
+    rows = iter([number] + [column[index] for column in columns] for index, (number, z_data, i_data) in enumerate(read))
+    return [certificate if isinstance(certificate, Exception) else next(rows) for certificate in certificates]
@@ -0,0 +1,129 @@
+import csv
+import os
+from datetime import date, datetime
+
+from protocol_reader import DATE_FIELDS, OUTPUT_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Форматы столбцовой выгрузки; parquet требует pyarrow, без него выгрузка идет в CSV
+COLUMNAR_FORMATS = ('parquet', 'csv')
+
+# Поля с числовыми значениями (отклонения напряжения, %)
+NUMERIC_FIELDS = {'du_minus', 'du_plus', 'du_minus_1', 'du_plus_1', 'du_minus_2', 'du_plus_2'}
+
+# Сколько строк копится в памяти перед записью очередной группы строк Parquet
+ROW_GROUP_SIZE = 10000
+
+
+def parse_date(value):
+    """Приводит дату протокола ('дд.мм.гггг' или datetime) к date, иначе возвращает None."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+def parse_number(value):
+    """Приводит значение dU к float (допускается десятичная запятая), иначе возвращает None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip().replace(',', '.').replace('−', '-'))
+    except ValueError:
+        return None
+
+
+def typed_value(field, value):
+    if field in DATE_FIELDS:
+        return parse_date(value)
+    if field in NUMERIC_FIELDS:
+        return parse_number(value)
+    return None if value is None else str(value)
+
+
+class ColumnarExport:
+    """
+    Столбцовая выгрузка извлеченных записей для анализа (Parquet или CSV рядом с .xlsx).
+
+    Столбцы называются по полям (protocol_number, test_start, du_minus, ...), первый
+    столбец - путь к исходному файлу. Даты пишутся как даты, dU - как числа;
+    нераспознанные значения ('---', '-') становятся пустыми. Parquet пишется группами
+    по ROW_GROUP_SIZE строк, CSV - построчно, так что память не растет с числом файлов.
+    В файл попадают записи текущего запуска.
+    """
+
+    def __init__(self, save_path, fmt='parquet', columns=None):
+        self.columns = list(columns or OUTPUT_COLUMNS)
+        self.fields = [OUTPUT_COLUMNS[column] for column in self.columns]
+        self.fallback = fmt == 'parquet' and pq is None
+        self.format = 'csv' if self.fallback else fmt
+        self.path = os.path.splitext(save_path)[0] + '.' + self.format
+        self.written = 0
+        self.batch = []
+        self.parquet_writer = None
+        self.csv_file = None
+
+        if self.format == 'parquet':
+            types = [pa.date32() if field in DATE_FIELDS else pa.float64() if field in NUMERIC_FIELDS else pa.string()
+                     for field in self.fields]
+            self.schema = pa.schema([('source_file', pa.string())] + list(zip(self.fields, types)))
+        else:
+            self.csv_file = open(self.path, 'w', newline='', encoding='utf-8')
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(['source_file'] + self.fields)
+
+    def write(self, row, file_path):
+        """Добавляет запись (словарь столбец -> значение, как для выходной таблицы)."""
+        values = [file_path] + [typed_value(field, row.get(column)) for column, field in zip(self.columns, self.fields)]
+        self.written += 1
+        if self.csv_file is not None:
+            # Даты в CSV - в формате ISO (гггг-мм-дд), числа - с точкой
+            self.csv_writer.writerow(['' if value is None else value.isoformat() if isinstance(value, date) else value
+                                      for value in values])
+            return
+        self.batch.append(values)
+        if len(self.batch) >= ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        if self.parquet_writer is None:
+            self.parquet_writer = pq.ParquetWriter(self.path, self.schema)
+        columns = list(zip(*self.batch))
+        self.parquet_writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)], schema=self.schema))
+        self.batch = []
+
+    def save(self):
+        if self.format == 'parquet':
+            self.flush()
+            if self.parquet_writer is None:
+                # Пустой набор - файл только со схемой
+                pq.write_table(self.schema.empty_table(), self.path)
+        return True
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+
+    def summary(self):
+        text = f"Столбцовая выгрузка ({self.format}): {self.written} записей, {self.path}"
+        if self.fallback:
+            text += " (pyarrow не установлен, вместо Parquet записан CSV)"
+        return text
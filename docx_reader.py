@@ -0,0 +1,164 @@
+import zipfile
+from collections import namedtuple
+
+from lxml import etree
+
+# Пространство имен WordprocessingML
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+P, R, T, TBL, TR, TC = W + 'p', W + 'r', W + 't', W + 'tbl', W + 'tr', W + 'tc'
+HYPERLINK = W + 'hyperlink'
+
+# Текстовые эквиваленты служебных элементов внутри w:r (как в python-docx)
+RUN_SYMBOLS = {W + 'tab': '\t', W + 'ptab': '\t', W + 'cr': '\n', W + 'noBreakHyphen': '-'}
+
+# Содержимое документа: blocks - элементы тела по порядку, пары ('p', текст абзаца)
+# или ('tbl', таблица); paragraphs и tables - те же абзацы и таблицы по отдельности.
+# Таблица - список строк, строка - список текстов ячеек по сетке таблицы.
+DocxContent = namedtuple('DocxContent', 'blocks paragraphs tables')
+
+
+def run_text(run):
+    """Текст фрагмента w:r."""
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == T:
+            parts.append(child.text or '')
+        elif tag == W + 'br':
+            # Перенос строки - '\n', разрывы страницы и колонки - пустая строка
+            if child.get(W + 'type', 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        elif tag in RUN_SYMBOLS:
+            parts.append(RUN_SYMBOLS[tag])
+    return ''.join(parts)
+
+
+def paragraph_text(paragraph):
+    """Текст абзаца w:p (фрагменты и гиперссылки), как Paragraph.text в python-docx."""
+    parts = []
+    for child in paragraph:
+        if child.tag == R:
+            parts.append(run_text(child))
+        elif child.tag == HYPERLINK:
+            parts.extend(run_text(run) for run in child.iterchildren(R))
+    return ''.join(parts)
+
+
+def cell_text(cell):
+    """Текст ячейки w:tc: абзацы через '\\n', как _Cell.text в python-docx."""
+    return '\n'.join(paragraph_text(paragraph) for paragraph in cell.iterchildren(P))
+
+
+def property_value(parent, properties_tag, tag, default=None):
+    """Значение w:val свойства (например, w:tcPr/w:gridSpan); default, если свойства нет."""
+    properties = parent.find(properties_tag)
+    if properties is None:
+        return default
+    element = properties.find(tag)
+    if element is None:
+        return default
+    return element.get(W + 'val', 'continue' if tag == W + 'vMerge' else None)
+
+
+def row_cells(tr, above):
+    """
+    Тексты ячеек строки w:tr по сетке таблицы.
+
+    above - сведения о ячейках предыдущей строки (смещение в сетке -> (текст, ширина)),
+    нужны для продолжения вертикального объединения. Возвращает (тексты, сведения
+    о ячейках этой строки для следующей).
+    """
+    offset = int(property_value(tr, W + 'trPr', W + 'gridBefore', 0))
+    cells = []
+    current = {}
+    for tc in tr.iterchildren(TC):
+        span = int(property_value(tc, W + 'tcPr', W + 'gridSpan', 1))
+        if property_value(tc, W + 'tcPr', W + 'vMerge') == 'continue':
+            text, count = above.get(offset, ('', span))
+        else:
+            text, count = cell_text(tc), span
+        cells.extend([text] * count)
+        current[offset] = (text, count)
+        offset += span
+    return cells, current
+
+
+def table_rows(table):
+    """
+    Разбирает таблицу w:tbl в список строк с текстами ячеек по сетке таблицы.
+
+    Как и row.cells в python-docx: ячейка, объединенная по горизонтали, повторяется
+    по числу занятых столбцов сетки, а продолжение вертикального объединения
+    (vMerge="continue") берет текст верхней ячейки. Текст каждой ячейки
+    вычисляется один раз, повторы ссылаются на ту же строку.
+    """
+    rows = []
+    above = {}
+    for tr in table.iterchildren(TR):
+        cells, above = row_cells(tr, above)
+        rows.append(cells)
+    return rows
+
+
+def iter_table_rows(file_path):
+    """
+    Потоковое чтение строк таблиц верхнего уровня: (номер таблицы, номер строки, тексты ячеек).
+
+    word/document.xml разбирается через iterparse по мере чтения из архива, и
+    каждая строка отдается сразу после закрывающего тега w:tr. Разобранные
+    элементы тела удаляются, поэтому память не растет с размером документа,
+    а если вызывающий код прекращает перебор, остаток документа не читается.
+    Тексты ячеек - те же, что в read_docx.
+    """
+    body = W + 'body'
+    table_index = -1
+    row_index = 0
+    above = {}
+    with zipfile.ZipFile(file_path) as archive, archive.open('word/document.xml') as xml:
+        for event, element in etree.iterparse(xml, events=('start', 'end')):
+            parent = element.getparent()
+            if parent is None or parent.tag != body:
+                if event == 'end' and element.tag == TR and parent.tag == TBL and parent.getparent().tag == body:
+                    cells, above = row_cells(element, above)
+                    yield table_index, row_index, cells
+                    row_index += 1
+                    element.clear()
+                continue
+            if event == 'start':
+                if element.tag == TBL:
+                    table_index += 1
+                    row_index = 0
+                    above = {}
+            else:
+                # Элемент тела целиком обработан: освобождаем его и уже пройденных соседей
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+
+def read_docx(file_path):
+    """
+    Читает документ .docx один раз и возвращает его содержимое (DocxContent).
+
+    XML тела документа разбирается напрямую, без объектной модели python-docx,
+    поэтому тексты абзацев и ячеек не пересчитываются при каждом обращении.
+    В таблицы попадают только таблицы верхнего уровня, как doc.tables в python-docx.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        root = etree.fromstring(archive.read('word/document.xml'))
+    body = root.find(W + 'body')
+
+    blocks = []
+    paragraphs = []
+    tables = []
+    for child in body if body is not None else ():
+        if child.tag == P:
+            text = paragraph_text(child)
+            blocks.append(('p', text))
+            paragraphs.append(text)
+        elif child.tag == TBL:
+            rows = table_rows(child)
+            blocks.append(('tbl', rows))
+            tables.append(rows)
+    return DocxContent(blocks, paragraphs, tables)
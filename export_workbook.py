@@ -0,0 +1,331 @@
+from copy import copy
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils.cell import column_index_from_string
+
+# Значения ключа, по которым запись не считается уже внесенной (поле не заполнено)
+EMPTY_KEYS = (None, '', '-', '---')
+
+
+def key_part(value):
+    """
+    Приводит часть ключа к строке, чтобы номер, сохраненный в таблице числом
+    (524604 или 524604.0), совпадал с тем же номером, извлеченным как текст.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def write_row(sheet, row_number, row, styles=None):
+    """Записывает запись (словарь столбец -> значение) в строку листа; styles - ColumnStyles."""
+    for column, value in row.items():
+        cell = sheet[f'{column}{row_number}']
+        cell.value = value
+        if styles is not None:
+            styles.apply(cell, column)
+
+
+class ColumnStyles:
+    """
+    Оформление записываемых ячеек по столбцам: столбец -> {атрибут ячейки: значение},
+    например {'A': {'alignment': Alignment(wrap_text=True)}}.
+
+    Ячейке назначаются только объявленные атрибуты, остальное оформление (рамки,
+    шрифт, формат числа) остается прежним. Итоговый стиль разрешается в таблицах
+    стилей книги один раз для каждого сочетания столбца и исходного стиля ячейки;
+    остальные такие ячейки получают его готовым. Разрешенные стили привязаны
+    к книге, поэтому объект используется для одной книги.
+    """
+
+    def __init__(self, styles):
+        self.styles = styles
+        self.resolved = {}
+
+    def apply(self, cell, column):
+        attributes = self.styles.get(column)
+        if attributes is None:
+            return
+        key = (column, copy(cell._style))
+        style = self.resolved.get(key)
+        if style is not None:
+            cell._style = copy(style)
+            return
+        for name, value in attributes.items():
+            setattr(cell, name, value)
+        self.resolved[key] = copy(cell._style)
+
+
+def load_template_model(template_path):
+    """
+    Читает из шаблона все, что нужно для новой таблицы: для каждого листа
+    шапку (значения и стили ячеек), высоты строк, ширины столбцов,
+    объединенные ячейки и закрепленную область.
+    """
+    workbook = openpyxl.load_workbook(template_path)
+    try:
+        sheets = []
+        for sheet in workbook.worksheets:
+            rows = []
+            for row in sheet.iter_rows(min_row=1, max_row=sheet.max_row, max_col=sheet.max_column):
+                rows.append([(cell.value, cell_style(cell)) for cell in row])
+            sheets.append({
+                'title': sheet.title,
+                'rows': rows,
+                'row_heights': {index: dim.height for index, dim in sheet.row_dimensions.items() if dim.height},
+                'columns': {letter: (dim.min, dim.max, dim.width, dim.hidden)
+                            for letter, dim in sheet.column_dimensions.items()},
+                'merged': [str(cell_range) for cell_range in sheet.merged_cells.ranges],
+                'freeze_panes': sheet.freeze_panes,
+            })
+        return sheets
+    finally:
+        workbook.close()
+
+
+def cell_style(cell):
+    """Возвращает копию стиля ячейки шаблона (None, если стиль по умолчанию)."""
+    if not cell.has_style:
+        return None
+    return {
+        'font': copy(cell.font),
+        'fill': copy(cell.fill),
+        'border': copy(cell.border),
+        'alignment': copy(cell.alignment),
+        'protection': copy(cell.protection),
+        'number_format': cell.number_format,
+    }
+
+
+class StreamingTemplateExport:
+    """
+    Новая выходная таблица в режиме write_only.
+
+    Шапка и форматы столбцов шаблона воспроизводятся один раз, после чего строки
+    дописываются потоком по мере извлечения: память не растет с числом строк,
+    а сохранение занимает время, линейное по объему данных.
+    """
+
+    def __init__(self, template_path, save_path, template_model=None):
+        self.save_path = save_path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheets = []
+        self.appended = 0
+        for model in template_model or load_template_model(template_path):
+            self.sheets.append(self.create_sheet(model))
+
+    def create_sheet(self, model):
+        sheet = self.workbook.create_sheet(model['title'])
+
+        # Размеры и объединения задаются до записи первой строки
+        for letter, (min_col, max_col, width, hidden) in model['columns'].items():
+            dimension = sheet.column_dimensions[letter]
+            dimension.min, dimension.max = min_col, max_col
+            dimension.width = width
+            dimension.hidden = hidden
+        for index, height in model['row_heights'].items():
+            sheet.row_dimensions[index].height = height
+        for cell_range in model['merged']:
+            sheet.merged_cells.add(cell_range)
+        sheet.freeze_panes = model['freeze_panes']
+
+        for row in model['rows']:
+            sheet.append([self.styled_cell(sheet, value, style) for value, style in row])
+        return sheet
+
+    @staticmethod
+    def styled_cell(sheet, value, style):
+        cell = WriteOnlyCell(sheet, value)
+        if style is not None:
+            cell.font = style['font']
+            cell.fill = style['fill']
+            cell.border = style['border']
+            cell.alignment = style['alignment']
+            cell.protection = style['protection']
+            cell.number_format = style['number_format']
+        return cell
+
+    def write(self, row, sheet_index=0):
+        width = max(column_index_from_string(column) for column in row)
+        values = [None] * width
+        for column, value in row.items():
+            values[column_index_from_string(column) - 1] = value
+        self.write_values(values, sheet_index)
+
+    def write_values(self, values, sheet_index=0):
+        """Дописывает строку, заданную списком значений с первого столбца."""
+        self.sheets[sheet_index].append(values)
+        self.appended += 1
+
+    def save(self):
+        self.workbook.save(self.save_path)
+        return True
+
+    def close(self):
+        pass
+
+    def summary(self):
+        return f"Добавлено строк: {self.appended}"
+
+
+class RegisterUpsert:
+    """
+    Дозапись в существующую таблицу с обновлением уже внесенных строк.
+
+    Ключи уже внесенных строк (например, номер протокола в столбце E) собираются
+    одним проходом в режиме read_only. Запись с новым ключом дописывается в конец,
+    запись с известным ключом и другими значениями обновляет свою строку,
+    совпадающая запись пропускается как дубликат. Книга целиком открывается
+    только при сохранении и только если есть что записать.
+    При key_columns=None все записи просто дописываются в конец.
+    styles - оформление записываемых ячеек по столбцам (см. ColumnStyles).
+    sheet_index=None - активный лист книги (как wb.active).
+    headers - заголовки столбцов columns: пустые ячейки первой строки заполняются
+    при сохранении (например, для столбцов, добавленных после создания таблицы).
+    """
+
+    def __init__(self, save_path, columns, key_columns=('E',), sheet_index=0, styles=None, headers=None):
+        self.save_path = save_path
+        self.columns = list(columns)
+        self.key_columns = key_columns
+        self.sheet_index = sheet_index
+        self.styles = styles
+        self.headers = headers
+        self.index = {}
+        self.appends = []
+        self.updates = {}
+        self.duplicates = []
+        if key_columns is not None:
+            self.build_index()
+
+    def build_index(self):
+        """Строит индекс ключ -> (номер строки, значения записываемых столбцов) за один проход."""
+        positions = {column: column_index_from_string(column) - 1 for column in self.columns}
+        positions.update({column: column_index_from_string(column) - 1 for column in self.key_columns})
+        max_col = max(positions.values()) + 1
+
+        workbook = openpyxl.load_workbook(self.save_path, read_only=True)
+        try:
+            sheet = self.sheet(workbook)
+            for row_number, values in enumerate(sheet.iter_rows(max_col=max_col, values_only=True), start=1):
+                values = tuple(values) + (None,) * (max_col - len(values))
+                key = tuple(key_part(values[positions[column]]) for column in self.key_columns)
+                if all(part in EMPTY_KEYS for part in key):
+                    continue
+                self.index[key] = (row_number, None, tuple(values[positions[column]] for column in self.columns))
+        finally:
+            workbook.close()
+
+    def sheet(self, workbook):
+        if self.sheet_index is None:
+            return workbook.active
+        return workbook.worksheets[self.sheet_index]
+
+    def write(self, row):
+        """Принимает запись и возвращает 'appended', 'updated' или 'duplicate'."""
+        values = tuple(row.get(column) for column in self.columns)
+        key = tuple(key_part(row.get(column)) for column in self.key_columns) if self.key_columns is not None else None
+        entry = self.index.get(key) if key is not None and not all(part in EMPTY_KEYS for part in key) else None
+
+        if entry is None:
+            if key is not None:
+                self.index[key] = (None, len(self.appends), values)
+            self.appends.append(row)
+            return 'appended'
+
+        row_number, position, old_values = entry
+        if old_values == values:
+            self.duplicates.append(key)
+            return 'duplicate'
+
+        # Повтор ключа в той же пачке заменяет еще не записанную строку
+        if row_number is None:
+            self.appends[position] = row
+        else:
+            self.updates[row_number] = row
+        self.index[key] = (row_number, position, values)
+        return 'updated'
+
+    def save(self):
+        """Записывает новые и измененные строки. Возвращает False, если записывать нечего."""
+        if not self.changed:
+            return False
+
+        workbook = openpyxl.load_workbook(self.save_path)
+        try:
+            self.apply(workbook)
+            workbook.save(self.save_path)
+        finally:
+            workbook.close()
+        return True
+
+    @property
+    def changed(self):
+        return bool(self.appends or self.updates)
+
+    def apply(self, workbook):
+        """Вносит новые и измененные строки в открытую книгу."""
+        sheet = self.sheet(workbook)
+        if self.headers:
+            for column, title in zip(self.columns, self.headers):
+                cell = sheet[f'{column}1']
+                if cell.value is None:
+                    cell.value = title
+        styles = ColumnStyles(self.styles) if self.styles else None
+        for row_number, row in self.updates.items():
+            write_row(sheet, row_number, row, styles)
+        row_number = sheet.max_row + 1
+        for row in self.appends:
+            write_row(sheet, row_number, row, styles)
+            row_number += 1
+
+    def close(self):
+        pass
+
+    def summary(self):
+        text = f"Добавлено строк: {len(self.appends)}, обновлено: {len(self.updates)}, пропущено дубликатов: {len(self.duplicates)}"
+        if self.duplicates:
+            shown = ', '.join(' / '.join(str(part) for part in key) for key in self.duplicates[:20])
+            more = f" и еще {len(self.duplicates) - 20}" if len(self.duplicates) > 20 else ""
+            text += f"\nДубликаты: {shown}{more}"
+        return text
+
+
+class MultiSheetUpsert:
+    """
+    Дозапись в несколько листов одной существующей таблицы (например, два листа реестра СИ).
+
+    Для каждого листа ведется свой RegisterUpsert, а при сохранении книга
+    открывается и сохраняется один раз.
+    sheets - список (столбцы, ключевые столбцы или None) по листам, начиная с первого.
+    """
+
+    def __init__(self, save_path, sheets):
+        self.save_path = save_path
+        self.registers = [RegisterUpsert(save_path, columns, key_columns, sheet_index)
+                          for sheet_index, (columns, key_columns) in enumerate(sheets)]
+
+    def write(self, row, sheet_index=0):
+        return self.registers[sheet_index].write(row)
+
+    def save(self):
+        if not any(register.changed for register in self.registers):
+            return False
+
+        workbook = openpyxl.load_workbook(self.save_path)
+        try:
+            for register in self.registers:
+                register.apply(workbook)
+            workbook.save(self.save_path)
+        finally:
+            workbook.close()
+        return True
+
+    def close(self):
+        pass
+
+    def summary(self):
+        return "\n".join(f"Лист {index + 1}: {register.summary()}" for index, register in enumerate(self.registers))
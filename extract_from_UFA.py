@@ -2,12 +2,7 @@ import os
 import re
 import pandas as pd
 import glob
-from docx import Document
-from docx.document import Document as _Document
-from docx.oxml.text.paragraph import CT_P
-from docx.oxml.table import CT_Tbl
-from docx.table import _Cell, Table
-from docx.text.paragraph import Paragraph
+from docx_reader import read_docx
 
 def find_third_unique_repeated_value(cells):
     """
@@ -25,24 +20,6 @@ def find_third_unique_repeated_value(cells):
             return val
     return None  # если меньше трёх уникальных блоков подряд
 
-def iter_block_items(parent):
-    """
-    Yield each paragraph and table child within a parent object in document order.
-    """
-    if isinstance(parent, _Document):
-        parent_elm = parent.element.body
-    elif isinstance(parent, _Cell):
-        parent_elm = parent._tc
-    else:
-        raise ValueError("Unsupported parent type")
-
-    for child in parent_elm.iterchildren():
-        if isinstance(child, CT_P):
-            yield Paragraph(child, parent)
-        elif isinstance(child, CT_Tbl):
-            yield Table(child, parent)
-
-
 def extract_data_from_docx(file_path):
     """
     Extracts all specified data points from a single .docx file based on predefined rules.
@@ -54,17 +31,17 @@ def extract_data_from_docx(file_path):
         dict: A dictionary containing all the extracted data for one report.
     """
     try:
-        doc = Document(file_path)
+        # The document is parsed once; tables come back as rows of cell texts
+        blocks = read_docx(file_path).blocks
 
         # Combine all text from paragraphs and tables for easier searching
         full_text = []
-        for block in iter_block_items(doc):
-            if isinstance(block, Paragraph):
-                full_text.append(block.text)
-            elif isinstance(block, Table):
-                for row in block.rows:
-                    for cell in row.cells:
-                        full_text.append(cell.text)
+        for kind, block in blocks:
+            if kind == 'p':
+                full_text.append(block)
+            else:
+                for row in block:
+                    full_text.extend(row)
 
         full_text_content = "\n".join(full_text)
 
@@ -115,20 +92,20 @@ def extract_data_from_docx(file_path):
         in_si_table = False
         in_app1_table = False
 
-        for block in iter_block_items(doc):
-            if isinstance(block, Paragraph):
+        for kind, block in blocks:
+            if kind == 'p':
                 # Поиск по параграфам
-                if 'Перечень средств измерений' in block.text or "7. Перечень средств измерений:" in block.text:
+                if 'Перечень средств измерений' in block or "7. Перечень средств измерений:" in block:
                     in_si_table = True
-                elif 'ПРИЛОЖЕНИЕ № 1 К ПРОТОКОЛУ ИЗМЕРЕНИЙ' in block.text:
+                elif 'ПРИЛОЖЕНИЕ № 1 К ПРОТОКОЛУ ИЗМЕРЕНИЙ' in block:
                     in_app1_table = True
                 continue
 
-            if isinstance(block, Table):
+            if kind == 'tbl':
                 # Проверка таблицы на наличие ключевой фразы
-                for row in block.rows[:5]:  # Проверим только первые 1-2 строки
-                    for cell in row.cells:
-                        if 'ПРИЛОЖЕНИЕ № 1' in cell.text.upper():
+                for row in block[:5]:  # Проверим только первые 1-2 строки
+                    for cell_text in row:
+                        if 'ПРИЛОЖЕНИЕ № 1' in cell_text.upper():
                             in_app1_table = True
                             break
                     if in_app1_table:
@@ -136,8 +113,8 @@ def extract_data_from_docx(file_path):
 
                 # 7. Перечень средств измерений
                 if in_si_table:
-                    for row in block.rows:
-                        cells = [cell.text.strip() for cell in row.cells]
+                    for row in block:
+                        cells = [text.strip() for text in row]
                         if len(cells) > 4:
                             if '1' in cells[0]:
                                 data['Тип СИ ПКЭ'] = cells[2].replace('\n', ' ')
@@ -151,8 +128,8 @@ def extract_data_from_docx(file_path):
 
                 # Приложение 1
                 elif in_app1_table:
-                    for row in block.rows:
-                        cells = [cell.text.strip() for cell in row.cells]
+                    for row in block:
+                        cells = [text.strip() for text in row]
                         if len(cells) > 4:
                             if "δU(-)', %" in cells[0]:
 
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+
+# Локальный кэш извлеченных данных протоколов (не на сетевом диске)
+CACHE_PATH = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.expanduser('~'), 'ALL_LINVIT', 'protocol_cache.sqlite3')
+
+# Через сколько сохраненных записей фиксировать транзакцию: при аварийном
+# завершении длинного пакета теряются только последние записи
+COMMIT_EVERY = 50
+
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """Считает SHA-1 содержимого файла."""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Кэш извлеченных записей протоколов в SQLite.
+
+    Для файла хранится по записи на каждый движок чтения и версию извлечения,
+    так что запуски разными движками (или экспорт вместе с реестром) не вытесняют
+    записи друг друга. Запись ищется по пути, размеру и времени изменения файла;
+    если файл уже есть в кэше, но они не совпали, сверяется хэш содержимого
+    (файл мог быть перезаписан без изменений). Новый файл в lookup не читается:
+    его хэш считается при извлечении по уже прочитанной (локальной) копии
+    и передается в store.
+    Транзакция фиксируется каждые COMMIT_EVERY записей и при закрытии.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        # Прежняя таблица хранила одну запись на путь; кэш просто наполняется заново
+        self.connection.execute('DROP TABLE IF EXISTS protocols')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            'path TEXT, engine TEXT, version INTEGER, size INTEGER, mtime_ns INTEGER, sha1 TEXT, record BLOB, '
+            'PRIMARY KEY (path, engine, version))'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS records_sha1 ON records (sha1)')
+        self.hits = 0
+        self.misses = 0
+        self.pending = 0
+
+    @staticmethod
+    def normalize_path(file_path):
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def lookup(self, file_path, engine, version):
+        """
+        Ищет запись для файла.
+
+        Возвращает запись (или None) и отпечаток файла (размер, время изменения, хэш),
+        который передается в store после извлечения.
+        """
+        path = self.normalize_path(file_path)
+        stat = os.stat(file_path)
+        fingerprint = (stat.st_size, stat.st_mtime_ns, None)
+
+        row = self.connection.execute(
+            'SELECT size, mtime_ns, record FROM records WHERE path = ? AND engine = ? AND version = ?',
+            (path, engine, version)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None, fingerprint
+        if row[:2] == (stat.st_size, stat.st_mtime_ns):
+            self.hits += 1
+            return pickle.loads(row[2]), fingerprint
+
+        # Файл уже был в кэше, но размер или время изменились - сверяем содержимое
+        sha1 = file_hash(file_path)
+        fingerprint = (stat.st_size, stat.st_mtime_ns, sha1)
+        row = self.connection.execute(
+            'SELECT record FROM records WHERE sha1 = ? AND size = ? AND engine = ? AND version = ?',
+            (sha1, stat.st_size, engine, version)
+        ).fetchone()
+        if row is not None:
+            self.hits += 1
+            record = pickle.loads(row[0])
+            self.store(file_path, engine, version, record, fingerprint)
+            return record, fingerprint
+
+        self.misses += 1
+        return None, fingerprint
+
+    def store(self, file_path, engine, version, record, fingerprint, sha1=None):
+        """
+        Сохраняет запись для файла с отпечатком, полученным в lookup.
+        sha1 - хэш, посчитанный при извлечении; если его нет ни там, ни в отпечатке,
+        файл читается для подсчета хэша.
+        """
+        size, mtime_ns, fingerprint_sha1 = fingerprint
+        sha1 = fingerprint_sha1 or sha1
+        if sha1 is None:
+            sha1 = file_hash(file_path)
+        self.connection.execute(
+            'INSERT OR REPLACE INTO records (path, engine, version, size, mtime_ns, sha1, record) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (self.normalize_path(file_path), engine, version, size, mtime_ns, sha1, pickle.dumps(record))
+        )
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.connection.commit()
+            self.pending = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        """Строка с итогами использования кэша для статуса и сообщений."""
+        total = self.hits + self.misses
+        return f"Из кэша: {self.hits} из {total} ({self.hit_rate:.0%})"
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,385 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from protocol_reader import (ENGINES, DEFAULT_ENGINE, EXTRACTOR_VERSION, OUTPUT_COLUMNS,
+                             extract_combined_task, extract_protocol_task, select_columns)
+from extraction_cache import ExtractionCache, file_hash
+from export_workbook import RegisterUpsert, StreamingTemplateExport
+from reestr_register import REESTR_TEMPLATE_FILE_PATH, ReestrUpsert
+from template_cache import template_model
+from columnar_export import COLUMNAR_FORMATS, ColumnarExport
+from batch_utils import FilePrefetcher, ResourceMonitor, TimingReport, bounded_map, collect_files
+
+# Путь к файлу-шаблону
+TEMPLATE_FILE_PATH = r'\\192.168.34.9\линвит\ПОЛЬЗОВАТЕЛИ\USER49\Программы\Шаблоны для программ\Файл для экспорта (для ИК).xlsx'
+
+# Режим длинной пачки: не больше LONG_BATCH_MAX_OPEN одновременно открытых книг,
+# процессы пула перезапускаются каждые LONG_BATCH_TASKS_PER_CHILD файлов,
+# память и дескрипторы замеряются каждые RESOURCE_SAMPLE_EVERY файлов
+LONG_BATCH_MAX_OPEN = 4
+LONG_BATCH_TASKS_PER_CHILD = 200
+RESOURCE_SAMPLE_EVERY = 20
+
+# Предварительное копирование: сколько файлов держать скопированными локально впереди обработки
+PREFETCH_DEPTH = 8
+
+# Сколько самых медленных файлов показывать в итоговом сообщении
+SLOWEST_FILES_SHOWN = 5
+
+# Быстрый набор столбцов: номер протокола и даты
+QUICK_COLUMNS = ['E', 'G', 'J', 'K']
+
+# Расширения файлов протоколов при обходе папок
+PROTOCOL_EXTENSIONS = ('.xlsx',)
+
+
+class ExportEvents:
+    """
+    Обработчики событий выгрузки: статус, прогресс, предупреждения и ошибки по файлам.
+
+    Базовый класс ничего не показывает; окно программы и командная строка
+    переопределяют нужные методы.
+    """
+
+    def status(self, message):
+        pass
+
+    def progress(self):
+        pass
+
+    def file_warning(self, file_path, message):
+        pass
+
+    def file_error(self, file_path, message):
+        pass
+
+
+def extract_with_hash(task, file_path):
+    """
+    Выполняет task для файла и добавляет к записи хэш содержимого для кэша ('sha1').
+
+    Хэш считается по тому же пути, что только что читался (при prefetch - по
+    локальной копии), поэтому файл на сетевом диске второй раз не читается.
+    """
+    result = task(file_path)
+    if not isinstance(result, Exception):
+        try:
+            result['sha1'] = file_hash(file_path)
+        except OSError:
+            pass  # Хэш будет посчитан при сохранении в кэш
+    return result
+
+
+def open_output(action, save_path, template_path=TEMPLATE_FILE_PATH, upsert=True, columns=None):
+    """
+    Создает выходную таблицу: 'new' - новая по шаблону, 'existing' - дозапись в существующую.
+
+    При upsert в существующую таблицу дописываются только новые протоколы
+    (по номеру протокола в столбце E), измененные обновляются, совпадающие пропускаются.
+    """
+    if action == "existing":
+        # Обновлять строки по номеру протокола можно, только если столбец E заполняется
+        key_columns = ('E',) if upsert and (columns is None or 'E' in columns) else None
+        return RegisterUpsert(save_path, columns or OUTPUT_COLUMNS, key_columns=key_columns)
+    if action == "new":
+        # Новая таблица по шаблону: шапка копируется один раз, строки пишутся потоком;
+        # модель шаблона берется из локального кэша, пока шаблон на сетевом диске не изменился
+        return StreamingTemplateExport(template_path, save_path, template_model(template_path))
+    raise ValueError(f"Некорректное действие: {action}")
+
+
+def open_reestr_output(action, save_path, template_path=REESTR_TEMPLATE_FILE_PATH, upsert=True):
+    """
+    Создает таблицу реестра применения СИ с двумя листами (по первому и второму СИ):
+    'new' - новая по шаблону, 'existing' - дозапись в существующую.
+
+    При upsert в существующий реестр не дописываются уже внесенные пары
+    (заводской номер, номер протокола), см. ReestrUpsert.
+    """
+    if action == "existing":
+        return ReestrUpsert(save_path, upsert)
+    if action == "new":
+        return StreamingTemplateExport(template_path, save_path, template_model(template_path))
+    raise ValueError(f"Некорректное действие: {action}")
+
+
+def export_protocols(file_paths, output, save_path, events=None, workers=1, engine=DEFAULT_ENGINE,
+                     use_cache=True, long_batch=False, prefetch=True, timing=True, columns=None,
+                     columnar=None, reestr_output=None, reestr_path=None):
+    """
+    Извлекает данные из протоколов, записывает их в выходную таблицу и сохраняет ее.
+
+    При workers > 1 файлы разбираются в пуле процессов, а запись в выходную таблицу
+    идет в этом потоке в исходном порядке файлов. При use_cache неизменившиеся
+    с прошлого запуска файлы берутся из локального кэша без разбора.
+    В режиме long_batch число одновременно открытых книг ограничено, а расход памяти
+    и дескрипторов выводится в статус и в итоговое сообщение.
+    При prefetch файлы заранее копируются с сетевого диска во временную локальную
+    папку в фоновом потоке, пока разбираются предыдущие.
+    При timing время фаз по каждому файлу сохраняется в CSV рядом с выходной таблицей,
+    а в итоговое сообщение выводятся скорость обработки и самые медленные файлы.
+    columns - заполняемые столбцы (None - все): из протоколов читаются только листы,
+    от которых они зависят. Записи из кэша используются, только если кэширована полная запись.
+    columnar - формат дополнительной столбцовой выгрузки рядом с таблицей ('parquet', 'csv'
+    или None), см. ColumnarExport.
+    reestr_output - таблица реестра применения СИ (см. open_reestr_output), сохраняемая
+    в reestr_path: каждый протокол разбирается один раз, и его данные попадают
+    и в выходную таблицу, и на оба листа реестра.
+
+    Ошибки по отдельным файлам передаются в events и не прерывают обработку.
+    Возвращает (признак записи файла, текст итогов); ошибка сохранения пробрасывается.
+    """
+    events = events or ExportEvents()
+    total_files = len(file_paths)
+
+    # Записи совместного прохода (с данными реестра) кэшируются отдельно от обычных
+    cache_engine = engine + '+reestr' if reestr_output is not None else engine
+
+    # Файлы, не изменившиеся с прошлого запуска, берутся из кэша, остальные извлекаются заново
+    cache = ExtractionCache() if use_cache else None
+    cached = {}
+    fingerprints = {}
+    if cache is not None:
+        events.status("Проверка кэша...")
+        for i, file_path in enumerate(file_paths):
+            try:
+                record, fingerprints[i] = cache.lookup(file_path, cache_engine, EXTRACTOR_VERSION)
+            except OSError:
+                continue  # Файл недоступен - ошибка будет показана при извлечении
+            if record is not None:
+                cached[i] = record
+    pending = [file_path for i, file_path in enumerate(file_paths) if i not in cached]
+
+    # Результаты пула возвращаются в порядке pending
+    task = partial(extract_combined_task if reestr_output is not None else extract_protocol_task,
+                   engine=engine, columns=columns)
+    if cache is not None and columns is None:
+        # В кэш попадают только полные записи; их хэш считается вместе с извлечением
+        task = partial(extract_with_hash, task)
+    monitor = ResourceMonitor() if long_batch else None
+    timing_report = TimingReport() if timing else None
+    columnar_output = ColumnarExport(save_path, columnar, columns) if columnar else None
+    prefetcher = FilePrefetcher(pending, PREFETCH_DEPTH) if prefetch and pending else None
+    items = prefetcher if prefetcher is not None else pending
+    if workers > 1 and pending and long_batch:
+        # Каждый процесс держит открытой одну книгу, в работе не больше workers файлов,
+        # процессы периодически пересоздаются, чтобы не накапливать память
+        workers = min(workers, LONG_BATCH_MAX_OPEN)
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       max_tasks_per_child=LONG_BATCH_TASKS_PER_CHILD)
+        results = bounded_map(executor, task, items, workers)
+    elif workers > 1 and pending:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # executor.map забирает все файлы сразу, а копии должны подаваться по мере готовности
+        results = bounded_map(executor, task, items, workers) if prefetcher is not None else executor.map(task, items)
+    else:
+        executor = None
+        results = map(task, items)
+
+    for i, file_path in enumerate(file_paths):
+        try:
+            status = f"Обработка файла {i + 1} из {total_files}: {os.path.basename(file_path)}"
+            if monitor is not None:
+                if i % RESOURCE_SAMPLE_EVERY == 0:
+                    monitor.sample()
+                status += f" | {monitor.status()}"
+            events.status(status)
+
+            if i in cached:
+                result = select_columns(cached[i], columns)
+            else:
+                result = next(results)
+                if prefetcher is not None:
+                    prefetcher.release()
+            if isinstance(result, Exception):
+                raise result
+            sha1 = result.pop('sha1', None)
+            # В кэш попадают только полные записи
+            if cache is not None and i not in cached and i in fingerprints and columns is None:
+                cache.store(file_path, cache_engine, EXTRACTOR_VERSION, result, fingerprints[i], sha1)
+            row, missing_sheets = result['row'], result['missing_sheets']
+
+            # Предупреждение об отсутствующих листах
+            if missing_sheets:
+                events.file_warning(file_path,
+                                    f"В файле {os.path.basename(file_path)} отсутствуют листы: {', '.join(missing_sheets)}. "
+                                    "Соответствующие данные будут заменены на '---'.")
+
+            # Запись данных в первый лист
+            write_started = time.perf_counter()
+            output.write(row)
+            if columnar_output is not None:
+                columnar_output.write(row, file_path)
+            if reestr_output is not None:
+                if result['reestr'] is not None:
+                    for sheet_index, reestr_row in enumerate(result['reestr']):
+                        reestr_output.write(reestr_row, sheet_index)
+                    if result['reestr_missing_sheets']:
+                        events.file_warning(file_path, f"В файле {os.path.basename(file_path)} отсутствуют листы для реестра СИ: "
+                                                       f"{', '.join(result['reestr_missing_sheets'])}. "
+                                                       "Соответствующие данные будут заменены на '---'.")
+                else:
+                    events.file_warning(file_path, f"Данные файла {os.path.basename(file_path)} не внесены в реестр СИ: "
+                                                   f"{result['reestr_error']}")
+            if timing_report is not None:
+                # Для записей из кэша время разбора не учитывается
+                timings = {} if i in cached else dict(result.get('timings', {}))
+                timings['write'] = time.perf_counter() - write_started
+                timing_report.add(file_path, timings, result.get('layout'), cached=i in cached)
+
+        except FileNotFoundError:
+            events.file_error(file_path, f"Файл не найден: {file_path}")
+        except Exception as e:
+            events.file_error(file_path, f"Ошибка при обработке файла {os.path.basename(file_path)}: {e}")
+
+        events.progress()
+
+    if executor is not None:
+        executor.shutdown()
+    if prefetcher is not None:
+        prefetcher.close()
+
+    summary = output.summary()
+    if columnar_output is not None:
+        try:
+            columnar_output.save()
+            summary += "\n" + columnar_output.summary()
+        except Exception as e:
+            summary += f"\nНе удалось сохранить столбцовую выгрузку {columnar_output.path}: {e}"
+        finally:
+            columnar_output.close()
+    if cache is not None:
+        summary += "\n" + cache.summary()
+        cache.close()
+    if monitor is not None:
+        monitor.sample()
+        summary += "\n" + monitor.summary()
+    if timing_report is not None:
+        summary += "\n" + timing_report.summary(SLOWEST_FILES_SHOWN)
+        timing_path = os.path.splitext(save_path)[0] + "_время_обработки.csv"
+        try:
+            timing_report.save_csv(timing_path)
+            summary += f"\nВремя по файлам: {timing_path}"
+        except OSError as e:
+            summary += f"\nНе удалось сохранить время по файлам: {e}"
+
+    try:
+        events.status("Сохранение файла...")
+        save_started = time.perf_counter()
+        saved = output.save()
+        if timing_report is not None:
+            summary += f"\nСохранение таблицы: {time.perf_counter() - save_started:.1f} с"
+        if reestr_output is not None:
+            events.status("Сохранение реестра СИ...")
+            reestr_saved = reestr_output.save()
+            summary += f"\nРеестр СИ ({reestr_path}):\n{reestr_output.summary()}"
+            if not reestr_saved:
+                summary += "\nРеестр СИ не изменен"
+    finally:
+        output.close()
+        if reestr_output is not None:
+            reestr_output.close()
+    return saved, summary
+
+
+class ConsoleEvents(ExportEvents):
+    """События выгрузки для командной строки: ошибки и предупреждения собираются в итог."""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.errors = []
+        self.warnings = []
+
+    def status(self, message):
+        if self.verbose:
+            print(message, file=sys.stderr)
+
+    def file_warning(self, file_path, message):
+        self.warnings.append((file_path, message))
+
+    def file_error(self, file_path, message):
+        self.errors.append((file_path, message))
+        print(f"Ошибка: {message}", file=sys.stderr)
+
+    def summary(self):
+        lines = [f"Предупреждений: {len(self.warnings)}, ошибок: {len(self.errors)}"]
+        for file_path, message in self.errors:
+            lines.append(f"  {file_path}: {message}")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    """Выгрузка без окна: python Extract_Data_From_Protocols.py <папки, маски или файлы> -o <таблица>."""
+    parser = argparse.ArgumentParser(description="Выгрузка данных из протоколов в таблицу по шаблону")
+    parser.add_argument('paths', nargs='+', help="Папки (обходятся рекурсивно), маски glob или файлы протоколов")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('-o', '--output', help="Новая таблица по шаблону")
+    target.add_argument('--existing', help="Существующая таблица для дозаписи")
+    parser.add_argument('--template', default=TEMPLATE_FILE_PATH, help="Файл-шаблон для новой таблицы")
+    reestr = parser.add_mutually_exclusive_group()
+    reestr.add_argument('--reestr-output', help="Заполнить за тот же проход новый реестр применения СИ")
+    reestr.add_argument('--reestr-existing', help="Заполнить за тот же проход существующий реестр применения СИ")
+    parser.add_argument('--reestr-template', default=REESTR_TEMPLATE_FILE_PATH, help="Шаблон реестра применения СИ")
+    parser.add_argument('--workers', type=int, default=1, help="Число процессов для разбора")
+    parser.add_argument('--engine', choices=list(ENGINES), default=DEFAULT_ENGINE, help="Движок чтения")
+    parser.add_argument('--columns', nargs='+', choices=list(OUTPUT_COLUMNS), help="Заполняемые столбцы (по умолчанию все)")
+    parser.add_argument('--quick', action='store_true', help="Только номер протокола и даты")
+    parser.add_argument('--no-cache', action='store_true', help="Не использовать кэш протоколов")
+    parser.add_argument('--no-upsert', action='store_true', help="Дописывать все протоколы, не проверяя повторы")
+    parser.add_argument('--no-prefetch', action='store_true', help="Не копировать файлы локально перед обработкой")
+    parser.add_argument('--no-timing', action='store_true', help="Не сохранять время обработки по файлам")
+    parser.add_argument('--columnar', choices=COLUMNAR_FORMATS, help="Дополнительная выгрузка в Parquet или CSV рядом с таблицей")
+    parser.add_argument('--long-batch', action='store_true', help="Режим длинной пачки")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Выводить статус по каждому файлу")
+    args = parser.parse_args(argv)
+
+    file_paths = collect_files(args.paths, PROTOCOL_EXTENSIONS)
+    if not file_paths:
+        print("Файлы протоколов не найдены.", file=sys.stderr)
+        return 1
+
+    action, save_path = ("existing", args.existing) if args.existing else ("new", args.output)
+    columns = QUICK_COLUMNS if args.quick else args.columns
+    try:
+        output = open_output(action, save_path, args.template, not args.no_upsert, columns)
+    except Exception as e:
+        print(f"Ошибка при открытии {save_path if action == 'existing' else args.template}: {e}", file=sys.stderr)
+        return 1
+
+    reestr_output = None
+    reestr_path = args.reestr_existing or args.reestr_output
+    if reestr_path:
+        reestr_action = "existing" if args.reestr_existing else "new"
+        try:
+            reestr_output = open_reestr_output(reestr_action, reestr_path, args.reestr_template, not args.no_upsert)
+        except Exception as e:
+            print(f"Ошибка при открытии {reestr_path if reestr_action == 'existing' else args.reestr_template}: {e}",
+                  file=sys.stderr)
+            return 1
+
+    print(f"Найдено файлов: {len(file_paths)}", file=sys.stderr)
+    events = ConsoleEvents(args.verbose)
+    try:
+        saved, summary = export_protocols(
+            file_paths, output, save_path, events, workers=max(1, args.workers), engine=args.engine,
+            use_cache=not args.no_cache, long_batch=args.long_batch, prefetch=not args.no_prefetch,
+            timing=not args.no_timing, columns=columns, columnar=args.columnar,
+            reestr_output=reestr_output, reestr_path=reestr_path)
+    except Exception as e:
+        print(f"Ошибка при сохранении файла: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Данные записаны в файл: {save_path}" if saved else f"Новых или измененных протоколов нет, файл не изменен: {save_path}")
+    print(summary)
+    print(events.summary())
+    return 1 if events.errors else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,291 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+import openpyxl
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+
+from protocol_reader import OUTPUT_COLUMNS, format_date
+
+# Генератор синтетических протоколов для замеров скорости извлечения (см. benchmark_extraction.py).
+# Адреса ячеек задаются здесь независимо от protocol_reader, чтобы сверка результата
+# проверяла правила извлечения, а не повторяла их.
+
+# Адреса по макетам: строки таблицы СИ (первое СИ - ПКЭ, второе - СИ), склеиваемые ячейки,
+# даты испытаний, сети и номер протокола на листе "Титул", регион и место установки для реестра
+GENERATED_LAYOUTS = {
+    'AG33': {
+        'pke_row': 34, 'si_row': 35,
+        'header_1': ('AI2', 'A3'), 'header_2': ('AI4', 'A5'), 'region': ('R21', 'A22'),
+        'test': ('M25', 'M26'), 'network': ('A32', 'A33'), 'number': 'BC26',
+        'reestr_region': 'R21', 'install': 'AS19', 'reestr_blank_network_2': '',
+    },
+    'AG30': {
+        'pke_row': 31, 'si_row': 32,
+        'header_1': ('A2',), 'header_2': ('A3',), 'region': ('A19',),
+        'test': ('M22', 'M23'), 'network': ('A35', 'A36'), 'number': 'BC29',
+        'reestr_region': 'A19', 'install': 'I18', 'reestr_blank_network_2': None,
+    },
+    'AG32': {
+        'pke_row': 33, 'si_row': 34,
+        'header_1': ('AI2', 'A3'), 'header_2': ('AI4', 'A5'), 'region': ('R21', 'A22'),
+        'test': ('M24', 'M25'), 'network': ('A35', 'A36'), 'number': 'BC29',
+        'reestr_region': 'A19', 'install': 'I17', 'reestr_blank_network_2': None,
+    },
+    'AG34': {
+        'pke_row': 35, 'si_row': 36,
+        'header_1': ('AI2', 'A3'), 'header_2': ('AI4', 'A5'), 'region': ('R21', 'A22'),
+        'test': ('M26', 'M27'), 'network': ('A35', 'A36'), 'number': 'BC29',
+        'reestr_region': 'R21', 'install': 'AS19', 'reestr_blank_network_2': '',
+    },
+}
+
+# Варианты набора листов:
+# plain - обычные листы; 3pr - "Протокол" и "Записи" скрыты, данные на листах "-3пр";
+# pke32144 - лист "ПКЭ 32144" вместо "ПКЭ"; no_phases - нет листа "3ф-4пр"
+SHEET_VARIANTS = ('plain', '3pr', 'pke32144', 'no_phases')
+
+DU_LABEL_TEXT = 'Установившееся отрицательное отклонение напряжения δU(-), %'
+DEVICE_TYPES = ('Ресурс-UF2М', 'Энергомонитор-3.3Т1', 'ПКК-57', 'Парма РК3.01', 'Ресурс-ПКЭ-1.7')
+NETWORKS = ('ПАО "Россети Сибирь" - "Алтайэнерго"', 'АО "Барнаульская горэлектросеть"', 'ООО "БашРЭС-Уфа"')
+REGIONS = ('Алтайский край', 'Республика Башкортостан', 'Новосибирская область')
+
+
+def random_date(rng):
+    return datetime(2024, 1, 1) + timedelta(days=rng.randrange(0, 600))
+
+
+def make_spec(index, rng):
+    """Случайное описание протокола: макет, вариант листов и значения полей."""
+    test_start = random_date(rng)
+    network_2 = rng.choice((None, 'филиал "Барнаульские электрические сети"'))
+    return {
+        'layout': rng.choice(list(GENERATED_LAYOUTS)),
+        'variant': rng.choice(SHEET_VARIANTS),
+        'protocol_date': test_start + timedelta(days=rng.randrange(8, 20)),
+        'test_start': test_start,
+        'test_end': test_start + timedelta(days=7),
+        'pke_type': rng.choice(DEVICE_TYPES),
+        'pke_serial': str(rng.randrange(100000, 999999)),
+        'pke_check': f'до {format_date(random_date(rng))}',
+        'si_type': rng.choice(DEVICE_TYPES),
+        'si_serial': str(rng.randrange(100000, 999999)),
+        'si_check': f'до {format_date(random_date(rng))}',
+        'header_1': ('Испытательная лаборатория', rng.choice((None, ' ООО "Линвит"'))),
+        'header_2': ('Аттестат аккредитации', rng.choice((None, ' № RA.RU.21АБ01'))),
+        'region': (rng.choice(REGIONS), rng.choice((None, ', г. Барнаул'))),
+        'reestr_region': rng.choice(REGIONS),
+        'install': f'ТП-{rng.randrange(1, 999)}, РУ-0,4 кВ',
+        'network': rng.choice(NETWORKS),
+        'network_2': network_2,
+        'protocol_number': f'{index + 1}/{rng.choice((23, 24, 25))}',
+        'place': rng.choice((None, f'Ф-{rng.randrange(1, 30)}')),
+        'power_center': rng.choice((None, f'ПС {rng.randrange(1, 200)}')),
+        'expert': rng.choice(('Иванов И.И.', 'Петров П.П.', 'Сидоров С.С.')),
+        'loads': [f'{hour:02d}:00' for hour in (8, 12, 17, 21)],
+        'du_row': rng.randrange(60, 110),
+        'du_minus': round(rng.uniform(-10, 0), 2),
+        'du_plus': round(rng.uniform(0, 10), 2),
+        'phases': [round(rng.uniform(-10, 10), 2) for _ in range(4)],
+    }
+
+
+def fill_noise(cells, rng, first_row, last_row, max_col):
+    """Заполняет лист "фоном" (текст и числа), чтобы размер и разбор были как у настоящих протоколов."""
+    for row in range(first_row, last_row + 1):
+        for col in range(1, max_col + 1, 4):
+            if (row, col) not in cells:
+                cells[(row, col)] = rng.choice(('Норма', 'соответствует', '±5', None)) or round(rng.random() * 100, 3)
+
+
+def put(cells, address, value):
+    """Записывает значение по адресу вида 'AG34'."""
+    column, row = coordinate_from_string(address)
+    cells[(row, column_index_from_string(column))] = value
+
+
+def protocol_cells(spec, rng, noise_rows):
+    """Ячейки листа "Протокол" для описания протокола."""
+    layout = GENERATED_LAYOUTS[spec['layout']]
+    cells = {}
+    fill_noise(cells, rng, 40, 40 + noise_rows, 82)
+
+    put(cells, f"AG{layout['pke_row'] - 1}", 'Тип СИ')
+    put(cells, f"BE{layout['pke_row'] - 1}", 'Заводской номер')
+    put(cells, f"CD{layout['pke_row'] - 1}", 'Сведения о поверке')
+    for prefix, row in (('pke', layout['pke_row']), ('si', layout['si_row'])):
+        put(cells, f'AG{row}', spec[f'{prefix}_type'])
+        put(cells, f'BE{row}', spec[f'{prefix}_serial'])
+        put(cells, f'CD{row}', spec[f'{prefix}_check'])
+
+    for field in ('header_1', 'header_2', 'region'):
+        for address, value in zip(layout[field], spec[field]):
+            if value is not None:
+                put(cells, address, value)
+    put(cells, layout['reestr_region'], spec['reestr_region'] if layout['reestr_region'] not in layout['region'] else spec['region'][0])
+    put(cells, layout['install'], spec['install'])
+    put(cells, layout['test'][0], spec['test_start'])
+    put(cells, layout['test'][1], spec['test_end'])
+
+    # Строка dU: подпись в столбце H, значения в столбце K на 1 и 3 строки ниже
+    put(cells, f"H{spec['du_row']}", DU_LABEL_TEXT)
+    put(cells, f"K{spec['du_row'] + 1}", spec['du_minus'])
+    put(cells, f"K{spec['du_row'] + 3}", spec['du_plus'])
+    return cells
+
+
+def write_sheet(workbook, title, cells, hidden=False):
+    sheet = workbook.create_sheet(title)
+    if hidden:
+        sheet.sheet_state = 'hidden'
+    if not cells:
+        return
+    max_row = max(row for row, _ in cells)
+    max_col = max(col for _, col in cells)
+    rows = [[None] * max_col for _ in range(max_row)]
+    for (row, col), value in cells.items():
+        rows[row - 1][col - 1] = value
+    for row in rows:
+        sheet.append(row)
+
+
+def generate_protocol(file_path, spec, rng, noise_rows=100):
+    """Создает файл протокола по описанию spec (книга пишется в режиме write_only)."""
+    layout = GENERATED_LAYOUTS[spec['layout']]
+    variant = spec['variant']
+    workbook = openpyxl.Workbook(write_only=True)
+
+    title = {}
+    put(title, 'BU24', spec['protocol_date'])
+    put(title, layout['network'][0], spec['network'])
+    if spec['network_2'] is not None:
+        put(title, layout['network'][1], spec['network_2'])
+    put(title, layout['number'], spec['protocol_number'])
+    write_sheet(workbook, 'Титул', title)
+
+    protocol = protocol_cells(spec, rng, noise_rows)
+    records = {}
+    if spec['place'] is not None:
+        put(records, 'AK6', spec['place'])
+    if spec['power_center'] is not None:
+        put(records, 'U9', spec['power_center'])
+    put(records, 'BZ37', spec['expert'])
+
+    if variant == '3pr':
+        # Скрытые листы со старыми данными: данные должны браться с листов "-3пр"
+        decoy = dict(protocol)
+        for address in ('AG30', 'AG32', 'AG33', 'AG34'):
+            put(decoy, address, 'устаревший лист')
+        write_sheet(workbook, 'Протокол', decoy, hidden=True)
+        write_sheet(workbook, 'Протокол-3пр', protocol)
+        write_sheet(workbook, 'Записи', {(37, 78): 'устаревший лист'}, hidden=True)
+        write_sheet(workbook, 'Записи-3пр', records)
+    else:
+        write_sheet(workbook, 'Протокол', protocol)
+        write_sheet(workbook, 'Записи', records)
+
+    pke = {}
+    for address, value in zip(('G6', 'H6', 'G7', 'H7'), spec['loads']):
+        put(pke, address, value)
+    write_sheet(workbook, 'ПКЭ 32144' if variant == 'pke32144' else 'ПКЭ', pke)
+
+    if variant != 'no_phases':
+        phases = {}
+        for address, value in zip(('BE16', 'BE17', 'BE26', 'BE27'), spec['phases']):
+            put(phases, address, value)
+        write_sheet(workbook, '3ф-4пр', phases)
+
+    workbook.save(file_path)
+
+
+def combined(parts):
+    """Склейка, как в get_combined_value: пустое продолжение не добавляется."""
+    return ''.join(str(part) for part in parts if part is not None)
+
+
+def expected_protocol(spec):
+    """Ожидаемый результат extract_protocol: запись для выходной таблицы и отсутствующие листы."""
+    layout = GENERATED_LAYOUTS[spec['layout']]
+    no_phases = spec['variant'] == 'no_phases'
+    number = spec['protocol_number'].split('/')
+    values = {
+        'network': spec['network'] + (' ' + spec['network_2'] if spec['network_2'] is not None else ''),
+        'protocol_number': spec['protocol_number'],
+        'protocol_date': format_date(spec['protocol_date']),
+        'power_center': spec['power_center'] if spec['power_center'] is not None else '-',
+        'place': spec['place'] if spec['place'] is not None else '-',
+        'test_start': format_date(spec['test_start']),
+        'test_end': format_date(spec['test_end']),
+        'du_minus': spec['du_minus'],
+        'du_plus': spec['du_plus'],
+        # В макетах без продолжения (AG30) вторая часть не записывается в файл
+        'header_1': combined(spec['header_1'][:len(layout['header_1'])]),
+        'header_2': combined(spec['header_2'][:len(layout['header_2'])]),
+        'region': combined(spec['region'][:len(layout['region'])]),
+        'expert': spec['expert'],
+        'protocol_seq': number[0] + ',' + number[1],
+    }
+    for prefix in ('pke', 'si'):
+        for suffix in ('type', 'serial', 'check'):
+            values[f'{prefix}_{suffix}'] = spec[f'{prefix}_{suffix}']
+    for field, value in zip(('load_start_1', 'load_end_1', 'load_start_2', 'load_end_2'), spec['loads']):
+        values[field] = value
+    for field, value in zip(('du_minus_1', 'du_plus_1', 'du_minus_2', 'du_plus_2'), spec['phases']):
+        values[field] = '---' if no_phases else value
+
+    row = {column: values[field] for column, field in OUTPUT_COLUMNS.items()}
+    return {'row': row, 'missing_sheets': ['3ф-4пр'] if no_phases else [], 'layout': spec['layout']}
+
+
+def expected_reestr(spec):
+    """Ожидаемый результат extract_reestr: записи для первого и второго листов реестра."""
+    layout = GENERATED_LAYOUTS[spec['layout']]
+    network_2 = spec['network_2'] if spec['network_2'] is not None else layout['reestr_blank_network_2']
+    organization = str(spec['network']) if network_2 is None else str(spec['network']) + ' ' + str(network_2)
+    number = spec['protocol_number'].split('/')
+    region = spec['region'][0] if layout['reestr_region'] in layout['region'] else spec['reestr_region']
+    common = {
+        'F': region,
+        'G': organization,
+        'H': format_date(spec['test_start']),
+        'I': format_date(spec['test_end']),
+        'J': spec['expert'],
+        'O': spec['install'],
+        'P': spec['protocol_number'],
+        'S': number[0] + ',' + number[1],
+    }
+    row = dict(common, C=spec['pke_serial'], D=spec['pke_type'],
+               Q=f"{spec['si_type']} Зав.№: {spec['si_serial']}")
+    row1 = dict(common, C=spec['si_serial'], D=spec['si_type'],
+                Q=f"{spec['pke_type']} Зав.№: {spec['pke_serial']}")
+    return row, row1
+
+
+def generate_set(folder, count, seed=0, noise_rows=100):
+    """
+    Создает в папке count протоколов со случайными макетами и вариантами листов.
+
+    Возвращает список (путь к файлу, описание). Одинаковый seed дает одинаковый набор.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    generated = []
+    for index in range(count):
+        spec = make_spec(index, rng)
+        file_path = os.path.join(folder, f"protocol_{index:05d}_{spec['layout']}_{spec['variant']}.xlsx")
+        generate_protocol(file_path, spec, rng, noise_rows)
+        generated.append((file_path, spec))
+    return generated
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Генерация синтетических протоколов")
+    parser.add_argument('folder', help="Папка для файлов")
+    parser.add_argument('--count', type=int, default=100, help="Число протоколов")
+    parser.add_argument('--seed', type=int, default=0, help="Начальное значение генератора случайных чисел")
+    args = parser.parse_args()
+
+    generate_set(args.folder, args.count, args.seed)
+    print(f"Создано протоколов: {args.count} в папке {args.folder}")
@@ -0,0 +1,920 @@
+import time
+import openpyxl
+from collections import namedtuple
+from datetime import datetime
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, get_column_letter
+from xlsx_stream import XlsxStreamWorkbook
+
+
+def open_openpyxl(file_path):
+    """Открывает книгу средствами openpyxl в режиме только для чтения."""
+    return openpyxl.load_workbook(file_path, data_only=True, read_only=True)
+
+
+# Движки чтения книг протоколов: имя -> функция открытия книги.
+# 'xml' читает нужные листы напрямую из zip-архива, минуя объектную модель openpyxl.
+ENGINES = {
+    'openpyxl': open_openpyxl,
+    'xml': XlsxStreamWorkbook,
+}
+DEFAULT_ENGINE = 'openpyxl'
+
+# Версия правил извлечения: увеличивается при изменении LAYOUTS и обработки полей,
+# чтобы записи, сохраненные в кэше старой версией, извлекались заново
+EXTRACTOR_VERSION = 3
+
+
+def open_workbook(file_path, engine=DEFAULT_ENGINE):
+    """Открывает книгу выбранным движком чтения."""
+    return ENGINES[engine](file_path)
+
+
+# Функция для форматирования даты
+def format_date(date_value):
+    if isinstance(date_value, datetime):
+        return date_value.strftime("%d.%m.%Y")
+    else:
+        return str(date_value or "")
+
+
+def split_address(address):
+    """Разбивает адрес ячейки ('AG34') на номер строки и номер столбца."""
+    column, row = coordinate_from_string(address)
+    return row, column_index_from_string(column)
+
+
+def cell_range(min_row, max_row, min_col, max_col):
+    """Возвращает список адресов всех ячеек прямоугольной области."""
+    return [f'{get_column_letter(col)}{row}'
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)]
+
+
+def read_cells(sheet, addresses):
+    """
+    Читает набор ячеек листа за один ограниченный проход iter_rows.
+
+    В режиме read_only каждое обращение sheet['AG34'] заново разбирает XML листа,
+    поэтому все нужные адреса собираются заранее и читаются одним проходом
+    по прямоугольнику, охватывающему их все. Возвращает словарь адрес -> значение.
+    """
+    values = dict.fromkeys(addresses)
+    if not values:
+        return values
+
+    wanted = {}
+    for address in values:
+        row, col = split_address(address)
+        wanted.setdefault(row, []).append((col, address))
+
+    min_row, max_row = min(wanted), max(wanted)
+    min_col = min(col for cells in wanted.values() for col, _ in cells)
+    max_col = max(col for cells in wanted.values() for col, _ in cells)
+
+    rows = sheet.iter_rows(min_row=min_row, max_row=max_row,
+                           min_col=min_col, max_col=max_col, values_only=True)
+    for row_number, row in enumerate(rows, start=min_row):
+        for col, address in wanted.get(row_number, ()):
+            index = col - min_col
+            if index < len(row):
+                values[address] = row[index]
+
+    return values
+
+
+def normalize_label(text):
+    """Приводит текст подписи к виду для поиска: нижний регистр, ё -> е, одиночные пробелы."""
+    return ' '.join(str(text).lower().replace('ё', 'е').split())
+
+
+# Поле, заданное смещением от подписи: значение в ячейке (строка подписи + dr, столбец).
+# dc - смещение столбца (int) или буква столбца (str), если значение всегда в одном столбце.
+Anchor = namedtuple('Anchor', 'label dr dc')
+
+
+class AnchorIndex:
+    """
+    Индекс листа, построенный за один потоковый проход.
+
+    Хранит значения непустых ячеек ((строка, столбец) -> значение) и подписи
+    (нормализованный текст -> координаты). Обращение index['K71'] работает
+    так же, как со словарем из read_cells.
+    """
+
+    def __init__(self, rows, min_row=1):
+        self.values = {}
+        self.labels = {}
+        self.found = {}
+        for row_number, row in enumerate(rows, start=min_row):
+            for col, value in enumerate(row, start=1):
+                if value is None:
+                    continue
+                self.values[(row_number, col)] = value
+                if isinstance(value, str):
+                    self.labels.setdefault(normalize_label(value), []).append((row_number, col))
+
+    def __getitem__(self, address):
+        return self.values.get(split_address(address))
+
+    def find(self, label):
+        """Возвращает координаты первой (сверху вниз, слева направо) ячейки с подписью или None."""
+        key = normalize_label(label)
+        if key not in self.found:
+            positions = self.labels.get(key)
+            if positions is None:
+                # Подпись может быть частью более длинного текста ячейки
+                positions = [position for text, cells in self.labels.items() if key in text for position in cells]
+            self.found[key] = min(positions) if positions else None
+        return self.found[key]
+
+    def offset(self, label, dr, dc):
+        """Возвращает значение ячейки со смещением (dr, dc) от подписи или None, если подписи нет."""
+        position = self.find(label)
+        if position is None:
+            return None
+        row, col = position
+        col = column_index_from_string(dc) if isinstance(dc, str) else col + dc
+        return self.values.get((row + dr, col))
+
+
+def read_index(sheet, addresses):
+    """
+    Читает лист целиком одним проходом iter_rows и строит по нему AnchorIndex.
+
+    Ширина прохода ограничена самым правым столбцом из addresses.
+    """
+    max_col = max(split_address(address)[1] for address in addresses)
+    return AnchorIndex(sheet.iter_rows(min_row=1, max_row=None, min_col=1, max_col=max_col, values_only=True))
+
+
+def read_plan(sheets, plan, indexed=()):
+    """
+    Выполняет план чтения: для каждого листа читает все его адреса одним проходом.
+
+    sheets - словарь ключ -> лист (None для отсутствующих листов),
+    plan - словарь ключ -> список адресов,
+    indexed - ключи листов, для которых нужен полный индекс подписей (read_index).
+    Для отсутствующих листов возвращается пустой словарь.
+    """
+    cells = {}
+    for key, addresses in plan.items():
+        if sheets.get(key) is None:
+            cells[key] = {}
+        elif key in indexed:
+            cells[key] = read_index(sheets[key], addresses)
+        else:
+            cells[key] = read_cells(sheets[key], addresses)
+    return cells
+
+
+def read_plans(plans):
+    """
+    Выполняет несколько планов чтения по одной книге так, что каждый лист читается один раз.
+
+    plans - список (листы, план, ключи листов с индексом подписей), как для read_plan.
+    Адреса разных планов, относящиеся к одному листу книги, объединяются;
+    если хотя бы одному плану нужен индекс подписей, лист читается через read_index.
+    Возвращает список словарей ячеек в порядке plans.
+    """
+    merged = {}
+    for sheets, plan, indexed in plans:
+        for key, addresses in plan.items():
+            sheet = sheets.get(key)
+            if sheet is None:
+                continue
+            entry = merged.setdefault(sheet.title, {'sheet': sheet, 'addresses': [], 'indexed': False})
+            entry['addresses'].extend(addresses)
+            entry['indexed'] = entry['indexed'] or key in indexed
+
+    read = {title: read_index(entry['sheet'], entry['addresses']) if entry['indexed']
+            else read_cells(entry['sheet'], entry['addresses'])
+            for title, entry in merged.items()}
+    return [{key: read[sheets[key].title] if sheets.get(key) is not None else {} for key in plan}
+            for sheets, plan, indexed in plans]
+
+
+# Подпись строки dU на листе "Протокол": dU(-) на строку ниже, dU(+) на три строки ниже, в столбце K
+DU_LABEL = 'отрицательное отклонение напряжения'
+
+# Листы протокола: ключ -> имя листа в книге
+SHEET_NAMES = {
+    'title': 'Титул',
+    'protocol': 'Протокол',
+    'records': 'Записи',
+    'pke': 'ПКЭ',
+    'phases': '3ф-4пр',
+}
+
+# Ячейки сигнатуры макета: в одной из них на листе "Протокол" стоит заголовок таблицы СИ
+SIGNATURE_CELLS = ('AG30', 'AG32', 'AG33', 'AG34')
+SIGNATURE_TEXT = 'Тип СИ'
+
+# Поля, адреса которых не зависят от макета: поле -> (лист, адрес)
+COMMON_FIELDS = {
+    'protocol_date': ('title', 'BU24'),      # Дата протокола
+    'place': ('records', 'AK6'),             # Место в схеме
+    'power_center': ('records', 'U9'),       # Центр питания
+    'expert': ('records', 'BZ37'),           # Эксперт протокол
+    'load_start_1': ('pke', 'G6'),           # Начало интервала наибольших нагрузок
+    'load_end_1': ('pke', 'H6'),             # Конец интервала наибольших нагрузок
+    'load_start_2': ('pke', 'G7'),           # Начало интервала наибольших нагрузок 2
+    'load_end_2': ('pke', 'H7'),             # Конец интервала наибольших нагрузок 2
+    'du_minus_1': ('phases', 'BE16'),        # δU(−)I, %
+    'du_plus_1': ('phases', 'BE17'),         # δU(+)I, %
+    'du_minus_2': ('phases', 'BE26'),        # δU(−)II, %
+    'du_plus_2': ('phases', 'BE27'),         # δU(+)II, %
+    'du_minus': ('protocol', Anchor(DU_LABEL, 1, 'K')),  # dU(-)
+    'du_plus': ('protocol', Anchor(DU_LABEL, 3, 'K')),   # dU(+)
+}
+
+# Варианты макета протокола в порядке проверки.
+# signature - ячейка из SIGNATURE_CELLS с заголовком "Тип СИ", fields - поле -> (лист, адрес).
+# Кортеж адресов означает склейку текста ячеек (см. get_combined_value),
+# Anchor - значение рядом с подписью (см. AnchorIndex).
+# Новая редакция шаблона добавляется сюда новой записью.
+LAYOUTS = [
+    {
+        'name': 'AG33',
+        'signature': 'AG33',
+        'fields': {
+            'pke_type': ('protocol', 'AG34'),        # Тип СИ ПКЭ
+            'pke_serial': ('protocol', 'BE34'),      # Заводской номер СИ ПКЭ
+            'pke_check': ('protocol', 'CD34'),       # Поверка СИ ПКЭ
+            'si_type': ('protocol', 'AG35'),         # Тип СИ
+            'si_serial': ('protocol', 'BE35'),       # Заводской номер СИ
+            'si_check': ('protocol', 'CD35'),        # Поверка СИ
+            'header_1': ('protocol', ('AI2', 'A3')),
+            'header_2': ('protocol', ('AI4', 'A5')),
+            'region': ('protocol', ('R21', 'A22')),
+            'test_start': ('protocol', 'M25'),       # Начало испытаний
+            'test_end': ('protocol', 'M26'),         # Окончание испытаний
+            'network': ('title', 'A32'),             # Электрические сети
+            'network_2': ('title', 'A33'),           # Электрические сети (продолжение)
+            'protocol_number': ('title', 'BC26'),    # Номер протокола
+        },
+    },
+    {
+        'name': 'AG30',
+        'signature': 'AG30',
+        'fields': {
+            'pke_type': ('protocol', 'AG31'),
+            'pke_serial': ('protocol', 'BE31'),
+            'pke_check': ('protocol', 'CD31'),
+            'si_type': ('protocol', 'AG32'),
+            'si_serial': ('protocol', 'BE32'),
+            'si_check': ('protocol', 'CD32'),
+            'header_1': ('protocol', ('A2',)),
+            'header_2': ('protocol', ('A3',)),
+            'region': ('protocol', ('A19',)),
+            'test_start': ('protocol', 'M22'),
+            'test_end': ('protocol', 'M23'),
+            'network': ('title', 'A35'),
+            'network_2': ('title', 'A36'),
+            'protocol_number': ('title', 'BC29'),
+        },
+    },
+    {
+        'name': 'AG32',
+        'signature': 'AG32',
+        'fields': {
+            'pke_type': ('protocol', 'AG33'),
+            'pke_serial': ('protocol', 'BE33'),
+            'pke_check': ('protocol', 'CD33'),
+            'si_type': ('protocol', 'AG34'),
+            'si_serial': ('protocol', 'BE34'),
+            'si_check': ('protocol', 'CD34'),
+            'header_1': ('protocol', ('AI2', 'A3')),
+            'header_2': ('protocol', ('AI4', 'A5')),
+            'region': ('protocol', ('R21', 'A22')),
+            'test_start': ('protocol', 'M24'),
+            'test_end': ('protocol', 'M25'),
+            'network': ('title', 'A35'),
+            'network_2': ('title', 'A36'),
+            'protocol_number': ('title', 'BC29'),
+        },
+    },
+    {
+        'name': 'AG34',
+        'signature': 'AG34',
+        'fields': {
+            'pke_type': ('protocol', 'AG35'),
+            'pke_serial': ('protocol', 'BE35'),
+            'pke_check': ('protocol', 'CD35'),
+            'si_type': ('protocol', 'AG36'),
+            'si_serial': ('protocol', 'BE36'),
+            'si_check': ('protocol', 'CD36'),
+            'header_1': ('protocol', ('AI2', 'A3')),
+            'header_2': ('protocol', ('AI4', 'A5')),
+            'region': ('protocol', ('R21', 'A22')),
+            'test_start': ('protocol', 'M26'),
+            'test_end': ('protocol', 'M27'),
+            'network': ('title', 'A35'),
+            'network_2': ('title', 'A36'),
+            'protocol_number': ('title', 'BC29'),
+        },
+    },
+]
+
+# Поля, которые форматируются как даты
+DATE_FIELDS = {'protocol_date', 'test_start', 'test_end'}
+
+# Лист, к которому относится каждое поле (для подстановки '---' при отсутствии листа)
+FIELD_SHEETS = {field: sheet_key for layout in LAYOUTS for field, (sheet_key, _) in layout['fields'].items()}
+FIELD_SHEETS.update({field: sheet_key for field, (sheet_key, _) in COMMON_FIELDS.items()})
+
+# Столбцы выходной таблицы: столбец -> поле
+OUTPUT_COLUMNS = {
+    'D': 'network',           # Электрические сети
+    'E': 'protocol_number',   # Номер протокола
+    'G': 'protocol_date',     # Дата протокола
+    'H': 'power_center',      # Центр питания
+    'I': 'place',             # Место в схеме
+    'J': 'test_start',        # Дата начала испытаний
+    'K': 'test_end',          # Дата окончания испытаний
+    'L': 'pke_type',          # Тип СИ ПКЭ
+    'M': 'pke_serial',        # Заводской № ПКЭ
+    'N': 'pke_check',         # Поверка СИ ПКЭ
+    'O': 'si_type',           # Тип СИ
+    'P': 'si_serial',         # Заводской № СИ
+    'Q': 'si_check',          # Поверка СИ
+    'R': 'du_minus',          # dU(-)
+    'S': 'du_plus',           # dU(+)
+    'T': 'load_start_1',      # Начало интервала наибольших нагрузок 1
+    'U': 'load_end_1',        # Конец интервала наибольших нагрузок 1
+    'V': 'load_start_2',      # Начало интервала наибольших нагрузок 2
+    'W': 'load_end_2',        # Конец интервала наибольших нагрузок 2
+    'X': 'du_plus_1',         # δU(+)I, %
+    'Y': 'du_minus_1',        # δU(−)I, %
+    'Z': 'du_plus_2',         # δU(+)II, %
+    'AA': 'du_minus_2',       # δU(−)II, %
+    'AB': 'header_1',
+    'AC': 'header_2',
+    'AD': 'region',
+    'AE': 'expert',           # Эксперт протокол
+    'AG': 'protocol_seq',     # Порядковый номер протокола
+}
+
+# Названия столбцов выходной таблицы для выбора заполняемых столбцов
+COLUMN_TITLES = {
+    'D': 'Электрические сети',
+    'E': 'Номер протокола',
+    'G': 'Дата протокола',
+    'H': 'Центр питания',
+    'I': 'Место в схеме',
+    'J': 'Дата начала испытаний',
+    'K': 'Дата окончания испытаний',
+    'L': 'Тип СИ ПКЭ',
+    'M': 'Заводской № ПКЭ',
+    'N': 'Поверка СИ ПКЭ',
+    'O': 'Тип СИ',
+    'P': 'Заводской № СИ',
+    'Q': 'Поверка СИ',
+    'R': 'dU(-)',
+    'S': 'dU(+)',
+    'T': 'Начало интервала наибольших нагрузок 1',
+    'U': 'Конец интервала наибольших нагрузок 1',
+    'V': 'Начало интервала наибольших нагрузок 2',
+    'W': 'Конец интервала наибольших нагрузок 2',
+    'X': 'δU(+)I, %',
+    'Y': 'δU(−)I, %',
+    'Z': 'δU(+)II, %',
+    'AA': 'δU(−)II, %',
+    'AB': 'Заголовок 1',
+    'AC': 'Заголовок 2',
+    'AD': 'Регион',
+    'AE': 'Эксперт',
+    'AG': 'Порядковый номер протокола',
+}
+
+# Поля, вычисляемые из других полей: поле -> поля, которые нужно прочитать
+DERIVED_FIELDS = {
+    'network': ('network', 'network_2'),
+    'protocol_seq': ('protocol_number',),
+}
+
+# Поля, адрес которых зависит от макета (для них нужна сигнатура с листа "Протокол")
+LAYOUT_FIELDS = {field for layout in LAYOUTS for field in layout['fields']}
+
+# Скомпилированные планы чтения по сигнатуре макета и набору полей
+_compiled_plans = {}
+
+
+def required_fields(columns=None):
+    """Возвращает множество полей, которые нужно прочитать для заполнения столбцов (None - все)."""
+    if columns is None:
+        columns = OUTPUT_COLUMNS
+    fields = set()
+    for column in columns:
+        field = OUTPUT_COLUMNS[column]
+        fields.update(DERIVED_FIELDS.get(field, (field,)))
+    return fields
+
+
+def required_sheets(fields):
+    """Возвращает ключи листов, которые нужно открыть для чтения полей."""
+    sheets = {FIELD_SHEETS[field] for field in fields}
+    if fields & LAYOUT_FIELDS:
+        sheets.add('protocol')  # Сигнатура макета
+    return sheets
+
+
+def select_columns(record, columns):
+    """
+    Оставляет в записи extract_protocol только выбранные столбцы
+    и отсутствующие листы, от которых они зависят (например, для записи из кэша).
+    """
+    if columns is None:
+        return record
+    needed = required_sheets(required_fields(columns))
+    names = {SHEET_NAMES[key] for key in needed}
+    return dict(record,
+                row={column: record['row'][column] for column in columns},
+                missing_sheets=[name for name in record['missing_sheets'] if name in names])
+
+
+def get_combined_value(base_cell, check_cell):
+    """Склеивает значение ячейки с продолжением из соседней ячейки, если оно есть."""
+    if check_cell != "None":
+        return base_cell + check_cell
+    else:
+        return base_cell
+
+
+def find_sheets(workbook):
+    """
+    Находит листы протокола с учетом альтернативных названий.
+
+    Возвращает словарь ключ листа -> лист (None, если листа нет).
+    """
+    sheetnames = workbook.sheetnames
+    sheets = {key: workbook[name] if name in sheetnames else None for key, name in SHEET_NAMES.items()}
+
+    # Проверка альтернативных названий листов
+    if (sheets['protocol'] is None or sheets['protocol'].sheet_state != 'visible') and 'Протокол-3пр' in sheetnames:
+        sheets['protocol'] = workbook['Протокол-3пр']
+
+    if (sheets['records'] is None or sheets['records'].sheet_state != 'visible') and 'Записи-3пр' in sheetnames:
+        sheets['records'] = workbook['Записи-3пр']
+
+    if sheets['pke'] is None and 'ПКЭ 32144' in sheetnames:
+        sheets['pke'] = workbook['ПКЭ 32144']
+
+    return sheets
+
+
+def read_signature(sheet):
+    """Читает ячейки сигнатуры макета и возвращает кортеж признаков наличия заголовка "Тип СИ"."""
+    if sheet is None:
+        return (False,) * len(SIGNATURE_CELLS)
+    values = read_cells(sheet, SIGNATURE_CELLS)
+    return tuple(SIGNATURE_TEXT in str(values[address]) for address in SIGNATURE_CELLS)
+
+
+def compile_plan(signature, fields=None):
+    """
+    Возвращает план чтения для сигнатуры макета.
+
+    План содержит имя макета (None, если макет не распознан), поля с адресами,
+    адреса для чтения по листам и листы, которым нужен индекс подписей.
+    fields - множество нужных полей (None - все); листы без нужных полей в план не входят.
+    Планы кэшируются: для файлов с той же сигнатурой и тем же набором полей
+    план не пересобирается.
+    """
+    key = (signature, frozenset(fields) if fields is not None else None)
+    plan = _compiled_plans.get(key)
+    if plan is not None:
+        return plan
+
+    layout = next((layout for layout in LAYOUTS if signature[SIGNATURE_CELLS.index(layout['signature'])]), None)
+
+    wanted = fields
+    fields = dict(COMMON_FIELDS)
+    if layout is not None:
+        fields.update(layout['fields'])
+    if wanted is not None:
+        fields = {field: source for field, source in fields.items() if field in wanted}
+
+    cells = {}
+    indexed = set()
+    for sheet_key, address in fields.values():
+        if isinstance(address, Anchor):
+            indexed.add(sheet_key)
+            # Столбец значения должен попасть в ширину прохода индекса
+            if isinstance(address.dc, str):
+                cells.setdefault(sheet_key, []).append(f'{address.dc}1')
+            continue
+        cells.setdefault(sheet_key, []).extend(address if isinstance(address, tuple) else (address,))
+
+    plan = {'layout': layout['name'] if layout is not None else None, 'fields': fields,
+            'cells': cells, 'indexed': indexed}
+    _compiled_plans[key] = plan
+    return plan
+
+
+def resolve_fields(plan, cells, missing):
+    """Вычисляет значения полей плана по прочитанным ячейкам."""
+    values = {field: "---" if sheet_key in missing else None for field, sheet_key in FIELD_SHEETS.items()}
+
+    for field, (sheet_key, address) in plan['fields'].items():
+        if sheet_key in missing:
+            continue
+        sheet_cells = cells[sheet_key]
+        if isinstance(address, Anchor):
+            value = sheet_cells.offset(*address)
+        elif isinstance(address, tuple):
+            value = str(sheet_cells[address[0]])
+            for extra in address[1:]:
+                value = get_combined_value(value, str(sheet_cells[extra]))
+        else:
+            value = sheet_cells[address]
+        values[field] = format_date(value) if field in DATE_FIELDS else value
+
+    return values
+
+
+def plan_protocol(sheets, columns=None):
+    """
+    Составляет план чтения протокола по найденным листам (см. find_sheets).
+
+    columns - столбцы выходной таблицы, которые нужно заполнить (None - все).
+    Возвращает ключи отсутствующих нужных листов и план (см. compile_plan).
+    """
+    fields = required_fields(columns) if columns is not None else None
+    needed = required_sheets(fields) if fields is not None else set(SHEET_NAMES)
+    missing = {key for key, sheet in sheets.items() if sheet is None and key in needed}
+
+    if 'protocol' in needed:
+        signature = read_signature(sheets['protocol'])
+    else:
+        signature = (False,) * len(SIGNATURE_CELLS)
+    return missing, compile_plan(signature, fields)
+
+
+def build_protocol(plan, cells, missing, columns=None):
+    """Вычисляет запись для выходной таблицы по прочитанным ячейкам (без времени фаз)."""
+    values = resolve_fields(plan, cells, missing)
+
+    if values['place'] is None:
+        values['place'] = '-'
+    if values['power_center'] is None:
+        values['power_center'] = '-'
+
+    if values['network_2'] is not None:
+        values['network'] = str(values['network']) + ' ' + str(values['network_2'])
+
+    if values['protocol_number'] is not None:
+        Protocol_Num0 = values['protocol_number'].split('/')
+        values['protocol_seq'] = Protocol_Num0[0] + ',' + Protocol_Num0[1]
+    else:
+        values['protocol_seq'] = '-'
+
+    row = {column: values[OUTPUT_COLUMNS[column]] for column in (columns if columns is not None else OUTPUT_COLUMNS)}
+    missing_sheets = [name for key, name in SHEET_NAMES.items() if key in missing]
+    return {'row': row, 'missing_sheets': missing_sheets, 'layout': plan['layout']}
+
+
+def extract_protocol(file_path, engine=DEFAULT_ENGINE, columns=None):
+    """
+    Извлекает данные одного файла протокола.
+
+    columns - столбцы выходной таблицы, которые нужно заполнить (None - все);
+    листы, от которых они не зависят, не читаются.
+
+    Макет определяется одним чтением ячеек сигнатуры, затем все поля читаются
+    одним проходом по каждому нужному листу (для листа "Протокол" - с индексом
+    подписей, по которому находятся значения dU). Возвращает словарь с записью
+    для выходной таблицы ('row': столбец -> значение), списком отсутствующих листов
+    ('missing_sheets'), именем макета ('layout') и временем фаз в секундах
+    ('timings': открытие книги, поиск листов, извлечение полей).
+    """
+    started = time.perf_counter()
+    # Книга закрывается сразу после чтения, чтобы в длинных пачках не копились открытые файлы
+    workbook = open_workbook(file_path, engine)
+    opened = time.perf_counter()
+    try:
+        sheets = find_sheets(workbook)
+        found = time.perf_counter()
+        missing, plan = plan_protocol(sheets, columns)
+        cells = read_plan(sheets, plan['cells'], plan['indexed'])
+    finally:
+        workbook.close()
+
+    record = build_protocol(plan, cells, missing, columns)
+    record['timings'] = {'open': opened - started, 'sheets': found - opened, 'fields': time.perf_counter() - found}
+    return record
+
+
+def extract_protocol_task(file_path, engine=DEFAULT_ENGINE, columns=None):
+    """
+    Обертка extract_protocol для пула процессов.
+
+    Исключение не пробрасывается через границу процесса, а возвращается как результат,
+    чтобы один битый файл не останавливал всю пачку.
+    """
+    try:
+        return extract_protocol(file_path, engine, columns)
+    except Exception as e:
+        return e
+
+
+# Листы протокола, из которых читаются данные для реестра применения СИ
+REESTR_SHEET_NAMES = {
+    'title': 'Титул',
+    'protocol': 'Протокол',
+    'records': 'Записи',
+}
+
+# Поля реестра, адреса которых не зависят от макета
+REESTR_COMMON_FIELDS = {
+    'responsible': ('records', 'BZ37'),        # Ответственный за прием / возврат СИ (измерения провел)
+}
+
+# Варианты макета для реестра в порядке приоритета (как в исходных проверках Check1-4:
+# при нескольких заголовках "Тип СИ" побеждает AG30, затем AG34, AG32 и AG33).
+# network_2_default - продолжение названия организации, если ячейка продолжения пуста.
+REESTR_LAYOUTS = [
+    {
+        'name': 'AG30',
+        'signature': 'AG30',
+        'network_2_default': None,
+        'fields': {
+            'serial_1': ('protocol', 'BE31'),
+            'type_1': ('protocol', 'AG31'),
+            'region': ('protocol', 'A19'),
+            'network': ('title', 'A35'),
+            'network_2': ('title', 'A36'),
+            'test_start': ('protocol', 'M22'),
+            'test_end': ('protocol', 'M23'),
+            'install': ('protocol', 'I18'),
+            'protocol_number': ('title', 'BC29'),
+            'type_2': ('protocol', 'AG32'),
+            'serial_2': ('protocol', 'BE32'),
+        },
+    },
+    {
+        'name': 'AG34',
+        'signature': 'AG34',
+        'network_2_default': '',
+        'fields': {
+            'serial_1': ('protocol', 'BE35'),          # Заводской номер 1
+            'type_1': ('protocol', 'AG35'),            # Тип СИ 1
+            'region': ('protocol', 'R21'),             # Место нахождения СИ (регион)
+            'network': ('title', 'A35'),               # Наименование организации, владельца пунктов контроля КЭ
+            'network_2': ('title', 'A36'),
+            'test_start': ('protocol', 'M26'),         # Дата передачи СИ (начало испытаний)
+            'test_end': ('protocol', 'M27'),           # Дата возврата СИ (окончание испытаний)
+            'install': ('protocol', 'AS19'),           # Место установки
+            'protocol_number': ('title', 'BC29'),      # Номер протокола
+            'type_2': ('protocol', 'AG36'),            # Тип СИ 2
+            'serial_2': ('protocol', 'BE36'),          # Заводской номер 2
+        },
+    },
+    {
+        'name': 'AG32',
+        'signature': 'AG32',
+        'network_2_default': None,
+        'fields': {
+            'serial_1': ('protocol', 'BE33'),
+            'type_1': ('protocol', 'AG33'),
+            'region': ('protocol', 'A19'),
+            'network': ('title', 'A35'),
+            'network_2': ('title', 'A36'),
+            'test_start': ('protocol', 'M24'),
+            'test_end': ('protocol', 'M25'),
+            'install': ('protocol', 'I17'),
+            'protocol_number': ('title', 'BC29'),
+            'type_2': ('protocol', 'AG34'),
+            'serial_2': ('protocol', 'BE34'),
+        },
+    },
+    {
+        'name': 'AG33',
+        'signature': 'AG33',
+        'network_2_default': '',
+        'fields': {
+            'serial_1': ('protocol', 'BE34'),
+            'type_1': ('protocol', 'AG34'),
+            'region': ('protocol', 'R21'),
+            'network': ('title', 'A32'),
+            'network_2': ('title', 'A33'),
+            'test_start': ('protocol', 'M25'),
+            'test_end': ('protocol', 'M26'),
+            'install': ('protocol', 'AS19'),
+            'protocol_number': ('title', 'BC26'),
+            'type_2': ('protocol', 'AG35'),
+            'serial_2': ('protocol', 'BE35'),
+        },
+    },
+]
+
+# Лист каждого поля реестра (для подстановки '---' при отсутствии листа)
+REESTR_FIELD_SHEETS = {field: sheet_key for layout in REESTR_LAYOUTS for field, (sheet_key, _) in layout['fields'].items()}
+REESTR_FIELD_SHEETS.update({field: sheet_key for field, (sheet_key, _) in REESTR_COMMON_FIELDS.items()})
+
+# Столбцы листов реестра применения СИ, заполняемые из протокола
+REESTR_COLUMNS = ('C', 'D', 'F', 'G', 'H', 'I', 'J', 'O', 'P', 'Q', 'S')
+
+
+def reestr_cell_plan():
+    """
+    План чтения для реестра: ячейки сигнатуры и адреса полей всех макетов по листам.
+
+    Адреса разных макетов лежат в одних и тех же строках листов, поэтому их чтение
+    вместе с сигнатурой укладывается в один проход по каждому листу.
+    """
+    sources = [('protocol', address) for address in SIGNATURE_CELLS]
+    sources += [source for layout in REESTR_LAYOUTS for source in layout['fields'].values()]
+    sources += list(REESTR_COMMON_FIELDS.values())
+    plan = {}
+    for sheet_key, address in sources:
+        addresses = plan.setdefault(sheet_key, [])
+        if address not in addresses:
+            addresses.append(address)
+    return plan
+
+
+REESTR_CELL_PLAN = reestr_cell_plan()
+
+# Скомпилированные планы полей реестра по сигнатуре макета
+_compiled_reestr_plans = {}
+
+
+def compile_reestr_plan(signature):
+    """
+    Возвращает поля реестра с адресами для сигнатуры макета (см. compile_plan).
+
+    Для нераспознанного макета в плане остаются только поля, не зависящие от макета.
+    """
+    plan = _compiled_reestr_plans.get(signature)
+    if plan is not None:
+        return plan
+
+    layout = next((layout for layout in REESTR_LAYOUTS if signature[SIGNATURE_CELLS.index(layout['signature'])]), None)
+    fields = dict(REESTR_COMMON_FIELDS)
+    if layout is not None:
+        fields.update(layout['fields'])
+
+    plan = {'layout': layout['name'] if layout is not None else None,
+            'network_2_default': layout['network_2_default'] if layout is not None else None,
+            'fields': fields}
+    _compiled_reestr_plans[signature] = plan
+    return plan
+
+
+def reestr_sheets(workbook):
+    """
+    Возвращает листы, из которых читаются данные для реестра (None для отсутствующих).
+
+    Если в книге есть "Протокол-3пр", данные берутся с листов "Протокол-3пр" и "Записи-3пр".
+    """
+    worksheets = workbook.sheetnames
+    sheets = {key: workbook[name] if name in worksheets else None for key, name in REESTR_SHEET_NAMES.items()}
+
+    if 'Протокол-3пр' in worksheets:
+        sheets['protocol'] = workbook['Протокол-3пр']
+        if 'Записи-3пр' in worksheets:
+            sheets['records'] = workbook['Записи-3пр']
+
+    return sheets
+
+
+def plan_reestr(sheets, cells):
+    """
+    Определяет макет по ячейкам сигнатуры, прочитанным по REESTR_CELL_PLAN.
+
+    Возвращает ключи отсутствующих листов и план полей (см. compile_reestr_plan).
+    """
+    missing = {key for key, sheet in sheets.items() if sheet is None}
+    if 'protocol' in missing:
+        signature = (False,) * len(SIGNATURE_CELLS)
+    else:
+        signature = tuple(SIGNATURE_TEXT in str(cells['protocol'][address]) for address in SIGNATURE_CELLS)
+    plan = compile_reestr_plan(signature)
+    if plan['layout'] is None and 'protocol' not in missing:
+        raise ValueError(f"макет протокола не распознан: нет заголовка '{SIGNATURE_TEXT}' "
+                         f"в ячейках {', '.join(SIGNATURE_CELLS)}")
+    return missing, plan
+
+
+def build_reestr(plan, cells, missing):
+    """
+    Вычисляет две записи реестра (для первого и второго листов) по прочитанным ячейкам.
+
+    Поля с отсутствующих листов (и поля макета, если нет листа "Протокол") заменяются на '---'.
+    """
+    values = {field: "---" if sheet_key in missing or plan['layout'] is None else None
+              for field, sheet_key in REESTR_FIELD_SHEETS.items()}
+    for field, (sheet_key, address) in plan['fields'].items():
+        if sheet_key not in missing:
+            values[field] = cells[sheet_key][address]
+
+    test_start = format_date(values['test_start'])
+    test_end = format_date(values['test_end'])
+
+    protocol_number = values['protocol_number']
+    parts = str(protocol_number).split('/')
+    PorNum = parts[0] + ',' + parts[1] if len(parts) > 1 else '-'
+
+    network_2 = values['network_2'] if values['network_2'] is not None else plan['network_2_default']
+    if 'title' in missing or plan['layout'] is None:
+        organization = "---"
+    elif network_2 is None:
+        organization = str(values['network'])
+    else:
+        organization = str(values['network']) + ' ' + str(network_2)
+
+    # Запись для первого листа
+    row = {
+        'C': values['serial_1'],
+        'D': values['type_1'],
+        'F': values['region'],
+        'G': organization,
+        'H': test_start,
+        'I': test_end,
+        'J': values['responsible'],
+        'O': values['install'],
+        'P': protocol_number,
+        'Q': str(values['type_2']) + ' Зав.№: ' + str(values['serial_2']),
+        'S': PorNum,
+    }
+
+    # Запись для второго листа
+    row1 = dict(row, C=values['serial_2'], D=values['type_2'],
+                Q=str(values['type_1']) + ' Зав.№: ' + str(values['serial_1']))
+
+    return row, row1
+
+
+def extract_reestr(file_path, engine=DEFAULT_ENGINE):
+    """
+    Извлекает из протокола данные для реестра применения СИ.
+
+    Ячейки сигнатуры и адреса полей всех макетов читаются одним проходом по каждому
+    листу, после чего макет определяется по сигнатуре. Возвращает словарь с двумя записями
+    (столбец -> значение) для первого листа реестра (по первому СИ) и для второго
+    (по второму СИ) ('rows'), списком отсутствующих листов ('missing_sheets')
+    и именем макета ('layout').
+    """
+    workbook = open_workbook(file_path, engine)
+    try:
+        sheets = reestr_sheets(workbook)
+        cells = read_plan(sheets, REESTR_CELL_PLAN)
+    finally:
+        workbook.close()
+    missing, plan = plan_reestr(sheets, cells)
+    return {'rows': build_reestr(plan, cells, missing),
+            'missing_sheets': [name for key, name in REESTR_SHEET_NAMES.items() if key in missing],
+            'layout': plan['layout']}
+
+
+def extract_reestr_task(file_path, engine=DEFAULT_ENGINE):
+    """Обертка extract_reestr для пула процессов (см. extract_protocol_task)."""
+    try:
+        return extract_reestr(file_path, engine)
+    except Exception as e:
+        return e
+
+
+def extract_combined(file_path, engine=DEFAULT_ENGINE, columns=None):
+    """
+    Извлекает из протокола за одно открытие книги и данные для выходной таблицы,
+    и записи реестра применения СИ.
+
+    Листы, нужные обоим планам, читаются один раз (см. read_plans).
+    Возвращает запись как extract_protocol с дополнительными ключами 'reestr'
+    (две записи реестра или None), 'reestr_missing_sheets' (листы, отсутствующие
+    для реестра) и 'reestr_error' (текст ошибки или None):
+    ошибка в данных для реестра не мешает заполнить выходную таблицу.
+    """
+    started = time.perf_counter()
+    workbook = open_workbook(file_path, engine)
+    opened = time.perf_counter()
+    try:
+        sheets = find_sheets(workbook)
+        found = time.perf_counter()
+        missing, plan = plan_protocol(sheets, columns)
+        r_sheets = reestr_sheets(workbook)
+        cells = read_plans([(sheets, plan['cells'], plan['indexed']), (r_sheets, REESTR_CELL_PLAN, ())])
+    finally:
+        workbook.close()
+
+    record = build_protocol(plan, cells[0], missing, columns)
+    try:
+        r_missing, r_plan = plan_reestr(r_sheets, cells[1])
+        reestr_error = None
+    except ValueError as e:
+        r_missing = set()
+        reestr_error = str(e)
+    record['reestr'] = build_reestr(r_plan, cells[1], r_missing) if reestr_error is None else None
+    record['reestr_missing_sheets'] = [name for key, name in REESTR_SHEET_NAMES.items() if key in r_missing]
+    record['reestr_error'] = reestr_error
+    record['timings'] = {'open': opened - started, 'sheets': found - opened, 'fields': time.perf_counter() - found}
+    return record
+
+
+def extract_combined_task(file_path, engine=DEFAULT_ENGINE, columns=None):
+    """Обертка extract_combined для пула процессов (см. extract_protocol_task)."""
+    try:
+        return extract_combined(file_path, engine, columns)
+    except Exception as e:
+        return e
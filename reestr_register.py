@@ -0,0 +1,304 @@
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+
+from batch_utils import collect_files
+from columnar_export import parse_date
+from export_workbook import EMPTY_KEYS, MultiSheetUpsert, StreamingTemplateExport, key_part
+from protocol_reader import ENGINES, REESTR_COLUMNS, open_workbook
+from template_cache import template_model
+
+# Путь к шаблону реестра применения СИ
+REESTR_TEMPLATE_FILE_PATH = r'\\192.168.34.9\линвит\ПОЛЬЗОВАТЕЛИ\USER49\_Реестры применения СИ\Образец\Реестр применения СИ образец.xlsx'
+
+# Число листов реестра (по первому и второму СИ)
+REESTR_SHEETS = 2
+
+# Ключ записи реестра: заводской номер СИ (C) и номер протокола (P)
+REESTR_KEY_COLUMNS = ('C', 'P')
+
+# Столбцы реестра: заводской номер, дата передачи и дата возврата СИ
+SERIAL_COLUMN, START_COLUMN, END_COLUMN = 'C', 'H', 'I'
+
+# Сколько последних периодов показывать в сводке по приборам
+PERIODS_SHOWN = 12
+
+# Ключ объединения реестров: заводской номер, дата передачи и дата возврата СИ
+MERGE_KEY_COLUMNS = (SERIAL_COLUMN, START_COLUMN, END_COLUMN)
+
+# Столбцы, расхождение в которых при одинаковом ключе считается конфликтом;
+# в остальных столбцах (заполняемых вручную) только дополняются пустые ячейки
+MERGE_COMPARED_COLUMNS = tuple(column for column in REESTR_COLUMNS if column not in MERGE_KEY_COLUMNS)
+
+# Лист с конфликтующими строками в объединенном реестре
+CONFLICTS_TITLE = 'Конфликты'
+CONFLICTS_HEADER = ['Лист', 'Файл', 'Строка', 'Статус']
+
+# Движок чтения реестров при объединении: потоковый разбор XML в несколько раз
+# быстрее openpyxl на листах в десятки тысяч строк
+MERGE_ENGINE = 'xml'
+
+
+def month_range(start, end):
+    """Возвращает месяцы (год, месяц) с месяца start по месяц end включительно."""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+
+def devices_in_use(entries):
+    """
+    Считает, сколько разных СИ было в работе в каждом месяце.
+
+    entries - пары (заводской номер, дата передачи, дата возврата); даты -
+    'дд.мм.гггг' или datetime. СИ считается в работе во всех месяцах с даты
+    передачи по дату возврата (без даты возврата - только в месяце передачи).
+    Возвращает словарь (год, месяц) -> число СИ.
+    """
+    devices = defaultdict(set)
+    for serial, start, end in entries:
+        serial = key_part(serial)
+        start = parse_date(start) if start is not None else None
+        if serial in EMPTY_KEYS or start is None:
+            continue
+        end = (parse_date(end) if end is not None else None) or start
+        for period in month_range(start, max(start, end)):
+            devices[period].add(serial)
+    return {period: len(serials) for period, serials in devices.items()}
+
+
+def format_devices_in_use(counts, shown=PERIODS_SHOWN):
+    """Текст сводки по последним shown месяцам."""
+    if not counts:
+        return "СИ в работе по месяцам: нет данных"
+    periods = sorted(counts)
+    lines = [f"  {month:02d}.{year}: {counts[(year, month)]}" for year, month in periods[-shown:]]
+    more = f" (последние {shown} из {len(periods)})" if len(periods) > shown else ""
+    return f"СИ в работе по месяцам{more}:\n" + "\n".join(lines)
+
+
+class ReestrUpsert(MultiSheetUpsert):
+    """
+    Дозапись в существующий реестр применения СИ без повторов.
+
+    На обоих листах (по первому и второму СИ) ключ записи - заводской номер
+    и номер протокола (REESTR_KEY_COLUMNS). Индексы листов строятся одним проходом
+    в режиме read_only; новые пары дописываются, измененные обновляются,
+    совпадающие пропускаются. По тем же индексам (с учетом внесенных записей)
+    считается сводка "СИ в работе по месяцам" без повторного чтения реестра.
+    При upsert=False записи просто дописываются в конец.
+    """
+
+    def __init__(self, save_path, upsert=True):
+        key_columns = REESTR_KEY_COLUMNS if upsert else None
+        super().__init__(save_path, [(REESTR_COLUMNS, key_columns), (REESTR_COLUMNS, key_columns)])
+
+    def entries(self):
+        """Пары (заводской номер, дата передачи, дата возврата) по обоим листам."""
+        positions = [REESTR_COLUMNS.index(column) for column in (SERIAL_COLUMN, START_COLUMN, END_COLUMN)]
+        for register in self.registers:
+            if register.key_columns is None:
+                # Без индекса в сводку попадают только записи текущего запуска
+                values = (tuple(row.get(column) for column in REESTR_COLUMNS) for row in register.appends)
+            else:
+                values = (entry[2] for entry in register.index.values())
+            for row_values in values:
+                yield tuple(row_values[position] for position in positions)
+
+    def devices_in_use(self):
+        return devices_in_use(self.entries())
+
+    def summary(self):
+        return super().summary() + "\n" + format_devices_in_use(self.devices_in_use())
+
+
+def header_row_count(model):
+    """
+    Число строк шапки листа шаблона: до последней строки, где есть хотя бы одно значение.
+    Пустые строки с заготовленным форматированием после шапки в нее не входят.
+    """
+    for index in range(len(model['rows']), 0, -1):
+        if any(value not in (None, '') for value, style in model['rows'][index - 1]):
+            return index
+    return 0
+
+
+def merge_value(column, value):
+    """Значение для сравнения строк разных реестров: даты - как date, остальное - как текст."""
+    part = key_part(value)
+    if part in EMPTY_KEYS:
+        return None
+    if column in (START_COLUMN, END_COLUMN):
+        return parse_date(value) or part
+    return part
+
+
+class RegisterMerge:
+    """
+    Объединение нескольких реестров применения СИ в один.
+
+    Реестры читаются по очереди потоково (read_only или разбор XML), строка за строкой. Строки
+    каждого листа собираются в словарь по ключу (заводской номер, дата передачи,
+    дата возврата), так что в памяти хранится только одна копия каждой записи.
+    Повтор записи в другом реестре дополняет ее пустые ячейки, а расхождение
+    в столбцах MERGE_COMPARED_COLUMNS попадает на лист конфликтов (в реестре
+    остается строка, встреченная первой). Строки выводятся в порядке первого появления.
+    """
+
+    def __init__(self, template_model):
+        self.model = template_model
+        self.header_rows = [header_row_count(model) for model in template_model[:REESTR_SHEETS]]
+        self.width = max([len(row) for model in template_model for row in model['rows']]
+                         + [column_index_from_string(column) for column in REESTR_COLUMNS])
+        self.key_positions = [column_index_from_string(column) - 1 for column in MERGE_KEY_COLUMNS]
+        self.compared = [(column, column_index_from_string(column) - 1) for column in MERGE_COMPARED_COLUMNS]
+        self.rows = [{} for _ in range(REESTR_SHEETS)]
+        self.conflicts = defaultdict(list)
+        self.read = self.duplicates = self.filled = 0
+        self.errors = []
+
+    def add_register(self, file_path, engine=MERGE_ENGINE):
+        """Добавляет строки обоих листов реестра. Возвращает число прочитанных строк."""
+        read = 0
+        workbook = open_workbook(file_path, engine)
+        try:
+            sheetnames = workbook.sheetnames
+            if len(sheetnames) < REESTR_SHEETS:
+                raise ValueError(f"в книге {len(sheetnames)} лист(а), ожидается {REESTR_SHEETS}")
+            for sheet_index in range(REESTR_SHEETS):
+                first_row = self.header_rows[sheet_index] + 1
+                sheet = workbook[sheetnames[sheet_index]]
+                for row_number, values in enumerate(
+                        sheet.iter_rows(min_row=first_row, max_col=self.width, values_only=True), start=first_row):
+                    values = list(values) + [None] * (self.width - len(values))
+                    if self.add_row(sheet_index, values, (file_path, row_number)):
+                        read += 1
+        finally:
+            workbook.close()
+        self.read += read
+        return read
+
+    def add_row(self, sheet_index, values, source):
+        """Добавляет строку; пустые строки (без заводского номера) пропускаются."""
+        key = tuple(merge_value(MERGE_KEY_COLUMNS[i], values[position]) for i, position in enumerate(self.key_positions))
+        if key[0] is None:
+            return False
+
+        entry = self.rows[sheet_index].get(key)
+        if entry is None:
+            self.rows[sheet_index][key] = (values, source)
+            return True
+
+        kept, kept_source = entry
+        differences = []
+        for column, position in self.compared:
+            old, new = merge_value(column, kept[position]), merge_value(column, values[position])
+            if old is not None and new is not None and old != new:
+                differences.append(column)
+        if differences:
+            self.conflicts[sheet_index, key].append((source, values, differences))
+            return True
+
+        self.duplicates += 1
+        for position, value in enumerate(values):
+            if kept[position] in EMPTY_KEYS and value not in EMPTY_KEYS:
+                kept[position] = value
+                self.filled += 1
+        return True
+
+    def entries(self):
+        """Пары (заводской номер, дата передачи, дата возврата) объединенного реестра."""
+        for rows in self.rows:
+            for values, source in rows.values():
+                yield tuple(values[position] for position in self.key_positions)
+
+    def save(self, save_path):
+        """Записывает объединенный реестр по шаблону и лист конфликтов."""
+        conflicts_model = {'title': CONFLICTS_TITLE, 'row_heights': {}, 'columns': {}, 'merged': [],
+                           'freeze_panes': 'A2',
+                           'rows': [[(title, None) for title in CONFLICTS_HEADER]
+                                    + [(get_column_letter(index + 1), None) for index in range(self.width)]]}
+        output = StreamingTemplateExport(None, save_path, template_model=self.model[:REESTR_SHEETS] + [conflicts_model])
+
+        for sheet_index, rows in enumerate(self.rows):
+            for values, source in rows.values():
+                output.write_values(values, sheet_index)
+
+        for (sheet_index, key), conflicts in self.conflicts.items():
+            kept, (kept_path, kept_row) = self.rows[sheet_index][key]
+            output.write_values([sheet_index + 1, kept_path, kept_row, 'принята'] + kept, REESTR_SHEETS)
+            for (file_path, row_number), values, differences in conflicts:
+                output.write_values([sheet_index + 1, file_path, row_number,
+                                     'расхождение: ' + ', '.join(differences)] + values, REESTR_SHEETS)
+        output.save()
+
+    def summary(self):
+        lines = [f"Прочитано строк: {self.read}",
+                 f"В объединенном реестре: " + ", ".join(f"лист {index + 1} - {len(rows)}"
+                                                         for index, rows in enumerate(self.rows)),
+                 f"Повторов объединено: {self.duplicates}, дополнено пустых ячеек: {self.filled}",
+                 f"Конфликтов: {sum(len(conflicts) for conflicts in self.conflicts.values())}"
+                 + (f" (см. лист '{CONFLICTS_TITLE}')" if self.conflicts else "")]
+        for file_path, error in self.errors:
+            lines.append(f"Ошибка в {file_path}: {error}")
+        lines.append(format_devices_in_use(devices_in_use(self.entries())))
+        return "\n".join(lines)
+
+
+def merge_registers(file_paths, save_path, template_path=REESTR_TEMPLATE_FILE_PATH, engine=MERGE_ENGINE, status=None):
+    """
+    Объединяет реестры file_paths в новый реестр save_path по шаблону.
+
+    Реестр, который не удалось прочитать, пропускается и указывается в итоге.
+    status - функция для сообщений о ходе работы. Возвращает текст итога.
+    """
+    merge = RegisterMerge(template_model(template_path))
+    started = time.perf_counter()
+    for i, file_path in enumerate(file_paths):
+        if status is not None:
+            status(f"Чтение реестра {i + 1} из {len(file_paths)}: {os.path.basename(file_path)}")
+        try:
+            merge.add_register(file_path, engine)
+        except Exception as e:
+            merge.errors.append((file_path, e))
+
+    if status is not None:
+        status("Сохранение объединенного реестра...")
+    merge.save(save_path)
+    return merge.summary() + f"\nВремя: {time.perf_counter() - started:.1f} с"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Объединение реестров применения СИ")
+    parser.add_argument('paths', nargs='+', help="Файлы реестров, папки (обходятся рекурсивно) или маски glob")
+    parser.add_argument('-o', '--output', required=True, help="Объединенный реестр (новый файл)")
+    parser.add_argument('--template', default=REESTR_TEMPLATE_FILE_PATH, help="Шаблон реестра применения СИ")
+    parser.add_argument('--engine', choices=list(ENGINES), default=MERGE_ENGINE, help="Движок чтения реестров")
+    args = parser.parse_args(argv)
+
+    output = os.path.normcase(os.path.abspath(args.output))
+    file_paths = [file_path for file_path in collect_files(args.paths, ('.xlsx',))
+                  if os.path.normcase(os.path.abspath(file_path)) != output]
+    if not file_paths:
+        print("Реестры не найдены.", file=sys.stderr)
+        return 1
+
+    try:
+        summary = merge_registers(file_paths, args.output, args.template, args.engine,
+                                  status=lambda message: print(message, file=sys.stderr))
+    except Exception as e:
+        print(f"Ошибка при объединении реестров: {e}", file=sys.stderr)
+        return 1
+    print(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import re
+
+# Значение, которое пишется в таблицу, если реквизит не найден
+MISSING = '-'
+
+# Реквизиты заявителя и изготовителя в порядке столбцов таблицы Word_Taker
+APPLICANT_FIELDS = ('name', 'location', 'phone', 'email')
+MANUFACTURER_FIELDS = ('name', 'address', 'phone')
+# Регистрационные номера организации (извлекаются и для заявителя, и для изготовителя)
+ID_FIELDS = ('ogrn', 'inn', 'kpp')
+ID_KINDS = {'ogrn', 'inn', 'kpp', 'inn_kpp'}
+
+# Все метки реквизитов одним выражением: текст просматривается за один проход.
+# Каждая альтернатива начинается с буквы вне группы - по этим первым буквам
+# движок re быстро пропускает позиции, где метки быть не может; вид метки
+# определяется по сработавшей группе (TOKEN_GROUPS). Регистр учитывается так же, как в прежних отдельных
+# поисках: "тел" и "e-mail" - без учета регистра, остальные метки - с учетом.
+TOKEN_PATTERN = re.compile(
+    r'м(?P<location>есто нахождения:)'
+    r'|а(?P<address>дрес места осуществления деятельности(?: по изготовлению продукции)?:)'
+    r'|О(?P<ogrn>ГРН(?:ИП)?(?:\s*:?\s*(?P<ogrn_value>\d{15}|\d{13})(?!\d))?)'
+    r'|И(?<![А-ЯЁа-яё]И)(?P<inn_kpp>НН\s*/\s*КПП\s*:?\s*(?P<inn_kpp_inn>\d{10})\s*/\s*(?P<inn_kpp_kpp>\d{9})(?!\d))'
+    r'|И(?<![А-ЯЁа-яё]И)(?P<inn>НН(?![А-ЯЁа-яё])(?:\s*:?\s*(?P<inn_value>\d{12}|\d{10})(?!\d))?)'
+    r'|К(?<![А-ЯЁа-яё]К)(?P<kpp>ПП(?![А-ЯЁа-яё])(?:\s*:?\s*(?P<kpp_value>\d{9})(?!\d))?)'
+    r'|т(?P<tel>(?i:ел\.?\s*:?\s*)(?P<tel_value>[+0-9()\s-]+)?)'
+    r'|Т(?P<tel_upper>(?i:ел\.?\s*:?\s*)(?P<tel_upper_value>[+0-9()\s-]+)?)'
+    r'|e(?P<email>(?i:-mail\s*:?\s*(?P<email_value>[^\s;]+?\.(?:ru|com))\b))'
+    r'|E(?P<email_upper>(?i:-mail\s*:?\s*(?P<email_upper_value>[^\s;]+?\.(?:ru|com))\b))'
+)
+
+# Группа альтернативы -> вид метки (варианты одной метки различаются регистром первой буквы)
+TOKEN_KINDS = {
+    'location': 'location', 'address': 'address', 'ogrn': 'ogrn', 'inn_kpp': 'inn_kpp', 'inn': 'inn', 'kpp': 'kpp',
+    'tel': 'tel', 'tel_upper': 'tel', 'email': 'email', 'email_upper': 'email',
+}
+TOKEN_GROUPS = {TOKEN_PATTERN.groupindex[group]: kind for group, kind in TOKEN_KINDS.items()}
+
+NON_DIGITS = re.compile(r'\D')
+
+
+def tokenize(text):
+    """
+    Находит все метки реквизитов в тексте за один проход, в порядке появления.
+    Метка - пара (вид, совпадение); значение читается по требованию (token_value).
+    """
+    return [(TOKEN_GROUPS[match.lastindex], match) for match in TOKEN_PATTERN.finditer(text)]
+
+
+def token_value(token):
+    """Значение метки: номер, телефон, e-mail; для ИНН/КПП - пара; None, если значения нет."""
+    kind, match = token
+    if kind == 'inn_kpp':
+        return match.group('inn_kpp_inn'), match.group('inn_kpp_kpp')
+    if kind in ('location', 'address'):
+        return None
+    value = match.group(match.lastgroup + '_value')
+    if kind == 'tel' and value is None and match.group()[-1].isspace():
+        # Как в прежнем поиске телефона: после "тел" только пробелы - номер пустой
+        value = match.group()[-1]
+    return value
+
+
+def first_token(tokens, kind, start=0, with_value=False):
+    """Первая метка вида kind не раньше позиции start (with_value - только со значением)."""
+    for token in tokens:
+        if token[0] == kind and token[1].start() >= start and (not with_value or token_value(token) is not None):
+            return token
+    return None
+
+
+def phone_number(tokens):
+    """Телефон из первой метки "тел" с номером: 11 цифр, иначе MISSING."""
+    token = first_token(tokens, 'tel', with_value=True)
+    if token is None:
+        return MISSING
+    digits = NON_DIGITS.sub('', token_value(token))
+    return digits if len(digits) == 11 else MISSING
+
+
+def organization_ids(tokens):
+    """ОГРН (ОГРНИП), ИНН и КПП: первые найденные значения, иначе MISSING."""
+    ids = dict.fromkeys(ID_FIELDS, MISSING)
+    for token in tokens:
+        kind = token[0]
+        if kind not in ID_KINDS:
+            continue
+        value = token_value(token)
+        if value is None:
+            continue
+        if kind == 'inn_kpp':
+            if ids['inn'] == MISSING:
+                ids['inn'] = value[0]
+            if ids['kpp'] == MISSING:
+                ids['kpp'] = value[1]
+        elif ids[kind] == MISSING:
+            ids[kind] = value
+    return ids
+
+
+def parse_applicant(text):
+    """
+    Реквизиты заявителя: наименование (до "место нахождения:"), место нахождения
+    (до ОГРН), телефон, e-mail, а также ОГРН, ИНН и КПП.
+    """
+    tokens = tokenize(text)
+    result = dict.fromkeys(APPLICANT_FIELDS, MISSING)
+
+    location = first_token(tokens, 'location')
+    if location is not None:
+        result['name'] = text[:location[1].start()].strip()
+        ogrn = first_token(tokens, 'ogrn', location[1].end())
+        if ogrn is not None:
+            result['location'] = text[location[1].end():ogrn[1].start()].strip()
+    else:
+        result['name'] = text.strip()
+
+    result['phone'] = phone_number(tokens)
+    email = first_token(tokens, 'email')
+    if email is not None:
+        result['email'] = token_value(email)
+
+    result.update(organization_ids(tokens))
+    return result
+
+
+def parse_manufacturer(text):
+    """
+    Реквизиты изготовителя: наименование (до ОГРН или адреса, что раньше),
+    адрес места осуществления деятельности (до телефона), телефон, а также ОГРН, ИНН и КПП.
+    """
+    tokens = tokenize(text)
+    result = dict.fromkeys(MANUFACTURER_FIELDS, MISSING)
+
+    ogrn = first_token(tokens, 'ogrn')
+    address = first_token(tokens, 'address')
+    if ogrn is not None and (address is None or ogrn[1].start() < address[1].start()):
+        result['name'] = text[:ogrn[1].start()].strip()
+    elif address is not None:
+        result['name'] = text[:address[1].start()].strip()
+
+    if address is not None:
+        # Адрес - до первой метки "тел" после него, иначе до конца строки
+        tel = first_token(tokens, 'tel', address[1].end())
+        result['address'] = text[address[1].end():tel[1].start() if tel is not None else None].strip(' ;')
+
+    result['phone'] = phone_number(tokens)
+
+    result.update(organization_ids(tokens))
+    return result
+
+
+# Разбор по роли организации: функция и поля результата
+PARSERS = {
+    'applicant': (parse_applicant, APPLICANT_FIELDS + ID_FIELDS),
+    'manufacturer': (parse_manufacturer, MANUFACTURER_FIELDS + ID_FIELDS),
+}
+
+
+def parse_requisites_batch(texts, role='applicant'):
+    """
+    Разбирает список строк с реквизитами (заявителей или изготовителей, см. PARSERS)
+    и возвращает результат по столбцам: поле -> список значений в порядке texts.
+    Пустые значения (None) разбираются как пустая строка.
+    """
+    parse, fields = PARSERS[role]
+    columns = {field: [] for field in fields}
+    for text in texts:
+        result = parse(text or '')
+        for field in fields:
+            columns[field].append(result[field])
+    return columns
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import pickle
+import shutil
+
+from export_workbook import load_template_model
+
+# Локальные копии шаблонов с сетевого диска и их разобранные модели
+TEMPLATE_CACHE_DIR = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.expanduser('~'), 'ALL_LINVIT', 'templates')
+
+# Версия формата сохраненной модели: увеличивается при изменении load_template_model
+MODEL_VERSION = 1
+
+# Модели, уже загруженные в этом процессе: путь шаблона -> (размер, время изменения, модель)
+_models = {}
+
+
+def cache_paths(template_path, cache_dir=TEMPLATE_CACHE_DIR):
+    """Пути локальной копии шаблона и файла с его моделью."""
+    key = os.path.normcase(os.path.abspath(template_path))
+    name = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12] + '_' + os.path.basename(template_path)
+    copy_path = os.path.join(cache_dir, name)
+    return copy_path, copy_path + '.model.pickle'
+
+
+def load_saved_model(model_path):
+    """Читает сохраненную модель: (размер, время изменения исходного шаблона, модель) или None."""
+    try:
+        with open(model_path, 'rb') as f:
+            saved = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(saved, dict) or saved.get('version') != MODEL_VERSION:
+        return None
+    return saved['source'], saved['model']
+
+
+def save_model(model_path, source, model):
+    """Сохраняет модель атомарно (через временный файл), чтобы не оставить ее недописанной."""
+    temp_path = model_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump({'version': MODEL_VERSION, 'source': source, 'model': model}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, model_path)
+
+
+def template_model(template_path, cache_dir=TEMPLATE_CACHE_DIR):
+    """
+    Возвращает модель шаблона (см. load_template_model) с кэшированием.
+
+    Шаблон на сетевом диске сверяется с кэшем только по размеру и времени изменения
+    (один os.stat). Если он не менялся, модель берется из памяти процесса или из
+    локального кэша без копирования и разбора книги. Иначе шаблон копируется
+    в локальную папку, разбирается с локального диска, и модель сохраняется.
+    Если сетевой диск недоступен, используется последняя сохраненная копия.
+    """
+    key = os.path.normcase(os.path.abspath(template_path))
+    copy_path, model_path = cache_paths(template_path, cache_dir)
+
+    try:
+        stat = os.stat(template_path)
+        source = (stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        source = None
+
+    cached = _models.get(key)
+    if cached is not None and (source is None or cached[0] == source):
+        return cached[1]
+
+    saved = load_saved_model(model_path)
+    if saved is not None and (source is None or saved[0] == source):
+        _models[key] = saved
+        return saved[1]
+
+    if source is None:
+        if not os.path.exists(copy_path):
+            # Ни шаблона, ни локальной копии: ошибка как при прямом открытии шаблона
+            raise FileNotFoundError(f"Файл шаблона не найден: {template_path}")
+        model = load_template_model(copy_path)
+        _models[key] = (None, model)
+        return model
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = copy_path + '.tmp'
+    shutil.copyfile(template_path, temp_path)
+    os.replace(temp_path, copy_path)
+    model = load_template_model(copy_path)
+    try:
+        save_model(model_path, source, model)
+    except (OSError, pickle.PicklingError):
+        # Модель без сохранения на диск все равно остается в памяти процесса
+        pass
+    _models[key] = (source, model)
+    return model
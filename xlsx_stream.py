@@ -0,0 +1,263 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+# Пространство имен связей (r:id) в workbook.xml
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+def local_name(tag):
+    """Возвращает имя тега без пространства имен."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def cast_number(value):
+    """Приводит числовое значение ячейки к int или float, как это делает openpyxl."""
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+def string_text(elem):
+    """
+    Текст строки <si> или <is>: простой <t> или фрагменты <r><t>.
+    Фонетические подсказки <rPh> пропускаются, как в openpyxl.
+    """
+    parts = []
+    for child in elem:
+        tag = local_name(child.tag)
+        if tag == 't':
+            parts.append(child.text or '')
+        elif tag == 'r':
+            parts.extend(node.text or '' for node in child if local_name(node.tag) == 't')
+    return ''.join(parts)
+
+
+class SharedStrings:
+    """
+    Ленивая таблица общих строк (xl/sharedStrings.xml).
+
+    Строки разбираются потоково и только до наибольшего запрошенного индекса.
+    """
+
+    def __init__(self, archive, path):
+        self.archive = archive
+        self.path = path
+        self.strings = []
+        self.stream = None
+        self.parser = None
+
+    def get(self, index):
+        if self.parser is None and self.path is not None:
+            self.stream = self.archive.open(self.path)
+            self.parser = ET.iterparse(self.stream, events=('end',))
+
+        while index >= len(self.strings) and self.parser is not None:
+            try:
+                event, elem = next(self.parser)
+            except StopIteration:
+                self.close()
+                break
+            if local_name(elem.tag) == 'si':
+                self.strings.append(string_text(elem))
+                elem.clear()
+
+        return self.strings[index] if index < len(self.strings) else None
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = None
+        self.parser = None
+
+
+class StreamSheet:
+    """Лист книги, читаемый напрямую из XML без объектной модели openpyxl."""
+
+    def __init__(self, workbook, title, path, sheet_state):
+        self.parent = workbook
+        self.title = title
+        self.path = path
+        self.sheet_state = sheet_state
+
+    def iter_rows(self, min_row=1, max_row=None, min_col=1, max_col=None, values_only=True):
+        """
+        Возвращает значения прямоугольной области по строкам (аналог iter_rows(values_only=True)).
+
+        Строки выдаются по мере разбора XML, так что память не зависит от размера листа.
+        Разбор прекращается, как только пройдена строка max_row
+        (при max_row=None лист читается до последней строки со значениями). max_col обязателен.
+        """
+        width = max_col - min_col + 1
+        empty = (None,) * width
+        next_row = min_row
+
+        with self.parent.archive.open(self.path) as stream:
+            row_number = 0
+            col_number = 0
+            values = None
+            for event, elem in ET.iterparse(stream, events=('start', 'end')):
+                tag = local_name(elem.tag)
+
+                if event == 'start':
+                    if tag == 'row':
+                        row_number = int(elem.get('r', row_number + 1))
+                        col_number = 0
+                        values = None
+                        if max_row is not None and row_number > max_row:
+                            break
+                    continue
+
+                if tag == 'c':
+                    address = elem.get('r')
+                    if address:
+                        column, row_number = coordinate_from_string(address)
+                        col_number = column_index_from_string(column)
+                    else:
+                        col_number += 1
+                    if min_row <= row_number and (max_row is None or row_number <= max_row) and min_col <= col_number <= max_col:
+                        value = self.parent.cell_value(elem)
+                        if value is not None:
+                            if values is None:
+                                values = [None] * width
+                            values[col_number - min_col] = value
+                    elem.clear()
+                elif tag == 'row':
+                    if values is not None:
+                        # Пропущенные в XML строки между непустыми выдаются пустыми
+                        for _ in range(next_row, row_number):
+                            yield empty
+                        yield tuple(values)
+                        next_row = row_number + 1
+                        values = None
+                    elem.clear()
+                elif tag == 'sheetData':
+                    break
+
+        if max_row is not None:
+            for _ in range(next_row, max_row + 1):
+                yield empty
+
+
+class XlsxStreamWorkbook:
+    """
+    Книга .xlsx, читаемая напрямую из zip-архива.
+
+    Имена листов берутся из workbook.xml, общие строки и стили разбираются лениво,
+    листы - только по запросу и только до последней нужной строки.
+    Значения ячеек берутся из кэша формул, как при data_only=True.
+    """
+
+    def __init__(self, file_path):
+        self.archive = zipfile.ZipFile(file_path)
+        self.sheets = {}
+        self.date_styles = None
+        self.epoch = CALENDAR_WINDOWS_1900
+
+        workbook_path = 'xl/workbook.xml'
+        targets = self.read_relationships(workbook_path)
+        shared_strings_path = None
+        styles_path = None
+        for rel_type, target in targets.values():
+            if rel_type.endswith('/sharedStrings'):
+                shared_strings_path = target
+            elif rel_type.endswith('/styles'):
+                styles_path = target
+        self.shared_strings = SharedStrings(self.archive, shared_strings_path)
+        self.styles_path = styles_path
+
+        root = ET.fromstring(self.archive.read(workbook_path))
+        for elem in root.iter():
+            tag = local_name(elem.tag)
+            if tag == 'workbookPr' and elem.get('date1904') in ('1', 'true'):
+                self.epoch = CALENDAR_MAC_1904
+            elif tag == 'sheet':
+                rel_type, target = targets[elem.get(f'{REL_NS}id')]
+                name = elem.get('name')
+                self.sheets[name] = StreamSheet(self, name, target, elem.get('state', 'visible'))
+
+    @property
+    def sheetnames(self):
+        return list(self.sheets)
+
+    def __getitem__(self, name):
+        return self.sheets[name]
+
+    def read_relationships(self, part_path):
+        """Читает файл связей части архива: r:id -> (тип, путь внутри архива)."""
+        folder, name = posixpath.split(part_path)
+        rels_path = posixpath.join(folder, '_rels', name + '.rels')
+        targets = {}
+        root = ET.fromstring(self.archive.read(rels_path))
+        for elem in root:
+            target = elem.get('Target')
+            if target.startswith('/'):
+                target = target.lstrip('/')
+            else:
+                target = posixpath.normpath(posixpath.join(folder, target))
+            targets[elem.get('Id')] = (elem.get('Type'), target)
+        return targets
+
+    def load_date_styles(self):
+        """Определяет, какие индексы стилей ячеек (cellXfs) соответствуют форматам даты."""
+        self.date_styles = set()
+        if self.styles_path is None:
+            return
+        formats = dict(BUILTIN_FORMATS)
+        root = ET.fromstring(self.archive.read(self.styles_path))
+        for elem in root:
+            tag = local_name(elem.tag)
+            if tag == 'numFmts':
+                for fmt in elem:
+                    formats[int(fmt.get('numFmtId'))] = fmt.get('formatCode')
+            elif tag == 'cellXfs':
+                for index, xf in enumerate(elem):
+                    code = formats.get(int(xf.get('numFmtId', 0)))
+                    if code and is_date_format(code):
+                        self.date_styles.add(index)
+
+    def cell_value(self, elem):
+        """Возвращает значение ячейки <c> с учетом ее типа."""
+        cell_type = elem.get('t', 'n')
+        value = None
+        for child in elem:
+            tag = local_name(child.tag)
+            if tag == 'v':
+                value = child.text
+            elif tag == 'is':
+                value = string_text(child)
+
+        if value is None:
+            return None
+        if cell_type == 's':
+            return self.shared_strings.get(int(value))
+        if cell_type == 'b':
+            return value == '1'
+        if cell_type in ('str', 'inlineStr', 'e'):
+            return value
+        if cell_type == 'd':
+            # Дата в формате ISO 8601 (t="d"), как ее читает openpyxl
+            return from_ISO8601(value)
+
+        number = cast_number(value)
+        style = elem.get('s')
+        if style is not None:
+            if self.date_styles is None:
+                self.load_date_styles()
+            if int(style) in self.date_styles:
+                return from_excel(number, self.epoch)
+        return number
+
+    def close(self):
+        self.shared_strings.close()
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()